@@ -0,0 +1,62 @@
+"""Small thread-safe in-memory caches used by the API services."""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Bounded LRU mapping with an optional per-entry TTL (seconds; None = no expiry).
+    get() returns MISSING for absent or expired keys and counts hits/misses.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl_s: float | None = None):
+        self.maxsize = max(1, maxsize)
+        self.ttl_s = ttl_s
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._data.get(key, MISSING)
+            if entry is not MISSING:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return MISSING
+
+    def set(self, key: Hashable, value: Any, ttl_s: float | None = MISSING) -> None:  # type: ignore[assignment]
+        ttl = self.ttl_s if ttl_s is MISSING else ttl_s
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
@@ -1,21 +1,83 @@
 """Database session and helpers."""
-from contextlib import contextmanager
-from typing import Generator
+import asyncio
+import base64
+import logging
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from datetime import datetime
+from typing import AsyncGenerator, Generator
 
-from backend.api.models import SessionLocal, QueryLog, init_db
+from sqlalchemy import func, insert, text, tuple_, update
+from sqlalchemy.exc import IntegrityError
 
-# Defer DB init so server starts even if DB file can't be created (e.g. permissions)
-def _ensure_db():
+from backend.api import history_stats, metrics
+from backend.api.models import (
+    IdBlock, SessionLocal, QueryLog, get_async_sessionmaker, init_db, schema_is_current,
+)
+from backend.api.settings import DB_INIT_ON_STARTUP, DB_WRITE_BEHIND, HISTORY_ROLLUP
+
+logger = logging.getLogger(__name__)
+
+_schema_lock = threading.Lock()
+_schema_checked = False
+
+
+def ensure_schema(raise_errors: bool = False) -> None:
+    """
+    Run init_db once per process, and only when the models changed since it last ran
+    against this database (DB_INIT_ON_STARTUP). Only a successful check counts: after
+    a failure (e.g. the DB is briefly unreachable) the next call tries again. Failures
+    are logged, not raised, unless raise_errors (the startup readiness check).
+    """
+    global _schema_checked
+    if _schema_checked:
+        return
+    with _schema_lock:
+        if _schema_checked:
+            return
+        if DB_INIT_ON_STARTUP:
+            try:
+                if not schema_is_current():
+                    init_db()
+            except Exception as e:
+                logger.warning("DB init failed (tables may exist): %s", e)
+                if raise_errors:
+                    raise
+                return
+        _schema_checked = True
+
+
+@asynccontextmanager
+async def get_async_db() -> AsyncGenerator:
+    """get_db for the async engine; run sync helpers on it with session.run_sync."""
+    if not _schema_checked:
+        await asyncio.to_thread(ensure_schema)
+    db = get_async_sessionmaker()()
     try:
-        init_db()
-    except Exception as e:
-        import logging
-        logging.getLogger(__name__).warning("DB init failed (tables may exist): %s", e)
-_ensure_db()
+        yield db
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    finally:
+        await db.close()
+
+
+def summary_columns(disease_result: dict | None, ifs_result: dict | None) -> dict:
+    """The QueryLog summary columns derived from the two result blobs."""
+    dr = disease_result or {}
+    ir = ifs_result or {}
+    return {
+        "disease_class": dr.get("class"),
+        "disease_confidence": dr.get("confidence"),
+        "ifs_matched_district": ir.get("matched_district"),
+    }
 
 
 @contextmanager
 def get_db() -> Generator:
+    if not _schema_checked:
+        ensure_schema()
     db = SessionLocal()
     try:
         yield db
@@ -27,6 +89,19 @@ def get_db() -> Generator:
         db.close()
 
 
+def _update_rollup(db, objs: list[QueryLog]) -> None:
+    if HISTORY_ROLLUP:
+        history_stats.add_to_rollup(db, [
+            {
+                "created_at": o.created_at,
+                "ifs_matched_district": o.ifs_matched_district,
+                "disease_class": o.disease_class,
+                "disease_confidence": o.disease_confidence,
+            }
+            for o in objs
+        ])
+
+
 def create_log(
     *,
     location: str | None = None,
@@ -37,8 +112,19 @@ def create_log(
     ifs_result: dict | None = None,
     error_message: str | None = None,
 ) -> dict:
-    """Create a log row and return id + created_at (read while session is open)."""
-    with get_db() as db:
+    """
+    Create a log row and return id + created_at (read while session is open).
+    With DB_WRITE_BEHIND the row is queued and its pre-allocated id returned at once.
+    """
+    if DB_WRITE_BEHIND:
+        from backend.api import write_behind
+        with metrics.timer("db_write"):
+            return write_behind.submit([dict(
+                location=location, district=district, crop=crop, soil_type=soil_type,
+                disease_result=disease_result, ifs_result=ifs_result,
+                error_message=error_message,
+            )])[0]
+    with metrics.timer("db_write"), get_db() as db:
         row = QueryLog(
             location=location,
             district=district,
@@ -47,10 +133,212 @@ def create_log(
             disease_result=disease_result,
             ifs_result=ifs_result,
             error_message=error_message,
+            **summary_columns(disease_result, ifs_result),
         )
         db.add(row)
         db.flush()
         db.refresh(row)
+        _update_rollup(db, [row])
         log_id = row.id
         created_at = row.created_at
         return {"id": log_id, "created_at": created_at}
+
+
+def create_logs(rows: list[dict]) -> list[dict]:
+    """
+    Insert many log rows in one transaction (a single multi-row INSERT) and return
+    id + created_at for each, in input order. Each row takes create_log's keywords.
+    """
+    if not rows:
+        return []
+    if DB_WRITE_BEHIND:
+        from backend.api import write_behind
+        with metrics.timer("db_write"):
+            return write_behind.submit(rows)
+    now = datetime.utcnow()
+    with metrics.timer("db_write"), get_db() as db:
+        objs = [
+            QueryLog(
+                created_at=now,
+                **row,
+                **summary_columns(row.get("disease_result"), row.get("ifs_result")),
+            )
+            for row in rows
+        ]
+        db.add_all(objs)
+        db.flush()
+        _update_rollup(db, objs)
+        return [{"id": o.id, "created_at": o.created_at} for o in objs]
+
+
+def reserve_log_ids(n: int) -> list[int]:
+    """
+    n query_log ids no other writer will use, for rows inserted later with explicit
+    ids. PostgreSQL draws them from the id sequence; elsewhere a block is reserved
+    in id_blocks, starting above max(id). Outside PostgreSQL an ordinary
+    autoincrement insert takes max(id) + 1 and can land inside a reserved block,
+    so with DB_WRITE_BEHIND every query_log insert must go through write_behind.
+    """
+    with get_db() as db:
+        if db.bind.dialect.name == "postgresql":
+            return list(db.execute(
+                text("SELECT nextval(pg_get_serial_sequence('query_log', 'id'))"
+                     " FROM generate_series(1, :n)"),
+                {"n": n},
+            ).scalars())
+        # UPDATE first: it takes the write lock, so reading back is race-free.
+        bumped = db.execute(
+            update(IdBlock).where(IdBlock.name == "query_log").values(next_id=IdBlock.next_id + n)
+        ).rowcount
+        max_id = db.query(func.max(QueryLog.id)).scalar() or 0
+        if not bumped:
+            start = max_id + 1
+            db.add(IdBlock(name="query_log", next_id=start + n))
+            try:
+                db.flush()
+            except IntegrityError:  # another process created the row first
+                db.rollback()
+                return reserve_log_ids(n)
+        else:
+            next_id = db.query(IdBlock.next_id).filter(IdBlock.name == "query_log").scalar()
+            start = max(next_id - n, max_id + 1)
+            if start != next_id - n:
+                db.execute(
+                    update(IdBlock).where(IdBlock.name == "query_log").values(next_id=start + n)
+                )
+        return list(range(start, start + n))
+
+
+def insert_logs(rows: list[dict], *, skip_existing: bool = False) -> int:
+    """
+    Multi-row INSERT of complete rows (explicit id and created_at, as built by
+    log_row). skip_existing drops ids already present, for replays that may repeat.
+    Returns the number of rows inserted.
+    """
+    with get_db() as db:
+        if skip_existing:
+            present = set(
+                db.execute(
+                    QueryLog.__table__.select()
+                    .with_only_columns(QueryLog.id)
+                    .where(QueryLog.id.in_([r["id"] for r in rows]))
+                ).scalars()
+            )
+            rows = [r for r in rows if r["id"] not in present]
+        if rows:
+            db.execute(insert(QueryLog), rows)
+            if HISTORY_ROLLUP:
+                history_stats.add_to_rollup(db, rows)
+        return len(rows)
+
+
+def log_row(log_id: int, created_at: datetime, fields: dict) -> dict:
+    """A full query_log row for insert_logs from create_log's keyword fields."""
+    return {
+        "id": log_id,
+        "created_at": created_at,
+        **fields,
+        **summary_columns(fields.get("disease_result"), fields.get("ifs_result")),
+    }
+
+
+def encode_cursor(created_at: datetime, log_id: int) -> str:
+    """Opaque /history page token for the row (created_at, id) a page ended on."""
+    raw = f"{created_at.isoformat()}|{log_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError on a malformed token."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        created_at, log_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(log_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {token!r}") from e
+
+
+# Columns /history lists; the JSON result blobs are deliberately not among them.
+SUMMARY_FIELDS = (
+    QueryLog.id,
+    QueryLog.created_at,
+    QueryLog.location,
+    QueryLog.district,
+    QueryLog.crop,
+    QueryLog.soil_type,
+    QueryLog.disease_class,
+    QueryLog.disease_confidence,
+    QueryLog.ifs_matched_district,
+)
+
+
+def list_logs(db, *, limit: int, offset: int = 0, cursor: str | None = None):
+    """
+    One page of log summaries (rows with the SUMMARY_FIELDS attributes), newest
+    first, plus the cursor for the next page (None on the last page). With a cursor
+    the page starts right after that row (keyset pagination: an index range scan,
+    same cost at any depth); otherwise `offset` rows are skipped.
+    """
+    q = db.query(*SUMMARY_FIELDS).order_by(QueryLog.created_at.desc(), QueryLog.id.desc())
+    if cursor:
+        created_at, log_id = decode_cursor(cursor)
+        q = q.filter(tuple_(QueryLog.created_at, QueryLog.id) < tuple_(created_at, log_id))
+    elif offset:
+        q = q.offset(offset)
+    rows = q.limit(limit).all()
+    next_cursor = None
+    if len(rows) == limit and rows[-1].created_at is not None:
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def get_log(db, log_id: int) -> dict | None:
+    """One full log entry as a dict (detached from the session), or None."""
+    row = db.query(QueryLog).filter(QueryLog.id == log_id).first()
+    if not row:
+        return None
+    return {
+        "id": row.id,
+        "created_at": row.created_at,
+        "location": row.location,
+        "district": row.district,
+        "crop": row.crop,
+        "soil_type": row.soil_type,
+        "disease_result": row.disease_result,
+        "ifs_result": row.ifs_result,
+        "error_message": row.error_message,
+    }
+
+
+def backfill_summaries(batch_size: int = 5000) -> int:
+    """
+    Fill the summary columns of rows written before they existed, in id order and
+    one transaction per batch. Safe to re-run; returns the number of rows updated.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        with get_db() as db:
+            rows = (
+                db.query(QueryLog.id, QueryLog.disease_result, QueryLog.ifs_result)
+                .filter(
+                    QueryLog.id > last_id,
+                    QueryLog.disease_class.is_(None),
+                    QueryLog.disease_confidence.is_(None),
+                    QueryLog.ifs_matched_district.is_(None),
+                )
+                .order_by(QueryLog.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not rows:
+                return updated
+            last_id = rows[-1].id
+            changes = []
+            for r in rows:
+                cols = summary_columns(r.disease_result, r.ifs_result)
+                if any(v is not None for v in cols.values()):
+                    changes.append({"id": r.id, **cols})
+            if changes:
+                db.execute(update(QueryLog), changes)
+                updated += len(changes)
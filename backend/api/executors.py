@@ -0,0 +1,112 @@
+"""Dedicated, bounded thread pools per workload (inference, geocoding/IFS, DB writes)."""
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from backend.api.settings import EXECUTOR_LIMITS, OVERLOAD_RETRY_AFTER_S
+
+
+class Overloaded(RuntimeError):
+    """Raised when a workload's queue is full; the API answers 503 + Retry-After."""
+
+    def __init__(self, name: str, retry_after_s: int = OVERLOAD_RETRY_AFTER_S):
+        super().__init__(f"Server busy ({name} queue full), retry later")
+        self.name = name
+        self.retry_after_s = retry_after_s
+
+
+class BoundedExecutor:
+    """
+    Thread pool that admits at most `max_pending` calls (running + queued).
+    Calls beyond that are rejected immediately with Overloaded instead of queueing.
+    """
+
+    def __init__(self, name: str, workers: int, max_pending: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.submitted = 0
+        self.rejected = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise Overloaded(self.name)
+            self._pending += 1
+            self.submitted += 1
+        try:
+            fut = self._pool.submit(functools.partial(fn, *args, **kwargs))
+        except BaseException:
+            self._release()
+            raise
+        # Released when the call really finishes: cancelling the awaiting task does
+        # not stop a call that is already running in a thread.
+        fut.add_done_callback(self._release)
+        return await asyncio.wrap_future(fut)
+
+    def _release(self, _fut=None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+_executors: dict[str, BoundedExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get(name: str) -> BoundedExecutor:
+    """The executor for a workload named in settings.EXECUTOR_LIMITS (created on first use)."""
+    ex = _executors.get(name)
+    if ex is None:
+        with _executors_lock:
+            ex = _executors.get(name)
+            if ex is None:
+                workers, max_pending = EXECUTOR_LIMITS[name]
+                ex = _executors[name] = BoundedExecutor(name, workers, max_pending)
+    return ex
+
+
+async def run(name: str, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run fn in the named workload's pool; raises Overloaded when its queue is full."""
+    return await get(name).run(fn, *args, **kwargs)
+
+
+async def gather(*aws: Any) -> list[Any]:
+    """asyncio.gather that cancels the other awaitables as soon as one raises."""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def stats() -> dict[str, dict[str, Any]]:
+    return {name: ex.stats() for name, ex in list(_executors.items())}
+
+
+def shutdown() -> None:
+    with _executors_lock:
+        for ex in _executors.values():
+            ex.shutdown()
+        _executors.clear()
@@ -0,0 +1,211 @@
+"""
+Streaming export of the query log as NDJSON, CSV or Parquet. Rows are read with
+yield_per (a server-side cursor on PostgreSQL) and encoded chunk by chunk, so
+memory stays flat however many rows match. The DB session is held until the
+stream is exhausted or closed (ExportStream.close, e.g. on client disconnect).
+"""
+import csv
+import io
+import json
+import threading
+import zlib
+from datetime import datetime
+from typing import Iterator
+
+from backend.api import db
+from backend.api.models import QueryLog
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+COMPRESSIONS = ("gzip",)
+
+SUMMARY_COLUMNS = [c.key for c in db.SUMMARY_FIELDS]
+RESULT_COLUMNS = ["disease_result", "ifs_result", "error_message"]
+
+
+def _columns(full: bool) -> list[str]:
+    return SUMMARY_COLUMNS + (RESULT_COLUMNS if full else [])
+
+
+def _iter_rows(*, since, until, district, full: bool, batch_size: int) -> Iterator[list]:
+    """Batches of result rows, oldest first, filtered like /history/stats."""
+    cols = [getattr(QueryLog, c) for c in _columns(full)]
+    with db.get_db() as session:
+        q = session.query(*cols)
+        if since is not None:
+            q = q.filter(QueryLog.created_at >= since)
+        if until is not None:
+            q = q.filter(QueryLog.created_at < until)
+        if district:
+            q = q.filter(QueryLog.ifs_matched_district == district)
+        q = q.order_by(QueryLog.created_at, QueryLog.id).yield_per(batch_size)
+        batch = []
+        for row in q:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _plain(value):
+    return value.isoformat() + "Z" if isinstance(value, datetime) else value
+
+
+def _ndjson(batches, columns: list[str]) -> Iterator[bytes]:
+    for batch in batches:
+        yield "".join(
+            json.dumps({c: _plain(v) for c, v in zip(columns, row)}, ensure_ascii=False) + "\n"
+            for row in batch
+        ).encode()
+
+
+def _csv(batches, columns: list[str]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for batch in batches:
+        for row in batch:
+            writer.writerow([
+                json.dumps(v, ensure_ascii=False) if isinstance(v, (dict, list)) else _plain(v)
+                for v in row
+            ])
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file for ParquetWriter; take() hands over what was written so far."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def take(self) -> bytes:
+        out, self._chunks = b"".join(self._chunks), []
+        return out
+
+
+def _parquet(batches, columns: list[str]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        "id": pa.int64(),
+        "created_at": pa.timestamp("us"),
+        "disease_confidence": pa.float64(),
+    }
+    schema = pa.schema([(c, types.get(c, pa.string())) for c in columns])
+    json_cols = {i for i, c in enumerate(columns) if c in ("disease_result", "ifs_result")}
+    sink = _ChunkSink()
+    with pq.ParquetWriter(sink, schema, compression="zstd") as writer:
+        for batch in batches:
+            cols = list(zip(*batch))
+            arrays = [
+                pa.array(
+                    [json.dumps(v, ensure_ascii=False) if v is not None else None for v in col]
+                    if i in json_cols else col,
+                    type=schema.field(i).type,
+                )
+                for i, col in enumerate(cols)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))  # one row group
+            yield sink.take()
+    yield sink.take()
+
+
+def _gzip(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    z = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        out = z.compress(chunk)
+        if out:
+            yield out
+    yield z.flush()
+
+
+class ExportStream:
+    """
+    Iterator over an export body. close() ends the row generator (and with it the DB
+    session) even mid-stream; it never blocks, and if a chunk is being produced in
+    another thread right now, that thread closes the stream once the chunk is done.
+    """
+
+    def __init__(self, chunks: Iterator[bytes], batches):
+        self._chunks = chunks
+        self._batches = batches
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def __iter__(self) -> "ExportStream":
+        return self
+
+    def __next__(self) -> bytes:
+        with self._lock:
+            if self.closed:
+                raise StopIteration
+            chunk = next(self._chunks)
+        if self.closed:  # close() was called while the chunk was being produced
+            self.close()
+        return chunk
+
+    def close(self) -> None:
+        self.closed = True
+        if self._lock.acquire(blocking=False):
+            try:
+                self._chunks.close()
+                self._batches.close()
+            finally:
+                self._lock.release()
+
+
+def stream(
+    fmt: str,
+    *,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    district: str | None = None,
+    full: bool = False,
+    compress: str | None = None,
+    batch_size: int = 1000,
+) -> ExportStream:
+    """Encoded export body, chunk by chunk; full adds the JSON results and error."""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {list(FORMATS)}")
+    if compress and compress not in COMPRESSIONS:
+        raise ValueError(f"compress must be one of {list(COMPRESSIONS)}")
+    if fmt == "parquet":
+        if compress:
+            raise ValueError("Parquet is compressed internally; omit compress")
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Parquet export needs pyarrow installed") from None
+    columns = _columns(full)
+    batches = _iter_rows(
+        since=since, until=until, district=district, full=full, batch_size=batch_size
+    )
+    encode = {"ndjson": _ndjson, "csv": _csv, "parquet": _parquet}[fmt]
+    chunks = encode(batches, columns)
+    return ExportStream(_gzip(chunks) if compress == "gzip" else chunks, batches)
+
+
+def filename(fmt: str, compress: str | None = None) -> str:
+    name = f"agrismart_history.{FORMATS[fmt][1]}"
+    return name + ".gz" if compress == "gzip" else name
+
+
+def media_type(fmt: str, compress: str | None = None) -> str:
+    return "application/gzip" if compress == "gzip" else FORMATS[fmt][0]
@@ -0,0 +1,186 @@
+"""
+Aggregates over the query log for /history/stats, computed in SQL: counts, mean
+confidence and top disease classes per district and time bucket. With
+HISTORY_ROLLUP the same numbers come from the hourly history_rollup table, which
+create_log / insert_logs update in the same transaction as the log rows.
+"""
+from datetime import datetime
+from typing import Any, Iterable
+
+from sqlalchemy import func, literal_column
+
+from backend.api.models import HistoryRollup, QueryLog
+
+BUCKETS = ("hour", "day", "week", "month")
+
+# SQLite strftime formats producing ISO bucket starts (week starts on Monday)
+_SQLITE_BUCKETS = {
+    "hour": ("%Y-%m-%dT%H:00:00",),
+    "day": ("%Y-%m-%dT00:00:00",),
+    "week": ("%Y-%m-%dT00:00:00", "weekday 0", "-6 days"),
+    "month": ("%Y-%m-01T00:00:00",),
+}
+
+
+def bucket_expr(dialect: str, bucket: str, col):
+    """SQL expression for the start of the hour/day/week/month containing col."""
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket {bucket!r}; choose from {list(BUCKETS)}")
+    if dialect == "postgresql":
+        return func.date_trunc(bucket, col)
+    fmt, *modifiers = _SQLITE_BUCKETS[bucket]
+    return func.strftime(fmt, col, *modifiers)
+
+
+def _iso(value) -> str | None:
+    if value is None:
+        return None
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+
+def aggregate(
+    db,
+    *,
+    bucket: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    district: str | None = None,
+    top: int = 3,
+    use_rollup: bool = False,
+) -> dict[str, Any]:
+    """
+    Groups keyed by (district, bucket start) with count, mean_confidence and the
+    `top` most frequent disease classes. bucket=None aggregates the whole range.
+    """
+    dialect = db.bind.dialect.name
+    if use_rollup:
+        t = HistoryRollup
+        time_col, district_col, class_col = t.bucket_start, t.district, t.disease_class
+        count = func.sum(t.count)
+        conf_sum, conf_n = func.sum(t.confidence_sum), func.sum(t.confidence_count)
+    else:
+        t = QueryLog
+        time_col, district_col, class_col = t.created_at, t.ifs_matched_district, t.disease_class
+        count = func.count()
+        conf_sum, conf_n = func.sum(t.disease_confidence), func.count(t.disease_confidence)
+
+    key_cols = [district_col]
+    if bucket:
+        key_cols.append(bucket_expr(dialect, bucket, time_col).label("bucket"))
+    else:
+        key_cols.append(literal_column("NULL").label("bucket"))
+
+    filters = []
+    if since is not None:
+        filters.append(time_col >= since)
+    if until is not None:
+        filters.append(time_col < until)
+    if district:
+        filters.append(district_col == district)
+
+    group_by = [district_col] + ([key_cols[1]] if bucket else [])
+    totals = (
+        db.query(*key_cols, count, conf_sum, conf_n)
+        .filter(*filters)
+        .group_by(*group_by)
+        .all()
+    )
+    per_class = (
+        db.query(*key_cols, class_col, count)
+        .filter(*filters, class_col.isnot(None), class_col != "")
+        .group_by(*group_by, class_col)
+        .all()
+    )
+
+    classes: dict[tuple, list] = {}
+    for d, b, c, n in per_class:
+        classes.setdefault((d or None, _iso(b)), []).append((int(n), c))
+    groups = []
+    for d, b, n, s, k in totals:
+        key = (d or None, _iso(b))
+        ranked = sorted(classes.get(key, []), key=lambda x: (-x[0], x[1]))[:top]
+        groups.append({
+            "district": key[0],
+            "bucket": key[1],
+            "count": int(n),
+            "mean_confidence": round(float(s) / int(k), 4) if k else None,
+            "top_classes": [{"class": c, "count": cnt} for cnt, c in ranked],
+        })
+    groups.sort(key=lambda g: (g["bucket"] or "", g["count"]), reverse=True)
+    return {
+        "source": "rollup" if use_rollup else "log",
+        "total": sum(g["count"] for g in groups),
+        "groups": groups,
+    }
+
+
+def _rollup_key(row: dict) -> tuple:
+    created_at = row["created_at"]
+    return (
+        created_at.replace(minute=0, second=0, microsecond=0),
+        row.get("ifs_matched_district") or "",
+        row.get("disease_class") or "",
+    )
+
+
+def add_to_rollup(db, rows: Iterable[dict]) -> None:
+    """
+    Fold newly written log rows (dicts with created_at and the summary columns)
+    into history_rollup with one upsert per (hour, district, class).
+    """
+    deltas: dict[tuple, list] = {}
+    for row in rows:
+        d = deltas.setdefault(_rollup_key(row), [0, 0, 0.0])
+        d[0] += 1
+        if row.get("disease_confidence") is not None:
+            d[1] += 1
+            d[2] += float(row["disease_confidence"])
+    if not deltas:
+        return
+    dialect = db.bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"HISTORY_ROLLUP is not supported on {dialect}")
+    stmt = insert(HistoryRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["bucket_start", "district", "disease_class"],
+        set_={
+            "count": HistoryRollup.count + stmt.excluded.count,
+            "confidence_count": HistoryRollup.confidence_count + stmt.excluded.confidence_count,
+            "confidence_sum": HistoryRollup.confidence_sum + stmt.excluded.confidence_sum,
+        },
+    )
+    db.execute(stmt, [
+        {"bucket_start": h, "district": d, "disease_class": c,
+         "count": n, "confidence_count": k, "confidence_sum": s}
+        for (h, d, c), (n, k, s) in deltas.items()
+    ])
+
+
+def rebuild_rollup(db, batch_size: int = 10000) -> int:
+    """Recompute history_rollup from query_log (after enabling it, or to repair it)."""
+    db.query(HistoryRollup).delete()
+    q = (
+        db.query(
+            QueryLog.created_at,
+            QueryLog.ifs_matched_district,
+            QueryLog.disease_class,
+            QueryLog.disease_confidence,
+        )
+        .filter(QueryLog.created_at.isnot(None))
+        .order_by(QueryLog.created_at)
+        .yield_per(batch_size)
+    )
+    n = 0
+    batch = []
+    for row in q:
+        batch.append(row._asdict())
+        if len(batch) >= batch_size:
+            add_to_rollup(db, batch)
+            n += len(batch)
+            batch = []
+    add_to_rollup(db, batch)
+    return n + len(batch)
@@ -2,33 +2,111 @@
 AgriSmart unified API: disease + IFS run concurrently; history in PostgreSQL/SQLite.
 """
 import asyncio
+import hashlib
 import logging
 import traceback
+from contextlib import asynccontextmanager, nullcontext
+from datetime import datetime
 from typing import Any, Optional
 
-from fastapi import FastAPI, File, Form, HTTPException, UploadFile, Query
+from fastapi import FastAPI, File, Form, Header, HTTPException, Request, Response, UploadFile, Query
 from fastapi.middleware.cors import CORSMiddleware
-
-from backend.api import db
-from backend.api.models import QueryLog
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
+
+from backend.api import executors, metrics, profiling, readiness
+from backend.api.executors import Overloaded
+from backend.api.services.imaging import ImageRejected
+from backend.api.settings import (
+    ANALYZE_BATCH_MAX_IMAGES,
+    DB_ASYNC,
+    HISTORY_ROLLUP,
+    IFS_BATCH_MAX_DISTRICTS,
+    IFS_CACHE_MAX_AGE_S,
+    MAX_UPLOAD_BYTES,
+    METRICS_ENABLED,
+    PROFILING_ENABLED,
+)
+from backend.api.uploads import BodySizeLimitMiddleware, UploadRejected, read_upload
 
 logger = logging.getLogger(__name__)
 
 
-def _run_disease(image_bytes: bytes) -> dict[str, Any]:
+def _run_disease(image_bytes: bytes | memoryview) -> dict[str, Any]:
+    from backend.api.services import result_cache
     from backend.api.services.disease import predict_disease
-    return predict_disease(image_bytes)
+    return result_cache.cached_predict(image_bytes, predict_disease)
 
 
 def _run_ifs(location: Optional[str], district: Optional[str]) -> dict[str, Any]:
     from backend.api.services.ifs import recommend
     return recommend(location=location or None, district=district or None)
 
+
+def _run_disease_batch(images: list[bytes | memoryview]) -> list:
+    """Batch prediction; images already in the result cache skip inference."""
+    from backend.api.services import result_cache
+    from backend.api.services.disease import predict_disease_batch
+    keys = [result_cache.image_key(b) for b in images]
+    out = [result_cache.get(k) for k in keys]
+    misses = [i for i, r in enumerate(out) if r is None]
+    if misses:
+        for i, r in zip(misses, predict_disease_batch([images[i] for i in misses])):
+            out[i] = r
+            if not isinstance(r, Exception):
+                result_cache.put(keys[i], r)
+    return out
+
+
+def _preload_disease() -> None:
+    from backend.api.services.disease import warmup
+    warmup()
+
+
+def _preload_ifs() -> None:
+    from backend.api.services.ifs import _get_gazetteer, _get_records
+    _get_records()
+    _get_gazetteer()
+
+
+_PRELOADERS = {"disease": _preload_disease, "ifs": _preload_ifs}
+
+
+def _init_db() -> None:
+    from backend.api.db import ensure_schema
+    ensure_schema(raise_errors=True)  # so /ready reports the db component as failed
+
+
+@asynccontextmanager
+async def _lifespan(app):
+    """
+    Start loading models and the DB layer in the background so the server accepts
+    /health at once. Nothing on the /health, /history or IFS paths imports TensorFlow.
+    """
+    from backend.api.settings import PRELOAD_MODELS
+    loop = asyncio.get_running_loop()
+    readiness.register("db")
+    loop.run_in_executor(None, readiness.load, "db", _init_db)
+    for name, fn in _PRELOADERS.items():
+        if PRELOAD_MODELS:
+            readiness.register(name)
+            loop.run_in_executor(None, readiness.load, name, fn)
+        else:
+            readiness.register(name, readiness.SKIPPED)
+    yield
+    from backend.api import write_behind
+    write_behind.shutdown()
+    executors.shutdown()
+    from backend.api.models import dispose_async_engine
+    await dispose_async_engine()
+    from backend.api.services.disease import shutdown as shutdown_disease
+    shutdown_disease()
+
+
 ##############
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware  # <--- Make sure this import is there
 
-app = FastAPI()
+app = FastAPI(lifespan=_lifespan)
 
 # 1. Define who can talk to this API
 origins = [
@@ -39,7 +117,18 @@ origins = [
     "*", # The "Wildcard" - allows everything (good for debugging)
 ]
 
-# 2. Add the middleware RIGHT AFTER app = FastAPI()
+# Cap upload bodies before multipart parsing (per-image limit is applied in read_upload).
+# Registered before CORS so CORS stays outermost and its 413s carry CORS headers.
+_FORM_OVERHEAD_BYTES = 64 * 1024
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={
+        "/analyze": MAX_UPLOAD_BYTES + _FORM_OVERHEAD_BYTES,
+        "/analyze/batch": MAX_UPLOAD_BYTES * ANALYZE_BATCH_MAX_IMAGES + _FORM_OVERHEAD_BYTES,
+    },
+)
+
+# 2. Add the CORS middleware last so it wraps everything else
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -64,6 +153,17 @@ app.add_middleware(
 )
 '''
 
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request, exc: Overloaded):
+    """A workload queue is full: tell the client to back off."""
+    from fastapi.responses import JSONResponse
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after_s)},
+    )
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request, exc):
     """Turn any unhandled exception into a JSON 500 with 'detail' for the frontend."""
@@ -82,18 +182,115 @@ def health():
     return {"status": "ok", "service": "agrismart-api"}
 
 
+@app.get("/ready")
+def ready():
+    """
+    Readiness: 503 while preloads are running, then 200 (see /health for liveness).
+    A failed preload reports "degraded" rather than 503, so the platform doesn't
+    restart the service in a loop; that component loads again on first use.
+    """
+    from fastapi.responses import JSONResponse
+    ok = readiness.is_ready()
+    failed = readiness.failed()
+    return JSONResponse(
+        status_code=200 if ok else 503,
+        content={
+            "ready": ok,
+            "status": ("degraded" if failed else "ok") if ok else "loading",
+            "failed": failed,
+            "components": readiness.snapshot(),
+        },
+    )
+
+
+@app.get("/stats")
+def stats():
+    """Runtime stats: micro-batcher and executor queue depths, cache hit rates."""
+    from backend.api import write_behind
+    from backend.api.models import pool_stats as db_pool_stats
+    from backend.api.services.disease import batch_stats, pool_stats
+    from backend.api.services.geocode import geocode_stats
+    from backend.api.services.ifs import gazetteer_stats, match_cache_stats
+    from backend.api.services.result_cache import stats as result_cache_stats
+    return {
+        "disease_batcher": batch_stats(),
+        "inference_workers": pool_stats(),
+        "query_log_writer": write_behind.stats(),
+        "db_pool": db_pool_stats(),
+        "disease_result_cache": result_cache_stats(),
+        "geocode_cache": geocode_stats(),
+        "gazetteer": gazetteer_stats(),
+        "ifs_match_cache": match_cache_stats(),
+        "executors": executors.stats(),
+    }
+
+
+def _metric_samples() -> list:
+    """
+    Gauges and counters for /metrics, read from the same sources as /stats. Read-only:
+    a scrape never builds the geocoder, gazetteer or any other lazy singleton.
+    """
+    s = stats()
+    execs = s["executors"]
+    geocode = s["geocode_cache"]
+    caches = {
+        "disease_result": s["disease_result_cache"],
+        "ifs_match": s["ifs_match_cache"],
+    }
+    if geocode:
+        caches["geocode"] = geocode["memory"]
+    ready = readiness.snapshot()
+    queues = [({"queue": "disease_batcher"}, s["disease_batcher"]["queue_depth"])]
+    if s["inference_workers"]:
+        queues.append(({"queue": "inference_workers"}, s["inference_workers"]["in_flight"]))
+    if s["query_log_writer"]:
+        queues.append(({"queue": "query_log_writer"}, s["query_log_writer"]["queue_depth"]))
+    return [
+        ("agrismart_executor_pending", "gauge", "Calls running or queued per executor.",
+         [({"executor": n}, e["pending"]) for n, e in execs.items()]),
+        ("agrismart_executor_rejected_total", "counter", "Calls rejected with 503 per executor.",
+         [({"executor": n}, e["rejected"]) for n, e in execs.items()]),
+        ("agrismart_queue_depth", "gauge", "Items waiting in internal queues.", queues),
+        ("agrismart_cache_hits_total", "counter", "In-memory cache hits.",
+         [({"cache": n}, c["hits"]) for n, c in caches.items()]),
+        ("agrismart_cache_misses_total", "counter", "In-memory cache misses.",
+         [({"cache": n}, c["misses"]) for n, c in caches.items()]),
+        ("agrismart_cache_entries", "gauge", "In-memory cache size.",
+         [({"cache": n}, c["size"]) for n, c in caches.items()]),
+        ("agrismart_geocode_negative_hits_total", "counter",
+         "Lookups answered from cached geocode failures.",
+         [({}, geocode["negative_hits"] if geocode else None)]),
+        ("agrismart_disease_batch_errors_total", "counter", "Micro-batches whose forward pass failed.",
+         [({}, s["disease_batcher"]["errors"])]),
+        ("agrismart_model_load_seconds", "gauge", "Startup load + warmup time per component.",
+         [({"component": n}, c["load_time_s"]) for n, c in ready.items()]),
+        ("agrismart_component_ready", "gauge", "1 if the component finished loading.",
+         [({"component": n}, int(c["state"] == readiness.READY)) for n, c in ready.items()]),
+    ]
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus text exposition; 404 unless METRICS_ENABLED."""
+    if not METRICS_ENABLED:
+        raise HTTPException(404, "Metrics are disabled (set METRICS_ENABLED=1)")
+    return PlainTextResponse(metrics.render(_metric_samples()), media_type=metrics.CONTENT_TYPE)
+
+
 @app.get("/check")
 def check():
     """Check if required files and imports exist (no heavy loading)."""
-    from backend.api.settings import DISEASE_MODEL_PATH, DISEASE_CLASSES_PATH, IFS_CSV_PATH
-    out = {"ok": True, "checks": {}}
-    out["checks"]["disease_model"] = DISEASE_MODEL_PATH.exists()
+    from backend.api.services.inference_backends import artifact_path
+    from backend.api.settings import DISEASE_BACKEND, DISEASE_CLASSES_PATH, IFS_CSV_PATH
+    model_path = artifact_path(DISEASE_BACKEND)
+    out = {"ok": True, "disease_backend": DISEASE_BACKEND, "checks": {}}
+    out["checks"]["disease_model"] = model_path.exists()
     out["checks"]["disease_classes"] = DISEASE_CLASSES_PATH.exists()
     out["checks"]["ifs_csv"] = IFS_CSV_PATH.exists()
     if not all(out["checks"].values()):
         out["ok"] = False
         out["paths"] = {
-            "disease_model": str(DISEASE_MODEL_PATH),
+            "disease_model": str(model_path),
             "disease_classes": str(DISEASE_CLASSES_PATH),
             "ifs_csv": str(IFS_CSV_PATH),
         }
@@ -108,6 +305,9 @@ async def analyze(
     crop: str = Form(""),
     soil_type: str = Form(""),
     top_k: str = Form("3"),
+    profile: Optional[str] = Query(None, description="cprofile, sample and/or tf (PROFILING_ENABLED only)"),
+    x_profile: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None),
 ):
     """
     Run disease recognition and IFS recommender concurrently.
@@ -118,23 +318,44 @@ async def analyze(
     if not loc and not dist:
         raise HTTPException(400, "Provide either location or district")
 
-    image_bytes = await file.read()
-    if not image_bytes:
-        raise HTTPException(400, "Empty image file")
+    try:
+        capture = profiling.requested(profile or x_profile, "analyze", x_admin_token)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except PermissionError as e:
+        raise HTTPException(403, str(e))
+    wrap = capture.wrap if capture else (lambda fn: fn)
+
+    async with capture or nullcontext():
+        out = await _analyze_one(file, loc, dist, crop, soil_type, wrap)
+    if capture:
+        out["profile"] = capture.summary()
+    return out
+
+
+async def _analyze_one(file, loc, dist, crop, soil_type, wrap) -> dict[str, Any]:
+    from backend.api import db
+    try:
+        image_bytes = await read_upload(file)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
 
     disease_result: dict[str, Any] | None = None
     ifs_result: dict[str, Any] | None = None
     err_msg: Optional[str] = None
 
     async def run_both():
-        loop = asyncio.get_event_loop()
-        disease_fut = loop.run_in_executor(None, _run_disease, image_bytes)
-        ifs_fut = loop.run_in_executor(None, lambda: _run_ifs(loc, dist))
-        d, i = await asyncio.gather(disease_fut, ifs_fut)
+        disease_fut = executors.run("inference", wrap(_run_disease), image_bytes)
+        ifs_fut = executors.run("ifs", wrap(_run_ifs), loc, dist)
+        d, i = await executors.gather(disease_fut, ifs_fut)
         return d, i
 
     try:
         disease_result, ifs_result = await run_both()
+    except Overloaded:
+        raise
+    except ImageRejected as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         err_msg = str(e)
         logger.exception("Analysis failed")
@@ -143,7 +364,9 @@ async def analyze(
             raise HTTPException(status_code=500, detail=detail)
 
     try:
-        row = db.create_log(
+        row = await executors.run(
+            "db",
+            wrap(db.create_log),
             location=loc,
             district=dist,
             crop=crop.strip() or None,
@@ -152,6 +375,8 @@ async def analyze(
             ifs_result=ifs_result,
             error_message=err_msg,
         )
+    except Overloaded:
+        raise
     except Exception as e:
         logger.exception("Failed to save to database")
         raise HTTPException(status_code=500, detail=f"Database error: {e}")
@@ -165,53 +390,366 @@ async def analyze(
     }
 
 
+@app.post("/analyze/batch")
+async def analyze_batch(
+    files: list[UploadFile] = File(...),
+    location: str = Form(""),
+    district: str = Form(""),
+    locations: list[str] = Form([]),
+    districts: list[str] = Form([]),
+    crop: str = Form(""),
+    soil_type: str = Form(""),
+):
+    """
+    Analyze many leaf images in one request. All images go through the disease
+    model as one batch; IFS runs once per distinct location/district; all rows are
+    saved with one bulk insert. `locations` / `districts` are optional per-image
+    values (same order as `files`); empty entries fall back to the shared
+    `location` / `district`. Per-image failures are reported, not raised.
+    """
+    n = len(files)
+    if n > ANALYZE_BATCH_MAX_IMAGES:
+        raise HTTPException(413, f"Too many images ({n}); max is {ANALYZE_BATCH_MAX_IMAGES}")
+    for name, values in (("locations", locations), ("districts", districts)):
+        if values and len(values) != n:
+            raise HTTPException(400, f"'{name}' must have one entry per file ({n}), got {len(values)}")
+
+    targets: list[tuple[Optional[str], Optional[str]]] = []
+    for i in range(n):
+        loc = (locations[i] if locations else "").strip() or location.strip() or None
+        dist = (districts[i] if districts else "").strip() or district.strip() or None
+        if not loc and not dist:
+            raise HTTPException(400, f"Image {i}: provide either location or district")
+        targets.append((loc, dist))
+
+    images: list[Any] = []
+    for f in files:
+        try:
+            images.append(await read_upload(f))
+        except UploadRejected as e:
+            images.append(e)
+
+    # recommend() uses the district when given, so that alone identifies the lookup.
+    def ifs_key(loc, dist):
+        return ("district", dist.lower()) if dist else ("location", loc.lower())
+
+    distinct = {}
+    for loc, dist in targets:
+        distinct.setdefault(ifs_key(loc, dist), (loc, dist))
+
+    async def run_ifs_safe(loc, dist):
+        try:
+            return await executors.run("ifs", _run_ifs, loc, dist)
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.warning("IFS failed for location=%r district=%r: %s", loc, dist, e)
+            return e
+
+    valid = [i for i, b in enumerate(images) if not isinstance(b, UploadRejected)]
+    disease_fut = asyncio.ensure_future(
+        executors.run("inference", _run_disease_batch, [images[i] for i in valid])
+    )
+    try:
+        ifs_results = await executors.gather(*(run_ifs_safe(l, d) for l, d in distinct.values()))
+    except Overloaded:
+        disease_fut.cancel()
+        raise
+    ifs_by_key = dict(zip(distinct.keys(), ifs_results))
+    try:
+        disease_valid = await disease_fut
+    except Overloaded:
+        raise
+    except Exception as e:
+        logger.exception("Batch disease inference failed")
+        disease_valid = [e] * len(valid)
+    disease_by_index: dict[int, Any] = dict(enumerate(images))
+    disease_by_index.update(zip(valid, disease_valid))
+
+    items: list[dict[str, Any]] = []
+    to_log: list[tuple[int, dict]] = []
+    for i, (loc, dist) in enumerate(targets):
+        d = disease_by_index[i]
+        r = ifs_by_key[ifs_key(loc, dist)]
+        errors = [str(x) for x in (d, r) if isinstance(x, Exception)]
+        item = {
+            "index": i,
+            "filename": files[i].filename,
+            "log_id": None,
+            "created_at": None,
+            "disease": {} if isinstance(d, Exception) else d,
+            "ifs": {} if isinstance(r, Exception) else r,
+            "error": "; ".join(errors) or None,
+        }
+        items.append(item)
+        if len(errors) < 2:
+            to_log.append((i, {
+                "location": loc,
+                "district": dist,
+                "crop": crop.strip() or None,
+                "soil_type": soil_type.strip() or None,
+                "disease_result": item["disease"] or None,
+                "ifs_result": item["ifs"] or None,
+                "error_message": item["error"],
+            }))
+
+    from backend.api import db
+    try:
+        saved = await executors.run("db", db.create_logs, [row for _, row in to_log])
+    except Overloaded:
+        raise
+    except Exception as e:
+        logger.exception("Failed to save batch to database")
+        raise HTTPException(status_code=500, detail=f"Database error: {e}")
+    for (i, _), row in zip(to_log, saved):
+        items[i]["log_id"] = row["id"]
+        items[i]["created_at"] = row["created_at"].isoformat() + "Z" if row["created_at"] else None
+
+    failed = sum(1 for it in items if it["error"])
+    return {"count": n, "succeeded": n - failed, "failed": failed, "items": items}
+
+
+def _ifs_data_version(district: str | None = None) -> str:
+    """The IFS data version; with district, first checks it matches (ValueError if not)."""
+    from backend.api.services.ifs import check_district, data_version
+    if district:
+        check_district(district)
+    return data_version()
+
+
+def _run_ifs_districts(districts: list[str]) -> list[dict[str, Any]]:
+    from backend.api.services.ifs import recommend_districts
+    return recommend_districts(districts)
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match check with weak comparison, as for GET caching."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _opaque_tag(etag) in {_opaque_tag(t) for t in if_none_match.split(",")}
+
+
+def _opaque_tag(tag: str) -> str:
+    """An entity tag without whitespace or the weak W/ prefix."""
+    return tag.strip().removeprefix("W/")
+
+
+def _ifs_headers(etag: str) -> dict[str, str]:
+    return {"ETag": etag, "Cache-Control": f"public, max-age={IFS_CACHE_MAX_AGE_S}"}
+
+
+def _not_modified(request: Request, etag: str) -> Response | None:
+    """A 304 response when the client already holds `etag`."""
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=_ifs_headers(etag))
+    return None
+
+
+@app.get("/ifs", response_model=dict)
+async def ifs(
+    request: Request,
+    district: str = Query(""),
+    location: str = Query(""),
+):
+    """
+    IFS recommendations only, no image. district wins over location, as in /analyze.
+    Responses carry an ETag of the IFS data version (CSV, gazetteer, code) and honour
+    If-None-Match; district lookups are answered 304 once the district is matched
+    (a memoized lookup), without building the recommendation.
+    """
+    dist = district.strip() or None
+    loc = location.strip() or None
+    if not loc and not dist:
+        raise HTTPException(400, "Provide either location or district")
+    try:
+        version = await executors.run("ifs", _ifs_data_version, dist)
+    except ValueError as e:
+        raise HTTPException(404, str(e))
+    if dist:
+        etag = f'"ifs-{version}"'
+        if cached := _not_modified(request, etag):
+            return cached
+    try:
+        result = await executors.run("ifs", _run_ifs, loc, dist)
+    except ValueError as e:
+        raise HTTPException(404, str(e))
+    if not dist:
+        # The district a place resolves to can change (gazetteer / geocoder), so it is part of the tag
+        matched = hashlib.sha256(str(result.get("matched_district")).encode()).hexdigest()[:8]
+        etag = f'"ifs-{version}-{matched}"'
+        if cached := _not_modified(request, etag):
+            return cached
+    return JSONResponse(result, headers=_ifs_headers(etag))
+
+
+@app.get("/ifs/batch", response_model=dict)
+async def ifs_batch(
+    request: Request,
+    district: list[str] = Query(..., description="Repeat for each district"),
+):
+    """
+    IFS recommendations for several districts (?district=A&district=B) in one call.
+    Unmatched districts get an error entry instead of failing the batch.
+    """
+    districts = [d for d in district if d.strip()]
+    if not districts:
+        raise HTTPException(400, "Provide at least one district")
+    if len(districts) > IFS_BATCH_MAX_DISTRICTS:
+        raise HTTPException(400, f"At most {IFS_BATCH_MAX_DISTRICTS} districts per request")
+    version = await executors.run("ifs", _ifs_data_version)
+    etag = f'"ifs-{version}"'
+    if cached := _not_modified(request, etag):
+        return cached
+    results = await executors.run("ifs", _run_ifs_districts, districts)
+    return JSONResponse({"count": len(results), "results": results}, headers=_ifs_headers(etag))
+
+
+async def _db_read(fn, *args, **kwargs):
+    """Run fn(session, *args) on the async engine (DB_ASYNC) or in the db executor."""
+    from backend.api import db
+    if DB_ASYNC:
+        async with db.get_async_db() as session:
+            return await session.run_sync(fn, *args, **kwargs)
+
+    def call():
+        with db.get_db() as session:
+            return fn(session, *args, **kwargs)
+    return await executors.run("db", call)
+
+
 @app.get("/history", response_model=dict)
-def history(limit: int = Query(50, ge=1, le=200), offset: int = Query(0, ge=0)):
-    """List recent query log entries (summary)."""
-    with db.get_db() as session:
-        rows = (
-            session.query(QueryLog)
-            .order_by(QueryLog.created_at.desc())
-            .offset(offset)
-            .limit(limit)
-            .all()
+async def history(
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    """
+    List recent query log entries (summary), newest first. Pass the returned
+    next_cursor to get the following page; offset paging still works but gets
+    slower the deeper it goes.
+    """
+    from backend.api.db import list_logs
+    try:
+        rows, next_cursor = await _db_read(list_logs, limit=limit, offset=offset, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    items = [
+        {
+            "id": r.id,
+            "created_at": r.created_at.isoformat() + "Z" if r.created_at else None,
+            "location": r.location,
+            "district": r.district,
+            "crop": r.crop,
+            "soil_type": r.soil_type,
+            "disease_class": r.disease_class,
+            "disease_confidence": r.disease_confidence,
+            "ifs_matched_district": r.ifs_matched_district,
+        }
+        for r in rows
+    ]
+    return {
+        "items": items,
+        "limit": limit,
+        "offset": offset if not cursor else None,
+        "next_cursor": next_cursor,
+    }
+
+
+@app.get("/history/stats", response_model=dict)
+async def history_stats(
+    bucket: Optional[str] = Query(None, description="hour, day, week or month; omit for totals"),
+    since: Optional[datetime] = Query(None, description="Inclusive start (UTC)"),
+    until: Optional[datetime] = Query(None, description="Exclusive end (UTC)"),
+    district: Optional[str] = Query(None, description="Matched IFS district"),
+    top: int = Query(3, ge=1, le=20),
+):
+    """
+    Counts, mean disease confidence and top disease classes per district (and per
+    time bucket), aggregated in the database. Served from the hourly rollup table
+    when HISTORY_ROLLUP is on, so since/until then resolve to whole hours.
+    """
+    from backend.api.history_stats import BUCKETS, aggregate
+    if bucket is not None and bucket not in BUCKETS:
+        raise HTTPException(400, f"bucket must be one of {list(BUCKETS)}")
+    result = await _db_read(
+        aggregate, bucket=bucket, since=since, until=until, district=district, top=top,
+        use_rollup=HISTORY_ROLLUP,
+    )
+    return {"bucket": bucket, "since": since, "until": until, **result}
+
+
+async def _closing(body):
+    """Stream a sync body from the threadpool; close it when done, failed or disconnected."""
+    from starlette.concurrency import iterate_in_threadpool
+    try:
+        async for chunk in iterate_in_threadpool(body):
+            yield chunk
+    finally:
+        body.close()
+
+
+@app.get("/history/export")
+def history_export(
+    format: str = Query("ndjson", description="ndjson, csv or parquet"),
+    since: Optional[datetime] = Query(None, description="Inclusive start (UTC)"),
+    until: Optional[datetime] = Query(None, description="Exclusive end (UTC)"),
+    district: Optional[str] = Query(None, description="Matched IFS district"),
+    full: bool = Query(False, description="Include disease/IFS result JSON and errors"),
+    compress: Optional[str] = Query(None, description="gzip (ndjson/csv only)"),
+):
+    """Stream matching log entries, oldest first, as a file download."""
+    from backend.api import export
+    try:
+        body = export.stream(
+            format, since=since, until=until, district=district, full=full, compress=compress
         )
-        items = []
-        for r in rows:
-            dr = r.disease_result or {}
-            ir = r.ifs_result or {}
-            items.append({
-                "id": r.id,
-                "created_at": r.created_at.isoformat() + "Z" if r.created_at else None,
-                "location": r.location,
-                "district": r.district,
-                "crop": r.crop,
-                "soil_type": r.soil_type,
-                "disease_class": dr.get("class"),
-                "disease_confidence": dr.get("confidence"),
-                "ifs_matched_district": ir.get("matched_district"),
-            })
-        return {"items": items, "limit": limit, "offset": offset}
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return StreamingResponse(
+        _closing(body),
+        media_type=export.media_type(format, compress),
+        headers={
+            "Content-Disposition": f'attachment; filename="{export.filename(format, compress)}"'
+        },
+    )
 
 
 @app.get("/history/{log_id}", response_model=dict)
-def history_detail(log_id: int):
+async def history_detail(log_id: int):
     """Get one query log entry with full disease + IFS results."""
-    with db.get_db() as session:
-        row = session.query(QueryLog).filter(QueryLog.id == log_id).first()
-        if not row:
-            raise HTTPException(404, "Record not found")
-        return {
-            "id": row.id,
-            "created_at": row.created_at.isoformat() + "Z" if row.created_at else None,
-            "location": row.location,
-            "district": row.district,
-            "crop": row.crop,
-            "soil_type": row.soil_type,
-            "disease_result": row.disease_result,
-            "ifs_result": row.ifs_result,
-            "error_message": row.error_message,
-        }
+    from backend.api.db import get_log
+    row = await _db_read(get_log, log_id)
+    if not row:
+        raise HTTPException(404, "Record not found")
+    created_at = row["created_at"]
+    return {**row, "created_at": created_at.isoformat() + "Z" if created_at else None}
+
+
+def _require_profiling_admin(token: Optional[str]) -> None:
+    """404 unless PROFILING_ENABLED, 403 without the admin token."""
+    if not PROFILING_ENABLED:
+        raise HTTPException(404, "Profiling is disabled (set PROFILING_ENABLED=1)")
+    if not profiling.authorized(token):
+        raise HTTPException(403, "A valid X-Admin-Token is required")
+
+
+@app.get("/admin/profiles", response_model=dict)
+def list_profiles(x_admin_token: Optional[str] = Header(None)):
+    """Saved request profiles, newest first; 404 unless PROFILING_ENABLED."""
+    _require_profiling_admin(x_admin_token)
+    return {"profiles": profiling.list_captures()}
+
+
+@app.get("/admin/profiles/{name}")
+def get_profile(name: str, x_admin_token: Optional[str] = Header(None)):
+    """Download one profile artifact (.prof, .folded or .json) by file name."""
+    _require_profiling_admin(x_admin_token)
+    path = profiling.artifact_path(name)
+    if path is None:
+        raise HTTPException(404, "Profile not found")
+    return FileResponse(path, filename=name, media_type="application/octet-stream")
 
 
 if __name__ == "__main__":
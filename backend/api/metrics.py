@@ -0,0 +1,128 @@
+"""
+Prometheus text-format metrics without extra dependencies. Pipeline stages are
+timed with ``with metrics.timer("decode"):``; with METRICS_ENABLED off, timer()
+returns a shared no-op context, so instrumented code pays one attribute lookup.
+"""
+import bisect
+import threading
+import time
+from contextlib import nullcontext
+from typing import Iterable
+
+from backend.api.settings import METRICS_ENABLED
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a cached lookup (~10 us) to a cold geocode or a large batch (~10 s)
+DEFAULT_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram, thread-safe."""
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # last slot: +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def snapshot(self) -> tuple[list[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+_stages: dict[str, Histogram] = {}
+_stage_errors: dict[str, int] = {}
+_lock = threading.Lock()
+_NOOP = nullcontext()
+
+
+def _histogram(stage: str) -> Histogram:
+    h = _stages.get(stage)
+    if h is None:
+        with _lock:
+            h = _stages.setdefault(stage, Histogram())
+    return h
+
+
+class _StageTimer:
+    __slots__ = ("stage", "t0")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _histogram(self.stage).observe(time.perf_counter() - self.t0)
+        if exc_type is not None:
+            with _lock:
+                _stage_errors[self.stage] = _stage_errors.get(self.stage, 0) + 1
+        return False
+
+
+def timer(stage: str):
+    """Context manager recording the block's duration under agrismart_stage_seconds."""
+    return _StageTimer(stage) if METRICS_ENABLED else _NOOP
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for k, v in labels.items():
+        v = str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _num(v) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+def render(samples: Iterable[tuple[str, str, str, list[tuple[dict, float]]]] = ()) -> str:
+    """
+    Exposition text for the stage histograms plus `samples`:
+    (name, type, help, [(labels, value), ...]) from the caller's collectors.
+    """
+    lines = [
+        "# HELP agrismart_stage_seconds Time spent per pipeline stage.",
+        "# TYPE agrismart_stage_seconds histogram",
+    ]
+    with _lock:
+        stages = dict(_stages)
+        errors = dict(_stage_errors)
+    for stage, h in sorted(stages.items()):
+        counts, total = h.snapshot()
+        cum = 0
+        for le, n in zip(h.buckets + (float("inf"),), counts):
+            cum += n
+            lines.append(f"agrismart_stage_seconds_bucket{_labels({'stage': stage, 'le': _num(le)})} {cum}")
+        lines.append(f"agrismart_stage_seconds_sum{_labels({'stage': stage})} {_num(total)}")
+        lines.append(f"agrismart_stage_seconds_count{_labels({'stage': stage})} {cum}")
+    lines += [
+        "# HELP agrismart_stage_errors_total Pipeline stage calls that raised.",
+        "# TYPE agrismart_stage_errors_total counter",
+    ]
+    for stage, n in sorted(errors.items()):
+        lines.append(f"agrismart_stage_errors_total{_labels({'stage': stage})} {n}")
+    for name, kind, help_text, values in samples:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in values:
+            if value is not None:
+                lines.append(f"{name}{_labels(labels)} {_num(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,51 @@
+"""
+Schema setup and one-off data migrations for the query log. Schema changes (new
+tables, nullable columns, indexes) are applied by init_db: at startup when the
+models changed (DB_INIT_ON_STARTUP), or from the deploy step with init-db. The
+other commands fill in data for rows that predate them.
+
+Usage (from the project root, PYTHONPATH=.):
+    python -m backend.api.migrate init-db
+    python -m backend.api.migrate backfill-summaries
+    python -m backend.api.migrate rebuild-rollup
+"""
+import argparse
+import time
+
+from backend.api import db, history_stats
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = p.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("init-db", help="Create/upgrade tables and indexes and record the schema version")
+    b = sub.add_parser(
+        "backfill-summaries",
+        help="Copy disease class/confidence and IFS district out of the JSON results",
+    )
+    b.add_argument("--batch-size", type=int, default=5000)
+    r = sub.add_parser("rebuild-rollup", help="Recompute history_rollup from query_log")
+    r.add_argument("--batch-size", type=int, default=10000)
+    args = p.parse_args(argv)
+
+    if args.cmd == "init-db":
+        from backend.api.models import init_db
+        t0 = time.perf_counter()
+        init_db()
+        print(f"Schema up to date in {time.perf_counter() - t0:.1f}s")
+        return 0
+    db.ensure_schema(raise_errors=True)
+    if args.cmd == "backfill-summaries":
+        t0 = time.perf_counter()
+        n = db.backfill_summaries(batch_size=args.batch_size)
+        print(f"Backfilled {n} rows in {time.perf_counter() - t0:.1f}s")
+    elif args.cmd == "rebuild-rollup":
+        t0 = time.perf_counter()
+        with db.get_db() as session:
+            n = history_stats.rebuild_rollup(session, batch_size=args.batch_size)
+        print(f"Rolled up {n} rows in {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,12 +1,28 @@
 """SQLAlchemy and Pydantic models for query history."""
+import hashlib
 from datetime import datetime
 from typing import Any, Optional
 
 from pydantic import BaseModel
-from sqlalchemy import JSON, Column, DateTime, Integer, String, Text, create_engine
+from sqlalchemy import (
+    JSON, Column, DateTime, Float, Index, Integer, String, Text, create_engine, event, inspect,
+    select, text,
+)
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-from backend.api.settings import DATABASE_URL
+from backend.api.settings import (
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE_S,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT_S,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_SYNCHRONOUS,
+)
 
 Base = declarative_base()
 
@@ -29,22 +45,207 @@ class QueryLog(Base):
     ifs_result = Column(JSON, nullable=True)       # {matched_district, recommendations, ...}
     error_message = Column(Text, nullable=True)   # if analysis failed
 
+    # Summary copied out of the JSON at write time, so listings never load the blobs
+    disease_class = Column(String(256), nullable=True, index=True)
+    disease_confidence = Column(Float, nullable=True)
+    ifs_matched_district = Column(String(256), nullable=True, index=True)
+
+    __table_args__ = (
+        # Newest-first listing and keyset pagination walk this index.
+        Index("ix_query_log_created_at_id", "created_at", "id"),
+        # Covers /history/stats: rows come out grouped by district, optionally
+        # narrowed by time, without touching the table itself.
+        Index(
+            "ix_query_log_stats",
+            "ifs_matched_district", "created_at", "disease_class", "disease_confidence",
+        ),
+    )
+
+
+class GeocodeCacheEntry(Base):
+    """Persistent geocode result for a normalized location query (negative if error set)."""
+    __tablename__ = "geocode_cache"
+
+    query_key = Column(String(512), primary_key=True)
+    district = Column(String(256), nullable=True)
+    address = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)           # set for "could not geocode" results
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class DiseaseResultCacheEntry(Base):
+    """Disease result for an exact image (sha256 of the upload) under one model version."""
+    __tablename__ = "disease_result_cache"
+
+    image_hash = Column(String(64), primary_key=True)
+    model_version = Column(String(64), primary_key=True)
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class HistoryRollup(Base):
+    """Hourly per-district, per-class counts kept up to date at write time (HISTORY_ROLLUP)."""
+    __tablename__ = "history_rollup"
+
+    bucket_start = Column(DateTime, primary_key=True)       # hour
+    district = Column(String(256), primary_key=True)        # "" when unmatched
+    disease_class = Column(String(256), primary_key=True)   # "" when no prediction
+    count = Column(Integer, nullable=False, default=0)
+    confidence_count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+
+
+class IdBlock(Base):
+    """Next unreserved id per table, for handing out ids before rows are inserted."""
+    __tablename__ = "id_blocks"
+
+    name = Column(String(64), primary_key=True)
+    next_id = Column(Integer, nullable=False)
+
+
+class SchemaVersion(Base):
+    """Fingerprint of the models init_db last applied, so later boots can skip it."""
+    __tablename__ = "schema_version"
+
+    id = Column(Integer, primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    applied_at = Column(DateTime, default=datetime.utcnow)
+
 
 # Engine and session (lazy init in db.py)
-def get_engine():
-    return create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {},
+def _engine_kwargs(url: str) -> dict:
+    kwargs: dict = {}
+    if url.startswith("sqlite"):
+        kwargs["connect_args"] = {"check_same_thread": False}
+        parsed = make_url(url)
+        if parsed.database in (None, "", ":memory:") or parsed.query.get("mode") == "memory":
+            return kwargs  # SingletonThreadPool / StaticPool: no pool sizing
+    kwargs.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_recycle=DB_POOL_RECYCLE_S,
+        pool_timeout=DB_POOL_TIMEOUT_S,
+        pool_pre_ping=DB_POOL_PRE_PING,
     )
+    return kwargs
+
+
+def _set_sqlite_pragmas(dbapi_conn, _record) -> None:
+    cur = dbapi_conn.cursor()
+    if SQLITE_JOURNAL_MODE:
+        cur.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    if SQLITE_SYNCHRONOUS:
+        cur.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cur.execute(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT_MS)}")
+    cur.close()
+
+
+def get_engine(url: str = DATABASE_URL):
+    eng = create_engine(url, **_engine_kwargs(url))
+    if url.startswith("sqlite"):
+        event.listen(eng, "connect", _set_sqlite_pragmas)
+    return eng
 
 
 engine = get_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def async_url(url: str = DATABASE_URL) -> str:
+    """DATABASE_URL with its async driver: asyncpg for PostgreSQL, aiosqlite for SQLite."""
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+")[0]
+    driver = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}.get(dialect)
+    if driver is None:
+        raise ValueError(f"No async driver configured for {dialect!r}")
+    return f"{dialect}+{driver}://{rest}"
+
+
+# Async engine, created on first use (DB_ASYNC); needs sqlalchemy[asyncio] + the driver
+_async_engine = None
+_async_sessionmaker = None
+
+
+def get_async_sessionmaker():
+    global _async_engine, _async_sessionmaker
+    if _async_sessionmaker is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        url = async_url()
+        _async_engine = create_async_engine(url, **_engine_kwargs(url))
+        if url.startswith("sqlite"):
+            event.listen(_async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        _async_sessionmaker = async_sessionmaker(_async_engine, expire_on_commit=False)
+    return _async_sessionmaker
+
+
+async def dispose_async_engine() -> None:
+    if _async_engine is not None:
+        await _async_engine.dispose()
+
+
+def _pool_status(pool) -> dict:
+    out: dict[str, Any] = {"class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        fn = getattr(pool, name, None)
+        if callable(fn):
+            out[name] = fn()
+    return out
+
+
+def pool_stats() -> dict:
+    """Connection pool occupancy for the sync engine and, if created, the async one."""
+    return {
+        "sync": _pool_status(engine.pool),
+        "async": _pool_status(_async_engine.pool) if _async_engine is not None else None,
+    }
+
+
+def _add_missing_columns():
+    """ALTER TABLE ADD COLUMN for nullable columns added to models after deployment."""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing or not col.nullable:
+                continue
+            col_type = col.type.compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}"))
+
+
+def schema_fingerprint() -> str:
+    """Hash of the tables, columns and indexes declared above."""
+    parts = []
+    for table in Base.metadata.sorted_tables:
+        parts.append(table.name)
+        parts += [f"{c.name}:{c.type!r}:{c.nullable}" for c in table.columns]
+        parts += sorted(f"{i.name}:{[c.name for c in i.columns]}" for i in table.indexes)
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+
+def schema_is_current() -> bool:
+    """True when init_db already ran for these models (one query instead of reflection)."""
+    try:
+        with engine.connect() as conn:
+            applied = conn.execute(select(SchemaVersion.fingerprint).where(SchemaVersion.id == 1)).scalar()
+    except SQLAlchemyError:
+        return False  # no schema_version table yet
+    return applied == schema_fingerprint()
+
+
 def init_db():
-    """Create tables if they don't exist."""
+    """Create tables, columns and indexes if they don't exist, then record the fingerprint."""
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    # create_all skips indexes added to tables that already exist.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        conn.execute(SchemaVersion.__table__.delete())
+        conn.execute(SchemaVersion.__table__.insert().values(id=1, fingerprint=schema_fingerprint()))
 
 
 # --- Pydantic schemas for API ---
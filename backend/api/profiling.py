@@ -0,0 +1,300 @@
+"""
+Opt-in profiling of single requests (PROFILING_ENABLED). A Capture wraps the
+functions a request runs in executor threads: "cprofile" profiles the first such
+call (one cProfile at a time per process, as Python 3.12+ requires) into a .prof
+(pstats / snakeviz), "sample" walks those threads'
+stacks every PROFILING_SAMPLE_INTERVAL_MS into folded stacks (the format of
+`py-spy record --format raw`, readable by flamegraph.pl / speedscope), and "tf"
+adds a TensorFlow profiler trace around the forward pass (TensorBoard). Profiled
+requests run their own forward pass instead of joining a micro-batch, so the
+model shows up in their profile. Captures are kept in PROFILING_DIR, newest
+PROFILING_MAX_CAPTURES only. Requesting a profile and reading captures both need
+the PROFILING_ADMIN_TOKEN (see authorized()).
+"""
+import asyncio
+import cProfile
+import functools
+import json
+import logging
+import pstats
+import re
+import secrets
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable
+
+from backend.api.settings import (
+    PROFILING_ADMIN_TOKEN,
+    PROFILING_DIR,
+    PROFILING_ENABLED,
+    PROFILING_MAX_CAPTURES,
+    PROFILING_SAMPLE_INTERVAL_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+MODES = ("cprofile", "sample", "tf")
+_NAME_RE = re.compile(r"^[\w.-]+$")
+
+_local = threading.local()
+_tf_lock = threading.Lock()  # the TF profiler is process-wide: one trace at a time
+_cprofile_lock = threading.Lock()  # only one cProfile may be active per process (3.12+)
+_ring_lock = threading.Lock()
+
+
+def parse_modes(value: str | None) -> set[str] | None:
+    """Modes from a ?profile= / X-Profile value ("cprofile", "sample,tf", ...)."""
+    if not value:
+        return None
+    modes = {m.strip().lower() for m in value.split(",") if m.strip()}
+    if modes in ({"1"}, {"true"}):
+        modes = {"cprofile"}
+    unknown = modes - set(MODES)
+    if unknown:
+        raise ValueError(f"Unknown profile mode(s) {sorted(unknown)}; choose from {list(MODES)}")
+    if modes == {"tf"}:
+        modes.add("cprofile")
+    return modes
+
+
+def authorized(token: str | None) -> bool:
+    """Whether token is the admin token; always False while no token is configured."""
+    if not PROFILING_ADMIN_TOKEN or not token:
+        return False
+    return secrets.compare_digest(token.encode(), PROFILING_ADMIN_TOKEN.encode())
+
+
+def requested(value: str | None, label: str, token: str | None) -> "Capture | None":
+    """
+    A Capture for this request, or None when not asked for or profiling is off.
+    Raises PermissionError when a profile is asked for without the admin token.
+    """
+    if not PROFILING_ENABLED:
+        return None
+    modes = parse_modes(value)
+    if not modes:
+        return None
+    if not authorized(token):
+        raise PermissionError("Profiling requires a valid X-Admin-Token")
+    return Capture(modes, label)
+
+
+def current() -> "Capture | None":
+    """The capture whose wrapped call is running in this thread, if any."""
+    return getattr(_local, "capture", None)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({code.co_filename}:{frame.f_lineno})"
+
+
+class Capture:
+    """Profile of one request; use as an async context manager around the request's work."""
+
+    def __init__(self, modes: set[str], label: str):
+        self.modes = modes
+        self.label = label
+        self.id = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+        self.notes: list[str] = []
+        self.artifacts: list[str] = []
+        self._profiles: list[cProfile.Profile] = []
+        self._stacks: Counter = Counter()
+        self._threads: dict[int, str] = {}  # ident -> name, while a wrapped call runs
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+        self._t0 = 0.0
+        self.duration_s = 0.0
+
+    def wrap(self, fn: Callable[..., Any]) -> Callable[..., Any]:
+        """fn, profiled/sampled for this capture when called (in any thread)."""
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            prev, _local.capture = current(), self
+            thread = threading.current_thread()
+            with self._lock:
+                self._threads[thread.ident] = thread.name
+            prof = None
+            if "cprofile" in self.modes:
+                if _cprofile_lock.acquire(blocking=False):
+                    prof = cProfile.Profile()
+                else:
+                    self.notes.append(f"cprofile skipped {fn.__name__}: another call was being profiled")
+            try:
+                if prof is not None:
+                    prof.enable()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    if prof is not None:
+                        prof.disable()
+                        _cprofile_lock.release()
+            finally:
+                with self._lock:
+                    self._threads.pop(thread.ident, None)
+                    if prof is not None:
+                        self._profiles.append(prof)
+                _local.capture = prev
+
+        return wrapper
+
+    def _sample_loop(self) -> None:
+        interval = PROFILING_SAMPLE_INTERVAL_MS / 1000.0
+        while not self._stop.wait(interval):
+            with self._lock:
+                threads = dict(self._threads)
+            if not threads:
+                continue
+            frames = sys._current_frames()
+            for ident, name in threads.items():
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    stack.append(name)
+                    self._stacks[";".join(reversed(stack))] += 1
+
+    async def __aenter__(self):
+        self._t0 = time.perf_counter()
+        if "sample" in self.modes:
+            self._sampler = threading.Thread(
+                target=self._sample_loop, name="profile-sampler", daemon=True
+            )
+            self._sampler.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.duration_s = time.perf_counter() - self._t0
+        if exc_type is not None:
+            self.notes.append(f"request raised {exc_type.__name__}: {exc}")
+        # Joining the sampler and writing the files block: keep them off the event loop.
+        await asyncio.to_thread(self._finish)
+        return False
+
+    def _finish(self) -> None:
+        if self._sampler is not None:
+            self._stop.set()
+            self._sampler.join()
+        try:
+            self._save()
+        except Exception:
+            logger.exception("Failed to save profile %s", self.id)
+
+    def _save(self) -> None:
+        PROFILING_DIR.mkdir(parents=True, exist_ok=True)
+        if self._profiles:
+            stats = pstats.Stats(self._profiles[0])
+            for p in self._profiles[1:]:
+                stats.add(p)
+            path = PROFILING_DIR / f"{self.id}.prof"
+            stats.dump_stats(str(path))
+            self.artifacts.append(path.name)
+        if "sample" in self.modes:
+            path = PROFILING_DIR / f"{self.id}.folded"
+            with open(path, "w") as f:
+                for stack, n in self._stacks.most_common():
+                    f.write(f"{stack} {n}\n")
+            self.artifacts.append(path.name)
+        with open(PROFILING_DIR / f"{self.id}.json", "w") as f:
+            json.dump(self.summary(), f)
+        _prune()
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "label": self.label,
+            "modes": sorted(self.modes),
+            "duration_ms": round(self.duration_s * 1000.0, 2),
+            "samples": sum(self._stacks.values()) if "sample" in self.modes else None,
+            "artifacts": list(self.artifacts),
+            "notes": list(self.notes),
+        }
+
+
+@contextmanager
+def tf_trace():
+    """TensorFlow profiler trace of the block, if this thread's capture asked for one."""
+    cap = current()
+    if cap is None or "tf" not in cap.modes:
+        yield
+        return
+    if not _tf_lock.acquire(blocking=False):
+        cap.notes.append("tf trace skipped: another trace was running")
+        yield
+        return
+    logdir = PROFILING_DIR / f"{cap.id}.tf"
+    tf = sys.modules.get("tensorflow")  # loaded by the tf/tflite backends; never imported here
+    try:
+        if tf is None:
+            cap.notes.append("tf trace unavailable: the disease backend does not use TensorFlow")
+        else:
+            try:
+                tf.profiler.experimental.start(str(logdir))
+            except Exception as e:
+                tf = None
+                cap.notes.append(f"tf trace unavailable: {e}")
+        try:
+            yield
+        finally:
+            if tf is not None:
+                tf.profiler.experimental.stop()
+                cap.artifacts.append(logdir.name)
+    finally:
+        _tf_lock.release()
+
+
+def _capture_ids() -> list[str]:
+    """Saved capture ids, newest first."""
+    if not PROFILING_DIR.is_dir():
+        return []
+    return sorted((p.stem for p in PROFILING_DIR.glob("*.json")), reverse=True)
+
+
+def _prune() -> None:
+    with _ring_lock:
+        for cid in _capture_ids()[PROFILING_MAX_CAPTURES:]:
+            for path in PROFILING_DIR.glob(f"{cid}.*"):
+                if path.is_dir():
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    path.unlink(missing_ok=True)
+
+
+def list_captures() -> list[dict[str, Any]]:
+    """Metadata of the kept captures, newest first, with artifact sizes."""
+    out = []
+    for cid in _capture_ids():
+        try:
+            with open(PROFILING_DIR / f"{cid}.json") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        meta["artifacts"] = [
+            {"name": name, "bytes": _size(PROFILING_DIR / name)} for name in meta.get("artifacts", [])
+        ]
+        out.append(meta)
+    return out
+
+
+def _size(path) -> int | None:
+    if path.is_dir():
+        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+    return path.stat().st_size if path.exists() else None
+
+
+def artifact_path(name: str):
+    """Path of a saved artifact file, or None (also for bad names and directories)."""
+    if not _NAME_RE.match(name) or name.startswith("."):
+        return None
+    path = PROFILING_DIR / name
+    return path if path.is_file() else None
@@ -0,0 +1,59 @@
+"""Per-component load state, reported by GET /ready."""
+import logging
+import threading
+import time
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+_lock = threading.Lock()
+_components: dict[str, dict[str, Any]] = {}
+
+
+def register(name: str, state: str = PENDING) -> None:
+    with _lock:
+        _components[name] = {"state": state, "load_time_s": None, "error": None}
+
+
+def load(name: str, fn: Callable[[], Any]) -> None:
+    """Run a component's loader, recording state and load time. Never raises."""
+    with _lock:
+        _components[name] = {"state": LOADING, "load_time_s": None, "error": None}
+    t0 = time.perf_counter()
+    try:
+        fn()
+    except Exception as e:
+        logger.exception("Preloading %s failed", name)
+        with _lock:
+            _components[name] = {
+                "state": FAILED,
+                "load_time_s": round(time.perf_counter() - t0, 3),
+                "error": str(e),
+            }
+        return
+    elapsed = round(time.perf_counter() - t0, 3)
+    logger.info("Preloaded %s in %.3fs", name, elapsed)
+    with _lock:
+        _components[name] = {"state": READY, "load_time_s": elapsed, "error": None}
+
+
+def snapshot() -> dict[str, dict[str, Any]]:
+    with _lock:
+        return {k: dict(v) for k, v in _components.items()}
+
+
+def is_ready() -> bool:
+    """True once no component is still loading. Failed ones count: they retry lazily."""
+    with _lock:
+        return all(c["state"] in (READY, SKIPPED, FAILED) for c in _components.values())
+
+
+def failed() -> list[str]:
+    with _lock:
+        return sorted(k for k, c in _components.items() if c["state"] == FAILED)
@@ -0,0 +1,119 @@
+"""In-process micro-batching: group concurrent single-item calls into one batched call."""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads and runs them through ``run_batch``
+    together. A batch is dispatched when it reaches ``max_batch_size`` items or when
+    the oldest queued item has waited ``max_wait_s`` seconds, whichever comes first.
+
+    ``run_batch`` receives a list of items and must return a sequence of results of
+    the same length; result ``i`` is delivered to the caller that submitted item ``i``.
+    """
+
+    def __init__(
+        self,
+        run_batch: Callable[[list], Sequence[Any]],
+        *,
+        max_batch_size: int = 16,
+        max_wait_s: float = 0.005,
+        name: str = "micro-batcher",
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        self._run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max(0.0, max_wait_s)
+        self._queue: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name=name, daemon=True)
+        self._started = False
+        # Stats
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._max_seen = 0
+        self._size_counts: dict[int, int] = {}
+
+    def _ensure_started(self) -> None:
+        if not self._started:
+            with self._lock:
+                if not self._started:
+                    self._thread.start()
+                    self._started = True
+
+    def submit(self, item: Any) -> Future:
+        """Queue one item; the returned future resolves to its result."""
+        self._ensure_started()
+        fut: Future = Future()
+        self._queue.put((item, fut))
+        return fut
+
+    def __call__(self, item: Any, timeout: float | None = None) -> Any:
+        """Submit one item and block until its result is ready."""
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    # Still take whatever is already waiting, without blocking.
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            futures = [fut for _, fut in batch]
+            try:
+                results = self._run_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"run_batch returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as e:
+                logger.exception("Batch of %d failed", len(items))
+                with self._lock:
+                    self._errors += 1
+                for fut in futures:
+                    fut.set_exception(e)
+                continue
+            with self._lock:
+                n = len(items)
+                self._batches += 1
+                self._items += n
+                self._max_seen = max(self._max_seen, n)
+                self._size_counts[n] = self._size_counts.get(n, 0) + 1
+            for fut, res in zip(futures, results):
+                fut.set_result(res)
+
+    def stats(self) -> dict[str, Any]:
+        """Queue depth and batch-size statistics."""
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_s * 1000.0,
+                "batches": self._batches,
+                "items": self._items,
+                "errors": self._errors,
+                "mean_batch_size": (self._items / self._batches) if self._batches else 0.0,
+                "max_batch_seen": self._max_seen,
+                "batch_size_counts": dict(sorted(self._size_counts.items())),
+            }
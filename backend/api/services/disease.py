@@ -1,38 +1,54 @@
 """Leaf disease recognition using the plant_disease model (runs in thread)."""
-import io
-import os
 import sys
+import threading
 from typing import Any
 
-# Must set before TensorFlow import
-os.environ["TF_USE_LEGACY_KERAS"] = "1"
-
-from backend.api.settings import DISEASE_MODEL_PATH, DISEASE_CLASSES_PATH, DISEASE_MODEL_DIR
+from backend.api import metrics, profiling
+from backend.api.services.batching import MicroBatcher
+from backend.api.services.imaging import decode_into
+from backend.api.services.inference_backends import INPUT_SIZE, load_backend
+from backend.api.settings import (
+    DISEASE_BACKEND,
+    DISEASE_BATCH_MAX_SIZE,
+    DISEASE_BATCH_MAX_WAIT_MS,
+    DISEASE_CLASSES_PATH,
+    DISEASE_MODEL_DIR,
+    DISEASE_WORKER_PROCESSES,
+    DISEASE_WORKER_SLOTS,
+    DISEASE_WORKER_START_TIMEOUT_S,
+)
 
 # Add model dir for any local imports
 if str(DISEASE_MODEL_DIR) not in sys.path:
     sys.path.insert(0, str(DISEASE_MODEL_DIR))
 
 
-def _load_model_and_classes():
-    import numpy as np
-    import tensorflow as tf
-    from PIL import Image
-    from tf_keras.applications.efficientnet import preprocess_input
-
-    if not DISEASE_MODEL_PATH.exists():
-        raise FileNotFoundError(f"Disease model not found: {DISEASE_MODEL_PATH}")
+def _load_classes() -> list[str]:
     if not DISEASE_CLASSES_PATH.exists():
         raise FileNotFoundError(f"Classes file not found: {DISEASE_CLASSES_PATH}")
-
-    model = tf.keras.models.load_model(str(DISEASE_MODEL_PATH), compile=False)
     with open(DISEASE_CLASSES_PATH, "r") as f:
-        class_names = [line.strip() for line in f.readlines() if line.strip()]
-    return model, class_names, preprocess_input, np
+        return [line.strip() for line in f.readlines() if line.strip()]
 
 
-# Lazy singleton
+def _load_model_and_classes():
+    import numpy as np
+    class_names = _get_classes()
+    backend = load_backend(DISEASE_BACKEND)
+    return backend, class_names, np
+
+
+# Lazy singletons
+_classes_cache: list[str] | None = None
 _model_cache: tuple | None = None
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_classes() -> list[str]:
+    global _classes_cache
+    if _classes_cache is None:
+        _classes_cache = _load_classes()
+    return _classes_cache
 
 
 def _get_model():
@@ -42,21 +58,87 @@ def _get_model():
     return _model_cache
 
 
-def predict_disease(image_bytes: bytes) -> dict[str, Any]:
-    """
-    Run disease prediction on image bytes. Returns dict with class, confidence, top.
-    """
-    from PIL import Image
-    model, class_names, preprocess_input, np = _get_model()
-    image = Image.open(io.BytesIO(image_bytes))
-    if image.mode != "RGB":
-        image = image.convert("RGB")
-    image = image.resize((224, 224))
-    img_array = np.array(image, dtype=np.float32)
-    img_array = preprocess_input(img_array)
-    img_batch = np.expand_dims(img_array, axis=0)
-    predictions = model.predict(img_batch, verbose=0)
-    preds = predictions[0]
+def _get_pool():
+    """Worker-process pool (DISEASE_WORKER_PROCESSES > 0); started on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from backend.api.services.worker_pool import InferencePool
+                pool = InferencePool(
+                    DISEASE_WORKER_PROCESSES,
+                    backend_name=DISEASE_BACKEND,
+                    num_classes=len(_get_classes()),
+                    slots=DISEASE_WORKER_SLOTS,
+                    max_batch=DISEASE_BATCH_MAX_SIZE,
+                )
+                pool.start()
+                try:
+                    pool.wait_ready(timeout=DISEASE_WORKER_START_TIMEOUT_S)
+                except Exception:
+                    pool.shutdown()
+                    raise
+                _pool = pool
+    return _pool
+
+
+def warmup() -> None:
+    """Load the model and run one dummy forward pass so graph tracing happens now."""
+    if DISEASE_WORKER_PROCESSES:
+        _get_pool()  # each worker warms up its own model before reporting ready
+        return
+    backend, _, _ = _get_model()
+    backend.warmup()
+
+
+def shutdown() -> None:
+    """Stop inference worker processes, if any were started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def _decode(image_bytes: bytes):
+    """Decode image bytes into one (224, 224, 3) float32 pixel array."""
+    import numpy as np
+    img_array = np.empty((*INPUT_SIZE, 3), dtype=np.float32)
+    with metrics.timer("decode"):
+        decode_into(image_bytes, img_array, INPUT_SIZE)
+    return img_array
+
+
+def _forward(img_batch):
+    """(n, 224, 224, 3) float32 pixels -> (n, num_classes) probabilities."""
+    if DISEASE_WORKER_PROCESSES:
+        with metrics.timer("forward"):  # includes the shared-memory round trip
+            return _get_pool().predict_batch(img_batch)
+    backend, _, _ = _get_model()
+    with metrics.timer("preprocess"):
+        img_batch = backend.preprocess(img_batch)
+    with metrics.timer("forward"):
+        return backend.predict(img_batch)
+
+
+# Reused by the batcher thread only, so concurrent batches never share it.
+_batch_buffer = None
+
+
+def _predict_batch(arrays: list) -> list:
+    """Run a list of decoded arrays through the model in one forward pass."""
+    import numpy as np
+    global _batch_buffer
+    if _batch_buffer is None or len(_batch_buffer) < len(arrays):
+        n = max(len(arrays), DISEASE_BATCH_MAX_SIZE)
+        _batch_buffer = np.empty((n, *INPUT_SIZE, 3), dtype=np.float32)
+    img_batch = np.stack(arrays, axis=0, out=_batch_buffer[: len(arrays)])
+    return list(_forward(img_batch))
+
+
+def _format_prediction(preds) -> dict[str, Any]:
+    import numpy as np
+    class_names = _get_classes()
     top_indices = np.argsort(preds)[-3:][::-1]
     top = [
         {"class": class_names[i], "confidence": float(preds[i])}
@@ -68,3 +150,66 @@ def predict_disease(image_bytes: bytes) -> dict[str, Any]:
         "confidence": float(np.max(preds)),
         "top": top,
     }
+
+
+# Groups concurrent predict_disease calls into shared forward passes.
+_batcher = MicroBatcher(
+    _predict_batch,
+    max_batch_size=DISEASE_BATCH_MAX_SIZE,
+    max_wait_s=DISEASE_BATCH_MAX_WAIT_MS / 1000.0,
+    name="disease-batcher",
+)
+
+
+def batch_stats() -> dict[str, Any]:
+    """Queue depth and batch-size stats of the disease micro-batcher."""
+    return _batcher.stats()
+
+
+def pool_stats() -> dict[str, Any] | None:
+    """Worker-pool stats, or None when inference runs in-process."""
+    return _pool.stats() if _pool is not None else None
+
+
+def predict_disease(image_bytes: bytes) -> dict[str, Any]:
+    """
+    Run disease prediction on image bytes. Returns dict with class, confidence, top.
+    Decoding runs in the calling thread; the forward pass is shared with other
+    concurrent callers through the micro-batcher, or, with worker processes
+    enabled, through the workers' own batching. Profiled requests run their own
+    forward pass here so it lands in their profile.
+    """
+    img_array = _decode(image_bytes)
+    if DISEASE_WORKER_PROCESSES:
+        preds = _forward(img_array[None, ...])[0]
+    elif profiling.current() is not None:
+        with profiling.tf_trace():
+            preds = _forward(img_array[None, ...])[0]
+    else:
+        preds = _batcher(img_array)
+    return _format_prediction(preds)
+
+
+def predict_disease_batch(images: list[bytes]) -> list[dict[str, Any] | Exception]:
+    """
+    Predict many images in one vectorized forward pass (bypasses the micro-batcher).
+    Images are decoded straight into one preallocated batch buffer. Returns one
+    entry per input: a result dict, or the exception that image raised while
+    decoding, so one bad upload doesn't fail the rest.
+    """
+    import numpy as np
+    out: list[dict[str, Any] | Exception] = [None] * len(images)  # type: ignore[list-item]
+    batch = np.empty((len(images), *INPUT_SIZE, 3), dtype=np.float32)
+    positions = []
+    for i, image_bytes in enumerate(images):
+        try:
+            with metrics.timer("decode"):
+                decode_into(image_bytes, batch[len(positions)], INPUT_SIZE)
+            positions.append(i)
+        except Exception as e:
+            out[i] = e
+    if positions:
+        preds = _forward(batch[: len(positions)])
+        for i, p in zip(positions, preds):
+            out[i] = _format_prediction(p)
+    return out
@@ -0,0 +1,160 @@
+"""Two-level cache (in-memory LRU + geocode_cache table) in front of the Nominatim geocoder."""
+import logging
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from backend.api import metrics
+from backend.api.cache import MISSING, LRUCache
+from backend.api.settings import (
+    GEOCODE_CACHE_PERSIST,
+    GEOCODE_CACHE_SIZE,
+    GEOCODE_CACHE_TTL_S,
+    GEOCODE_NEGATIVE_TTL_S,
+)
+from backend.ifs_recommender.recommend import geocode_location_to_district
+
+logger = logging.getLogger(__name__)
+
+GeocodeFn = Callable[[str], tuple[str, dict]]
+
+
+def _norm_query(location: str) -> str:
+    """Cache key: case/whitespace/comma-spacing differences map to the same entry."""
+    s = (location or "").strip().lower()
+    s = re.sub(r"\s*,\s*", ", ", s)
+    s = re.sub(r"\s+", " ", s)
+    return s.strip(" ,")
+
+
+class CachedGeocoder:
+    """
+    Callable with the same contract as geocode_location_to_district: returns
+    (district, address) or raises ValueError. "Could not geocode" ValueErrors are
+    cached too (with a shorter TTL); network errors are not cached.
+
+    Pass a stub `geocode_fn` and `persistent=False` to use it fully offline.
+    """
+
+    def __init__(
+        self,
+        geocode_fn: GeocodeFn = geocode_location_to_district,
+        *,
+        maxsize: int = GEOCODE_CACHE_SIZE,
+        ttl_s: float = GEOCODE_CACHE_TTL_S,
+        negative_ttl_s: float = GEOCODE_NEGATIVE_TTL_S,
+        persistent: bool = GEOCODE_CACHE_PERSIST,
+    ):
+        self._geocode_fn = geocode_fn
+        self._memory = LRUCache(maxsize=maxsize, ttl_s=ttl_s)
+        self.ttl_s = ttl_s
+        self.negative_ttl_s = negative_ttl_s
+        self.persistent = persistent
+        self._lock = threading.Lock()
+        self.db_hits = 0
+        self.lookups = 0
+        self.negative_hits = 0
+
+    def __call__(self, location: str) -> tuple[str, dict]:
+        key = _norm_query(location)
+        if not key:
+            raise ValueError("Empty location input.")
+        entry = self._memory.get(key)
+        if entry is MISSING and self.persistent:
+            entry = self._db_get(key)
+            if entry is not MISSING:
+                with self._lock:
+                    self.db_hits += 1
+                self._remember(key, entry)
+        if entry is MISSING:
+            entry = self._lookup(location)
+            self._remember(key, entry)
+            if self.persistent:
+                self._db_put(key, entry)
+        district, address, error = entry
+        if error is not None:
+            with self._lock:
+                self.negative_hits += 1
+            raise ValueError(error)
+        return district, address
+
+    def _lookup(self, location: str) -> tuple:
+        with self._lock:
+            self.lookups += 1
+        try:
+            district, address = self._geocode_fn(location)
+        except ValueError as e:
+            return None, None, str(e)
+        return district, address, None
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        ttl = self.negative_ttl_s if entry[2] is not None else self.ttl_s
+        self._memory.set(key, entry, ttl_s=ttl)
+
+    def _db_get(self, key: str) -> Any:
+        from backend.api.db import get_db
+        from backend.api.models import GeocodeCacheEntry
+        try:
+            with get_db() as db:
+                row = db.get(GeocodeCacheEntry, key)
+                if row is None:
+                    return MISSING
+                ttl = self.negative_ttl_s if row.error is not None else self.ttl_s
+                if row.created_at and datetime.utcnow() - row.created_at > timedelta(seconds=ttl):
+                    return MISSING
+                return row.district, row.address, row.error
+        except Exception as e:
+            logger.warning("Geocode cache read failed: %s", e)
+            return MISSING
+
+    def _db_put(self, key: str, entry: tuple) -> None:
+        from backend.api.db import get_db
+        from backend.api.models import GeocodeCacheEntry
+        district, address, error = entry
+        try:
+            with get_db() as db:
+                db.merge(GeocodeCacheEntry(
+                    query_key=key,
+                    district=district,
+                    address=address,
+                    error=error,
+                    created_at=datetime.utcnow(),
+                ))
+        except Exception as e:
+            logger.warning("Geocode cache write failed: %s", e)
+
+    def clear_memory(self) -> None:
+        self._memory.clear()
+
+    def stats(self) -> dict[str, Any]:
+        mem = self._memory.stats()
+        with self._lock:
+            return {
+                "memory": mem,
+                "db_hits": self.db_hits,
+                "lookups": self.lookups,
+                "negative_hits": self.negative_hits,
+                "persistent": self.persistent,
+            }
+
+
+_geocoder: CachedGeocoder | None = None
+
+
+def get_geocoder() -> CachedGeocoder:
+    global _geocoder
+    if _geocoder is None:
+        _geocoder = CachedGeocoder()
+    return _geocoder
+
+
+def geocode(location: str) -> tuple[str, dict]:
+    """Cached location -> (district, address)."""
+    with metrics.timer("geocode"):
+        return get_geocoder()(location)
+
+
+def geocode_stats() -> dict[str, Any] | None:
+    """Cache stats, or None before the first geocode (stats never build the geocoder)."""
+    return _geocoder.stats() if _geocoder is not None else None
@@ -1,4 +1,5 @@
 """IFS recommender wrapper (district/location -> IFS recommendations)."""
+import hashlib
 import sys
 from pathlib import Path
 from typing import Any
@@ -9,27 +10,112 @@ ifs_dir = backend_dir / "ifs_recommender"
 if str(backend_dir.parent) not in sys.path:
     sys.path.insert(0, str(backend_dir.parent))
 
-from backend.api.settings import IFS_CSV_PATH
+from backend.api import metrics
+from backend.api.cache import MISSING, LRUCache
+from backend.api.services.geocode import geocode
+from backend.api.settings import GAZETTEER_PATH, IFS_CSV_PATH, IFS_MATCH_CACHE_SIZE
 
 # Import after path is set
+from backend.ifs_recommender.gazetteer import Gazetteer
 from backend.ifs_recommender.recommend import (
+    DistrictIndex,
+    build_recommendation_index,
     load_ifs_csv,
+    match_district,
     recommend_for_district,
     recommend_for_location,
 )
 
 _records_cache: list | None = None
+_index_cache: DistrictIndex | None = None
+_csv_version: str | None = None
+_version_cache: str | None = None
+_match_cache = LRUCache(maxsize=IFS_MATCH_CACHE_SIZE)
+_gazetteer_cache: Gazetteer | None = None
+_gazetteer_checked = False
 
 
 def _get_records():
-    global _records_cache
+    global _records_cache, _index_cache, _csv_version, _version_cache
     if _records_cache is None:
         if not IFS_CSV_PATH.exists():
             raise FileNotFoundError(f"IFS CSV not found: {IFS_CSV_PATH}")
-        _records_cache = load_ifs_csv(str(IFS_CSV_PATH))
+        _csv_version = hashlib.sha256(IFS_CSV_PATH.read_bytes()).hexdigest()[:16]
+        _version_cache = None
+        records = load_ifs_csv(str(IFS_CSV_PATH))
+        _index_cache = build_recommendation_index(records)
+        _match_cache.clear()
+        _records_cache = records
     return _records_cache
 
 
+def _code_version() -> str:
+    """Hash of the modules that shape an IFS response, so code changes also change it."""
+    from backend.ifs_recommender import gazetteer, recommend
+    h = hashlib.sha256()
+    for path in (__file__, recommend.__file__, gazetteer.__file__):
+        h.update(Path(path).read_bytes())
+    return h.hexdigest()[:16]
+
+
+def data_version() -> str:
+    """
+    Version of what an IFS response depends on: the IFS CSV, the gazetteer and the
+    recommender code. Changes only when one of them is redeployed.
+    """
+    global _version_cache
+    if _version_cache is None:
+        _get_records()
+        g = _get_gazetteer()
+        parts = (_csv_version, g.version() if g is not None else "no-gazetteer", _code_version())
+        _version_cache = hashlib.sha256("|".join(parts).encode()).hexdigest()[:16]
+    return _version_cache
+
+
+def _get_index() -> DistrictIndex:
+    _get_records()
+    return _index_cache
+
+
+def _get_gazetteer() -> Gazetteer | None:
+    """The offline gazetteer, or None when no gazetteer file is deployed."""
+    global _gazetteer_cache, _gazetteer_checked
+    if not _gazetteer_checked:
+        if GAZETTEER_PATH.exists():
+            _gazetteer_cache = Gazetteer(str(GAZETTEER_PATH))
+        _gazetteer_checked = True
+    return _gazetteer_cache
+
+
+def gazetteer_stats() -> dict[str, Any] | None:
+    """Lookup stats, or None when the gazetteer isn't loaded (stats never open it)."""
+    return _gazetteer_cache.stats() if _gazetteer_cache is not None else None
+
+
+def _match(district: str, norm_to_display) -> tuple[str, str, int]:
+    """match_district memoized on the raw input (failed matches are memoized too)."""
+    hit = _match_cache.get(district)
+    if hit is MISSING:
+        try:
+            with metrics.timer("fuzzy_match"):
+                hit = match_district(district, norm_to_display)
+        except ValueError as e:
+            hit = e
+        _match_cache.set(district, hit)
+    if isinstance(hit, ValueError):
+        raise ValueError(str(hit))
+    return hit
+
+
+def check_district(district: str) -> None:
+    """Raises ValueError when district matches no IFS district (memoized like recommend)."""
+    _match(district.strip(), _get_index().norm_to_display)
+
+
+def match_cache_stats() -> dict[str, Any]:
+    return _match_cache.stats()
+
+
 def recommend(
     *,
     location: str | None = None,
@@ -37,13 +123,37 @@ def recommend(
 ) -> dict[str, Any]:
     """
     Get IFS recommendations. Prefer district if provided (no geocoding);
-    otherwise use location (geocodes to district).
+    otherwise use location (offline gazetteer first, then the cached geocoder).
     """
     records = _get_records()
+    index = _get_index()
     district = (district or "").strip()
     location = (location or "").strip()
     if district:
-        return recommend_for_district(district, records)
+        return recommend_for_district(district, records, index=index, match=_match)
     if location:
-        return recommend_for_location(location, records)
+        return recommend_for_location(
+            location,
+            records,
+            geocode=geocode,
+            index=index,
+            match=_match,
+            gazetteer=_get_gazetteer(),
+        )
     raise ValueError("Provide either location or district")
+
+
+def recommend_districts(districts: list[str]) -> list[dict[str, Any]]:
+    """
+    recommend() for many districts; repeated inputs are resolved once. A district
+    that can't be matched gets {"input_district", "error"} instead of failing the rest.
+    """
+    resolved: dict[str, dict[str, Any]] = {}
+    for d in districts:
+        key = d.strip()
+        if key not in resolved:
+            try:
+                resolved[key] = recommend(district=key)
+            except ValueError as e:
+                resolved[key] = {"input_district": key, "error": str(e)}
+    return [resolved[d.strip()] for d in districts]
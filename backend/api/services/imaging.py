@@ -0,0 +1,86 @@
+"""Image decoding for the disease model: reduced-size JPEG decode straight into a float32 buffer."""
+import io
+from typing import Any
+
+from backend.api.settings import MAX_IMAGE_PIXELS
+
+ALLOWED_FORMATS = {"JPEG", "MPO", "PNG", "WEBP", "BMP", "GIF"}
+
+
+class _ViewReader(io.RawIOBase):
+    """Seekable read-only file over a bytes-like object, without copying it (unlike BytesIO)."""
+
+    def __init__(self, data: Any):
+        self._view = memoryview(data).cast("B")
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = max(0, min(len(b), len(self._view) - self._pos))
+        b[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._pos = offset
+        elif whence == io.SEEK_CUR:
+            self._pos += offset
+        elif whence == io.SEEK_END:
+            self._pos = len(self._view) + offset
+        else:
+            raise ValueError(f"invalid whence ({whence})")
+        self._pos = max(0, self._pos)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+class ImageRejected(ValueError):
+    """The upload is not an accepted image, or is too large to decode safely."""
+
+
+def open_checked(data: Any):
+    """
+    Open image bytes (bytes or memoryview) lazily, header only, and validate format
+    and pixel count before any pixel data is decoded.
+    """
+    from PIL import Image, UnidentifiedImageError
+    try:
+        image = Image.open(_ViewReader(data))
+    except (UnidentifiedImageError, Image.DecompressionBombError) as e:
+        raise ImageRejected(f"Unreadable image: {e}") from e
+    if image.format not in ALLOWED_FORMATS:
+        raise ImageRejected(f"Unsupported image format: {image.format}")
+    w, h = image.size
+    if w <= 0 or h <= 0:
+        raise ImageRejected("Image has no pixels")
+    if w * h > MAX_IMAGE_PIXELS:
+        raise ImageRejected(f"Image too large: {w}x{h} pixels (max {MAX_IMAGE_PIXELS})")
+    return image
+
+
+def decode_into(data: Any, out, size: tuple[int, int]) -> None:
+    """
+    Decode `data` and write it, resized to `size`, into `out` (a float32
+    array view of shape (h, w, 3), e.g. one row of a preallocated batch).
+
+    JPEGs are decoded with DCT scaling (Image.draft) at the smallest scale that
+    still covers `size`, so a 12 MP photo decodes at ~1/8 resolution.
+    """
+    import numpy as np
+    from PIL import Image
+    image = open_checked(data)
+    # No-op for non-JPEG formats.
+    image.draft("RGB", size)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image = image.resize(size, Image.Resampling.BICUBIC, reducing_gap=3.0)
+    # uint8 view of the PIL buffer -> cast directly into the destination.
+    np.copyto(out, np.asarray(image), casting="unsafe")
@@ -0,0 +1,197 @@
+"""Pluggable runtimes for the disease classifier: TensorFlow (.h5), TFLite, ONNX Runtime."""
+import abc
+import functools
+import os
+import threading
+from pathlib import Path
+
+from backend.api.settings import (
+    DISEASE_BACKEND,
+    DISEASE_MODEL_PATH,
+    DISEASE_QUANTIZATION,
+    DISEASE_NUM_THREADS,
+    DISEASE_ONNX_PATH,
+    DISEASE_TFLITE_PATH,
+)
+
+INPUT_SIZE = (224, 224)
+
+
+def _import_tensorflow():
+    """Import TensorFlow on first model load only, with legacy Keras (tf_keras) as tf.keras."""
+    os.environ["TF_USE_LEGACY_KERAS"] = "1"  # must be set before the first import
+    import tensorflow as tf
+    return tf
+
+
+class InferenceBackend(abc.ABC):
+    """
+    One loaded model. predict() maps a float32 (n, 224, 224, 3) batch of RGB pixels
+    in 0..255 to (n, num_classes) probabilities as a NumPy array.
+    """
+
+    name = "base"
+
+    def preprocess(self, batch):
+        # EfficientNet's preprocess_input is the identity (rescaling/normalization
+        # layers are part of the model graph), so exported models take raw pixels too.
+        return batch
+
+    @abc.abstractmethod
+    def predict(self, batch):
+        ...
+
+    def warmup(self) -> None:
+        import numpy as np
+        self.predict(np.zeros((1, *INPUT_SIZE, 3), dtype=np.float32))
+
+
+class TensorFlowBackend(InferenceBackend):
+    name = "tf"
+
+    def __init__(self, path: Path = DISEASE_MODEL_PATH, num_threads: int = DISEASE_NUM_THREADS):
+        tf = _import_tensorflow()
+        from tf_keras.applications.efficientnet import preprocess_input
+
+        if num_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+        self._preprocess_input = preprocess_input
+        self.model = tf.keras.models.load_model(str(path), compile=False)
+        model = self.model
+
+        # Traced once with a fixed signature (any batch size), so calls skip the
+        # data-adapter / predict-loop setup that model.predict rebuilds every time.
+        @tf.function(
+            input_signature=[tf.TensorSpec(shape=(None, *INPUT_SIZE, 3), dtype=tf.float32)]
+        )
+        def infer(x):
+            return model(x, training=False)
+
+        self.infer = infer
+
+    def preprocess(self, batch):
+        return self._preprocess_input(batch)
+
+    def predict(self, batch):
+        return self.infer(batch).numpy()
+
+
+class _SizedInterpreter:
+    """A TFLite interpreter whose tensors are reallocated only when the batch length changes."""
+
+    def __init__(self, interpreter, batch: int):
+        self._interpreter = interpreter
+        self._interpreter.allocate_tensors()
+        self.input = self._interpreter.get_input_details()[0]
+        self.output = self._interpreter.get_output_details()[0]
+        self._batch = int(self.input["shape"][0])
+        # The interpreter holds mutable tensors: one invocation at a time.
+        self._lock = threading.Lock()
+        self._resize(batch)
+
+    def _resize(self, n: int) -> None:
+        if n != self._batch:
+            self._interpreter.resize_tensor_input(self.input["index"], [n, *INPUT_SIZE, 3])
+            self._interpreter.allocate_tensors()
+            self.input = self._interpreter.get_input_details()[0]
+            self.output = self._interpreter.get_output_details()[0]
+            self._batch = n
+
+    def run(self, x):
+        with self._lock:
+            self._resize(len(x))
+            self._interpreter.set_tensor(self.input["index"], x)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self.output["index"]).copy()
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    TFLite interpreter (tflite-runtime if installed, else tf.lite); handles INT8 I/O.
+    Single images (the common case) have their own batch-1 interpreter; micro-batches
+    use a second one, created on first use and resized only when the length changes.
+    """
+
+    name = "tflite"
+
+    def __init__(self, path: Path = DISEASE_TFLITE_PATH, num_threads: int = DISEASE_NUM_THREADS):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            Interpreter = _import_tensorflow().lite.Interpreter
+        self._new = functools.partial(Interpreter, model_path=str(path), num_threads=num_threads or None)
+        self._single = _SizedInterpreter(self._new(), 1)
+        self._multi: _SizedInterpreter | None = None
+        self._multi_lock = threading.Lock()
+        self._input = self._single.input
+        self._output = self._single.output
+
+    def _runner(self, n: int) -> _SizedInterpreter:
+        if n == 1:
+            return self._single
+        if self._multi is None:
+            with self._multi_lock:
+                if self._multi is None:
+                    self._multi = _SizedInterpreter(self._new(), n)
+        return self._multi
+
+    def predict(self, batch):
+        import numpy as np
+        x = batch
+        in_scale, in_zero = self._input["quantization"]
+        if self._input["dtype"] != np.float32:
+            x = np.round(batch / in_scale + in_zero)
+            info = np.iinfo(self._input["dtype"])
+            x = np.clip(x, info.min, info.max)
+        y = self._runner(len(x)).run(x.astype(self._input["dtype"]))
+        out_scale, out_zero = self._output["quantization"]
+        if self._output["dtype"] != np.float32:
+            y = (y.astype(np.float32) - out_zero) * out_scale
+        return np.array(y, dtype=np.float32)
+
+
+class OnnxBackend(InferenceBackend):
+    name = "onnx"
+
+    def __init__(self, path: Path = DISEASE_ONNX_PATH, num_threads: int = DISEASE_NUM_THREADS):
+        import onnxruntime as ort
+        opts = ort.SessionOptions()
+        if num_threads:
+            opts.intra_op_num_threads = num_threads
+            opts.inter_op_num_threads = 1
+        self._session = ort.InferenceSession(
+            str(path), sess_options=opts, providers=["CPUExecutionProvider"]
+        )
+        self._input_name = self._session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self._session.run(None, {self._input_name: batch})[0]
+
+
+BACKENDS: dict[str, tuple[type, Path]] = {
+    "tf": (TensorFlowBackend, DISEASE_MODEL_PATH),
+    "tflite": (TFLiteBackend, DISEASE_TFLITE_PATH),
+    "onnx": (OnnxBackend, DISEASE_ONNX_PATH),
+}
+
+
+def artifact_path(name: str = DISEASE_BACKEND) -> Path:
+    """Model file the named backend serves."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown DISEASE_BACKEND {name!r}; choose from {sorted(BACKENDS)}")
+    return BACKENDS[name][1]
+
+
+def load_backend(
+    name: str = DISEASE_BACKEND, path: Path | None = None, num_threads: int | None = None
+) -> InferenceBackend:
+    """Load the configured backend (DISEASE_BACKEND) from its model file."""
+    if DISEASE_QUANTIZATION and name != "tflite" and path is None:
+        raise ValueError(f"DISEASE_QUANTIZATION={DISEASE_QUANTIZATION!r} requires DISEASE_BACKEND=tflite")
+    path = path or artifact_path(name)
+    if not path.exists():
+        raise FileNotFoundError(f"Disease model for backend {name!r} not found: {path}")
+    cls, _ = BACKENDS[name]
+    if num_threads is None:
+        return cls(path)
+    return cls(path, num_threads=num_threads)
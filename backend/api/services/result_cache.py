@@ -0,0 +1,101 @@
+"""Disease results keyed by upload content hash + model version (skip duplicate inference)."""
+import copy
+import hashlib
+import logging
+import threading
+from typing import Any, Callable
+
+from backend.api.cache import MISSING, LRUCache
+from backend.api.services.inference_backends import artifact_path
+from backend.api.settings import (
+    DISEASE_BACKEND,
+    DISEASE_CACHE_PERSIST,
+    DISEASE_CACHE_SIZE,
+    DISEASE_CLASSES_PATH,
+    DISEASE_MODEL_VERSION,
+)
+
+logger = logging.getLogger(__name__)
+
+_memory = LRUCache(maxsize=DISEASE_CACHE_SIZE)
+_lock = threading.Lock()
+_db_hits = 0
+_model_version: str | None = None
+
+
+def model_version() -> str:
+    """DISEASE_MODEL_VERSION, or a fingerprint of the served model file and classes."""
+    global _model_version
+    if _model_version is None:
+        if DISEASE_MODEL_VERSION:
+            _model_version = DISEASE_MODEL_VERSION
+        else:
+            h = hashlib.sha256(DISEASE_BACKEND.encode())
+            for path in (artifact_path(), DISEASE_CLASSES_PATH):
+                if path.exists():
+                    st = path.stat()
+                    h.update(f"{path.name}:{st.st_size}:{st.st_mtime_ns};".encode())
+            _model_version = h.hexdigest()[:16]
+    return _model_version
+
+
+def image_key(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def get(key: str) -> dict[str, Any] | None:
+    """A copy of the cached result (callers may mutate it), or None."""
+    global _db_hits
+    hit = _memory.get((key, model_version()))
+    if hit is not MISSING:
+        return copy.deepcopy(hit)
+    if not DISEASE_CACHE_PERSIST:
+        return None
+    from backend.api.db import get_db
+    from backend.api.models import DiseaseResultCacheEntry
+    try:
+        with get_db() as db:
+            row = db.get(DiseaseResultCacheEntry, (key, model_version()))
+            result = row.result if row is not None else None
+    except Exception as e:
+        logger.warning("Disease result cache read failed: %s", e)
+        return None
+    if result is not None:
+        with _lock:
+            _db_hits += 1
+        _memory.set((key, model_version()), copy.deepcopy(result))
+    return result
+
+
+def put(key: str, result: dict[str, Any]) -> None:
+    _memory.set((key, model_version()), copy.deepcopy(result))
+    if not DISEASE_CACHE_PERSIST:
+        return
+    from backend.api.db import get_db
+    from backend.api.models import DiseaseResultCacheEntry
+    try:
+        with get_db() as db:
+            db.merge(DiseaseResultCacheEntry(
+                image_hash=key, model_version=model_version(), result=result
+            ))
+    except Exception as e:
+        logger.warning("Disease result cache write failed: %s", e)
+
+
+def cached_predict(image_bytes: bytes, predict: Callable[[bytes], dict[str, Any]]) -> dict[str, Any]:
+    """predict(image_bytes), or the stored result for byte-identical earlier uploads."""
+    key = image_key(image_bytes)
+    result = get(key)
+    if result is None:
+        result = predict(image_bytes)
+        put(key, result)
+    return result
+
+
+def stats() -> dict[str, Any]:
+    out = _memory.stats()
+    with _lock:
+        out["db_hits"] = _db_hits
+    out["persistent"] = DISEASE_CACHE_PERSIST
+    out["model_version"] = model_version()
+    return out
@@ -0,0 +1,391 @@
+"""
+Multi-process disease inference: N worker processes pinned to core slices, fed through a
+shared-memory ring of preprocessed tensors. The API process only decodes and enqueues.
+
+Only the tensors are shared: each worker loads its own copy of the model, so memory
+grows by about one model per worker. (The TFLite interpreter mmaps the .tflite file,
+so its weights are shared through the page cache; TensorFlow and ONNX Runtime copy
+them into each process, so prefer DISEASE_BACKEND=tflite or onnx with workers.) Each
+worker has its own pipes, so the pool knows which slots a worker holds: when one dies
+those requests fail at once and the worker is restarted. A worker that fails to load
+its model is not restarted (the next one would fail the same way).
+"""
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import wait as wait_connections
+from typing import Any
+
+from backend.api.services.inference_backends import INPUT_SIZE
+
+logger = logging.getLogger(__name__)
+
+_IN_FLOATS = INPUT_SIZE[0] * INPUT_SIZE[1] * 3
+
+
+def _core_slices(num_workers: int) -> list[list[int]]:
+    """Split the CPUs this process may use into num_workers contiguous slices."""
+    try:
+        cores = sorted(os.sched_getaffinity(0))
+    except AttributeError:  # not available on macOS/Windows
+        cores = list(range(os.cpu_count() or 1))
+    per = max(1, len(cores) // num_workers)
+    return [cores[(i * per) % len(cores):(i * per) % len(cores) + per] for i in range(num_workers)]
+
+
+def _slot_views(shm_buf, slots: int, num_classes: int):
+    import numpy as np
+    inputs = np.ndarray((slots, *INPUT_SIZE, 3), dtype=np.float32, buffer=shm_buf)
+    outputs = np.ndarray(
+        (slots, num_classes), dtype=np.float32, buffer=shm_buf, offset=inputs.nbytes
+    )
+    return inputs, outputs
+
+
+def _worker_main(worker_id, shm_name, slots, num_classes, backend_name, cores,
+                 threads, max_batch, requests, results):
+    # requests / results: this worker's ends of its two pipes
+    """Worker process: load the backend once, then run batches of ring slots."""
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+    # Intra-op threads sized to this worker's cores; one inter-op thread, since the
+    # graph is a single chain and parallelism across requests comes from the workers.
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+
+    from multiprocessing import shared_memory
+
+    import numpy as np
+    from backend.api.services.inference_backends import load_backend
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    inputs, outputs = _slot_views(shm.buf, slots, num_classes)
+    t0 = time.perf_counter()
+    try:
+        backend = load_backend(backend_name, num_threads=threads)
+        backend.warmup()
+    except Exception as e:
+        results.send(("failed", worker_id, str(e)))
+        return
+    results.send(("ready", worker_id, time.perf_counter() - t0))
+
+    stop = False
+    while not stop:
+        try:
+            batch = [requests.recv()]
+            while len(batch) < max_batch and requests.poll():
+                batch.append(requests.recv())
+        except EOFError:  # the API process went away
+            break
+        if None in batch:
+            stop = True
+            batch = [s for s in batch if s is not None]
+        if not batch:
+            continue
+        try:
+            x = backend.preprocess(inputs[batch])
+            outputs[batch] = backend.predict(x)
+            for slot in batch:
+                results.send(("done", slot, None))
+        except Exception as e:
+            for slot in batch:
+                results.send(("done", slot, str(e)))
+    del inputs, outputs
+    shm.close()
+
+
+class InferencePool:
+    """
+    Ring of `slots` input/output tensors in one shared-memory block. Callers take a
+    free slot (blocking when the ring is full), write their tensor, and send only the
+    slot index to the least busy worker; a dispatcher thread resolves each caller's
+    future and restarts workers that die.
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        *,
+        backend_name: str,
+        num_classes: int,
+        slots: int = 64,
+        max_batch: int = 16,
+        timeout_s: float = 30.0,
+    ):
+        self.num_workers = num_workers
+        self.backend_name = backend_name
+        self.num_classes = num_classes
+        self.slots = slots
+        self.max_batch = max_batch
+        self.timeout_s = timeout_s
+        self._ctx = mp.get_context("spawn")
+        self._workers: list[dict[str, Any]] = []
+        self._shm = None
+        self._free: queue.Queue = queue.Queue()
+        self._futures: dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._reported: set[int] = set()  # worker ids that finished loading, ok or not
+        self._load_times: dict[int, float] = {}
+        self._load_errors: list[str] = []
+        self._errors: list[str] = []
+        self._stopping = False
+        self.completed = 0
+        self.restarts = 0
+
+    def start(self) -> None:
+        from multiprocessing import shared_memory
+        if self.backend_name == "tf":
+            logger.warning(
+                "DISEASE_WORKER_PROCESSES=%d with DISEASE_BACKEND=tf: every worker loads its own"
+                " copy of the TensorFlow model (about %dx model memory). Use tflite (weights"
+                " mmapped and shared) or onnx to cut this.",
+                self.num_workers, self.num_workers,
+            )
+        nbytes = self.slots * (_IN_FLOATS + self.num_classes) * 4
+        self._shm = shared_memory.SharedMemory(create=True, size=nbytes)
+        self._inputs, self._outputs = _slot_views(self._shm.buf, self.slots, self.num_classes)
+        for slot in range(self.slots):
+            self._free.put(slot)
+        self._slices = _core_slices(self.num_workers)
+        self._workers = [self._spawn(i) for i in range(self.num_workers)]
+        threading.Thread(target=self._dispatch, name="inference-dispatch", daemon=True).start()
+
+    def _spawn(self, i: int) -> dict[str, Any]:
+        req_recv, req_send = self._ctx.Pipe(duplex=False)
+        res_recv, res_send = self._ctx.Pipe(duplex=False)
+        cores = self._slices[i]
+        p = self._ctx.Process(
+            target=_worker_main,
+            args=(i, self._shm.name, self.slots, self.num_classes, self.backend_name,
+                  cores, len(cores), self.max_batch, req_recv, res_send),
+            name=f"inference-worker-{i}",
+            daemon=True,
+        )
+        p.start()
+        req_recv.close()
+        res_send.close()
+        return {
+            "id": i, "process": p, "send": req_send, "send_lock": threading.Lock(),
+            "results": res_recv, "assigned": set(), "loaded": False, "dead": False,
+        }
+
+    def wait_ready(self, timeout: float | None = None) -> None:
+        """Block until every worker has loaded its model; raises if any failed."""
+        if not self._ready.wait(timeout):
+            raise TimeoutError("Inference workers did not start in time")
+        if self._load_errors:
+            raise RuntimeError(f"Inference worker failed to load: {self._load_errors[0]}")
+
+    def _submit(self, slot: int) -> None:
+        with self._lock:
+            live = [w for w in self._workers if not w["dead"]]
+            if not live:
+                raise RuntimeError("No inference worker is running")
+            w = min(live, key=lambda w: len(w["assigned"]))
+            w["assigned"].add(slot)
+        try:
+            with w["send_lock"]:
+                w["send"].send(slot)
+        except OSError:  # worker already gone; the dispatcher fails the slot
+            pass
+
+    def _dispatch(self) -> None:
+        last_check = time.monotonic()
+        while not self._stopping:
+            with self._lock:
+                conns = {w["results"]: w for w in self._workers if not w["dead"]}
+            if not conns:
+                time.sleep(0.5)
+                continue
+            for conn in wait_connections(list(conns), timeout=0.5):
+                w = conns[conn]
+                try:
+                    kind, key, payload = conn.recv()
+                except (EOFError, OSError):
+                    self._restart(w)
+                    continue
+                self._handle(w, kind, key, payload)
+            if time.monotonic() - last_check >= 0.5:
+                for w in list(self._workers):
+                    if not w["dead"] and not w["process"].is_alive():
+                        self._restart(w)
+                last_check = time.monotonic()
+
+    def _handle(self, w: dict, kind: str, key: int, payload) -> None:
+        if kind == "ready":
+            with self._lock:
+                w["loaded"] = True
+                self._load_times[key] = round(payload, 3)
+            self._reported_loaded(key)
+            return
+        if kind == "failed":
+            self._load_failed(w, payload)
+            return
+        with self._lock:
+            w["assigned"].discard(key)
+        self._finish(key, payload)
+
+    def _finish(self, slot: int, error: str | None) -> None:
+        with self._lock:
+            fut = self._futures.pop(slot, None)
+            self.completed += 1
+        if fut is None:  # caller timed out; slot can be reused now
+            self._free.put(slot)
+        elif error is not None:
+            fut.set_exception(RuntimeError(error))
+        else:
+            fut.set_result(slot)
+
+    def _reported_loaded(self, i: int) -> None:
+        """Count worker i towards wait_ready once, however often it is restarted."""
+        with self._lock:
+            self._reported.add(i)
+            if len(self._reported) == self.num_workers:
+                self._ready.set()
+
+    def _retire(self, w: dict, reason: str) -> set[int] | None:
+        """Mark w dead and close its pipes; returns the slots it held. None if already done."""
+        with self._lock:
+            if self._workers[w["id"]] is not w or w["dead"]:
+                return None
+            w["dead"] = True
+            lost = set(w["assigned"])
+            w["assigned"].clear()
+            self._errors.append(reason)
+        for conn in (w["send"], w["results"]):
+            conn.close()
+        return lost
+
+    def _load_failed(self, w: dict, error: str) -> None:
+        """A worker that can't load its model is final: record it, don't respawn."""
+        i = w["id"]
+        lost = self._retire(w, f"worker {i} failed to load: {error}")
+        if lost is None:
+            return
+        logger.error("Inference worker %d failed to load its model: %s", i, error)
+        with self._lock:
+            self._load_errors.append(error)
+        w["process"].join(timeout=5)
+        for slot in lost:
+            self._finish(slot, f"Inference worker {i} failed to load")
+        self._reported_loaded(i)
+
+    def _restart(self, w: dict) -> None:
+        """Fail the slots a dead worker held and start a replacement."""
+        if self._stopping:
+            return
+        p = w["process"]
+        p.join(timeout=5)
+        i = w["id"]
+        if not w["loaded"]:  # died while loading: as final as an explicit "failed"
+            error = f"exited with code {p.exitcode} while loading"
+            try:
+                if w["results"].poll():  # its "failed" report may not have been read yet
+                    kind, _, payload = w["results"].recv()
+                    if kind == "failed":
+                        error = payload
+            except (EOFError, OSError):
+                pass
+            self._load_failed(w, error)
+            return
+        lost = self._retire(w, f"worker {i} exited with code {p.exitcode}")
+        if lost is None:
+            return
+        logger.error("Inference worker %d exited (code %s); restarting", i, p.exitcode)
+        for slot in lost:
+            self._finish(slot, f"Inference worker {i} died")
+        replacement = self._spawn(i)
+        replacement["loaded"] = True  # its model loaded before; a failed reload reports "failed"
+        with self._lock:
+            self._workers[i] = replacement
+            self.restarts += 1
+
+    def predict_batch(self, batch) -> Any:
+        """(n, 224, 224, 3) float32 pixels -> (n, num_classes) probabilities."""
+        import numpy as np
+        out = np.empty((len(batch), self.num_classes), dtype=np.float32)
+        pending: list[tuple[int, int, Future]] = []
+
+        def collect() -> None:
+            while pending:
+                j, slot, fut = pending[0]
+                fut.result(timeout=self.timeout_s)
+                out[j] = self._outputs[slot]
+                pending.pop(0)
+                self._free.put(slot)
+
+        try:
+            for j, row in enumerate(batch):
+                try:
+                    slot = self._free.get_nowait()
+                except queue.Empty:
+                    # Ring is full: finish our own in-flight rows before waiting, so
+                    # callers holding slots never wait on each other.
+                    collect()
+                    try:
+                        slot = self._free.get(timeout=self.timeout_s)
+                    except queue.Empty:
+                        raise TimeoutError("Inference ring buffer full") from None
+                self._inputs[slot] = row
+                fut: Future = Future()
+                with self._lock:
+                    self._futures[slot] = fut
+                try:
+                    self._submit(slot)
+                except RuntimeError:  # no worker left to take it
+                    with self._lock:
+                        self._futures.pop(slot, None)
+                    self._free.put(slot)
+                    raise
+                pending.append((j, slot, fut))
+            collect()
+            return out
+        finally:
+            for _, slot, _ in pending:
+                with self._lock:
+                    in_flight = self._futures.pop(slot, None) is not None
+                if not in_flight:  # finished: the slot is ours to free
+                    self._free.put(slot)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": self.num_workers,
+                "alive": sum(w["process"].is_alive() for w in self._workers),
+                "failed": sum(w["dead"] for w in self._workers),
+                "backend": self.backend_name,
+                "slots": self.slots,
+                "free_slots": self._free.qsize(),
+                "in_flight": len(self._futures),
+                "completed": self.completed,
+                "restarts": self.restarts,
+                "load_time_s": dict(self._load_times),
+                "errors": list(self._errors),
+            }
+
+    def shutdown(self) -> None:
+        self._stopping = True
+        for w in self._workers:
+            try:
+                with w["send_lock"]:
+                    w["send"].send(None)
+            except (OSError, ValueError):  # ValueError: pipe already closed
+                pass
+        for w in self._workers:
+            p = w["process"]
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+            w["send"].close()
+            w["results"].close()
+        self._workers = []
+        if self._shm is not None:
+            del self._inputs, self._outputs
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
@@ -10,10 +10,84 @@ BACKEND_DIR = API_DIR.parent
 DISEASE_MODEL_DIR = BACKEND_DIR / "plant_disease_recognition_model"
 DISEASE_MODEL_PATH = DISEASE_MODEL_DIR / "plant_disease_model_working.h5"
 DISEASE_CLASSES_PATH = DISEASE_MODEL_DIR / "classes.txt"
+# Post-training quantized model to serve: "" (float), "dynamic" or "int8" (TFLite only)
+DISEASE_QUANTIZATION = os.getenv("DISEASE_QUANTIZATION", "")
+# Inference runtime: tf (the .h5 above), tflite or onnx (exported with export_model.py)
+DISEASE_BACKEND = os.getenv("DISEASE_BACKEND", "tflite" if DISEASE_QUANTIZATION else "tf")
+_tflite_name = f"plant_disease_model_{DISEASE_QUANTIZATION}.tflite" if DISEASE_QUANTIZATION else "plant_disease_model.tflite"
+DISEASE_TFLITE_PATH = Path(os.getenv("DISEASE_TFLITE_PATH", str(DISEASE_MODEL_DIR / _tflite_name)))
+DISEASE_ONNX_PATH = Path(os.getenv("DISEASE_ONNX_PATH", str(DISEASE_MODEL_DIR / "plant_disease_model.onnx")))
+# Intra-op threads for the inference runtime (0 = runtime default)
+DISEASE_NUM_THREADS = int(os.getenv("DISEASE_NUM_THREADS", "0"))
+
+# Upload limits: per-image byte cap, read chunk size
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(15 * 1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(256 * 1024)))
+
+# Uploaded images above this many pixels are rejected before decoding (decompression bombs)
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", str(100_000_000)))
+
+# Inference worker processes (0 = run the model in the API process). Each worker is
+# pinned to its own slice of cores; tensors travel through a shared-memory ring. Each
+# worker loads its own copy of the model (about N x model memory; TFLite weights are
+# mmapped and shared, so use tflite or onnx here: tf logs a warning at startup). Dead
+# workers are restarted; a worker that fails to load its model is not.
+DISEASE_WORKER_PROCESSES = int(os.getenv("DISEASE_WORKER_PROCESSES", "0"))
+DISEASE_WORKER_SLOTS = int(os.getenv("DISEASE_WORKER_SLOTS", "64"))
+DISEASE_WORKER_START_TIMEOUT_S = float(os.getenv("DISEASE_WORKER_START_TIMEOUT_S", "300"))
+
+# Micro-batching of concurrent disease predictions
+DISEASE_BATCH_MAX_SIZE = int(os.getenv("DISEASE_BATCH_MAX_SIZE", "16"))
+DISEASE_BATCH_MAX_WAIT_MS = float(os.getenv("DISEASE_BATCH_MAX_WAIT_MS", "5"))
+# Cache of disease results keyed by image content hash + model version
+DISEASE_CACHE_SIZE = int(os.getenv("DISEASE_CACHE_SIZE", "2048"))
+DISEASE_CACHE_PERSIST = os.getenv("DISEASE_CACHE_PERSIST", "0") not in ("0", "false", "False", "")
+# Defaults to a fingerprint of the model + classes files; set explicitly to pin it
+DISEASE_MODEL_VERSION = os.getenv("DISEASE_MODEL_VERSION", "")
+
+# Per-workload thread pools: (workers, max running + queued calls before 503).
+# Inference threads mostly wait on the micro-batcher, so keep them >= the batch size.
+EXECUTOR_LIMITS = {
+    "inference": (
+        int(os.getenv("INFERENCE_WORKERS", str(DISEASE_BATCH_MAX_SIZE))),
+        int(os.getenv("INFERENCE_MAX_PENDING", "64")),
+    ),
+    "ifs": (
+        int(os.getenv("IFS_WORKERS", "8")),
+        int(os.getenv("IFS_MAX_PENDING", "64")),
+    ),
+    "db": (
+        int(os.getenv("DB_WORKERS", "4")),
+        int(os.getenv("DB_MAX_PENDING", "128")),
+    ),
+}
+# Retry-After (seconds) sent with 503 when a workload queue is full
+OVERLOAD_RETRY_AFTER_S = int(os.getenv("OVERLOAD_RETRY_AFTER_S", "2"))
+
+# Max images accepted by POST /analyze/batch
+ANALYZE_BATCH_MAX_IMAGES = int(os.getenv("ANALYZE_BATCH_MAX_IMAGES", "50"))
+
+# Load the disease model (plus a dummy forward pass) and the IFS CSV at startup,
+# in the background; GET /ready reports progress. Set to 0 to load lazily.
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "1") not in ("0", "false", "False", "")
 
 # IFS recommender
 IFS_DIR = BACKEND_DIR / "ifs_recommender"
 IFS_CSV_PATH = IFS_DIR / "ifs - TN_IFS_TNAU_Complete.csv"
+# Offline place -> district gazetteer (built with backend.ifs_recommender.gazetteer); used if present
+GAZETTEER_PATH = Path(os.getenv("GAZETTEER_PATH", str(IFS_DIR / "tn_gazetteer.sqlite")))
+# Bounded memo of district input -> matched CSV district
+IFS_MATCH_CACHE_SIZE = int(os.getenv("IFS_MATCH_CACHE_SIZE", "2048"))
+# GET /ifs: Cache-Control max-age (responses carry an ETag of the CSV version) and
+# the most districts one /ifs/batch call may ask for
+IFS_CACHE_MAX_AGE_S = int(os.getenv("IFS_CACHE_MAX_AGE_S", "3600"))
+IFS_BATCH_MAX_DISTRICTS = int(os.getenv("IFS_BATCH_MAX_DISTRICTS", "50"))
+
+# Geocode cache: in-memory LRU in front of the geocode_cache table
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "4096"))
+GEOCODE_CACHE_TTL_S = float(os.getenv("GEOCODE_CACHE_TTL_S", str(30 * 24 * 3600)))
+GEOCODE_NEGATIVE_TTL_S = float(os.getenv("GEOCODE_NEGATIVE_TTL_S", str(24 * 3600)))
+GEOCODE_CACHE_PERSIST = os.getenv("GEOCODE_CACHE_PERSIST", "1") not in ("0", "false", "False", "")
 
 # Database: PostgreSQL in production; SQLite for local (file in project root)
 # Use forward slashes so sqlite:/// URL is valid on Windows too
@@ -25,3 +99,55 @@ DATABASE_URL = os.getenv(
 # Render/Railway etc. use postgres:// but SQLAlchemy 1.4+ expects postgresql://
 if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+
+# Connection pool (ignored for in-memory SQLite). Pre-ping tests a connection before
+# use so a DB restart doesn't surface as errors on stale pooled connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE_S = int(os.getenv("DB_POOL_RECYCLE_S", "1800"))
+DB_POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "30"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") not in ("0", "false", "False", "")
+# SQLite pragmas set on every new connection (WAL lets reads run during writes)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+# Serve history reads through an async engine (asyncpg / aiosqlite) instead of threads
+DB_ASYNC = os.getenv("DB_ASYNC", "0") not in ("0", "false", "False", "")
+# Create/upgrade tables in the background at startup when the models changed since the
+# last run (one query otherwise). Set 0 to do it from the deploy step instead, with
+# `python -m backend.api.migrate init-db`.
+DB_INIT_ON_STARTUP = os.getenv("DB_INIT_ON_STARTUP", "1") not in ("0", "false", "False", "")
+
+# Maintain the hourly history_rollup table on every log write and answer
+# /history/stats from it (rebuild with `python -m backend.api.migrate rebuild-rollup`)
+HISTORY_ROLLUP = os.getenv("HISTORY_ROLLUP", "0") not in ("0", "false", "False", "")
+
+# GET /metrics (Prometheus text format) and per-stage timing; off = no timing overhead
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "0") not in ("0", "false", "False", "")
+
+# Write-behind query log: create_log returns a pre-allocated id at once and rows are
+# inserted in batches by a background thread. Rows that can't be written (DB down)
+# go to a local spool file and are replayed when the DB is back. When the queue is
+# full, create_log inserts synchronously instead. Give each API process its own
+# spool path if you run several.
+DB_WRITE_BEHIND = os.getenv("DB_WRITE_BEHIND", "0") not in ("0", "false", "False", "")
+DB_WRITE_BEHIND_MAX_QUEUE = int(os.getenv("DB_WRITE_BEHIND_MAX_QUEUE", "10000"))
+DB_WRITE_BEHIND_BATCH_SIZE = int(os.getenv("DB_WRITE_BEHIND_BATCH_SIZE", "500"))
+DB_WRITE_BEHIND_FLUSH_MS = float(os.getenv("DB_WRITE_BEHIND_FLUSH_MS", "200"))
+DB_WRITE_BEHIND_RETRY_S = float(os.getenv("DB_WRITE_BEHIND_RETRY_S", "5"))
+DB_WRITE_BEHIND_SPOOL_PATH = Path(
+    os.getenv("DB_WRITE_BEHIND_SPOOL_PATH", str(BACKEND_DIR.parent / "query_log.spool.jsonl"))
+)
+# Log ids reserved per DB round trip (SQLite; PostgreSQL draws from the id sequence)
+DB_ID_BLOCK_SIZE = int(os.getenv("DB_ID_BLOCK_SIZE", "1000"))
+
+# Opt-in per-request profiling (debug only): with this on, /analyze?profile=cprofile
+# (or header X-Profile: cprofile|sample, optionally ",tf") saves a profile of that
+# request. The newest PROFILING_MAX_CAPTURES are kept, listed at GET /admin/profiles.
+# Both the flag and /admin/profiles require header X-Admin-Token: PROFILING_ADMIN_TOKEN;
+# with no token set, profiling stays off.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") not in ("0", "false", "False", "")
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN", "")
+PROFILING_DIR = Path(os.getenv("PROFILING_DIR", str(BACKEND_DIR.parent / "profiles")))
+PROFILING_MAX_CAPTURES = int(os.getenv("PROFILING_MAX_CAPTURES", "20"))
+PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILING_SAMPLE_INTERVAL_MS", "5"))
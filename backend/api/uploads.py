@@ -0,0 +1,138 @@
+"""Bounded upload ingestion: chunked reads with a size cap and early image-type sniffing."""
+from typing import Optional
+
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+
+from backend.api.settings import MAX_UPLOAD_BYTES, UPLOAD_CHUNK_BYTES
+
+# Magic numbers of the image types the decoder accepts.
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+    (b"BM", "bmp"),
+)
+
+
+class UploadRejected(ValueError):
+    """Upload refused before decoding; status_code is the HTTP status to answer with."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+
+
+def sniff_image_type(head: bytes) -> Optional[str]:
+    """Image type from the first bytes of a file, or None if not an accepted image."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for magic, kind in _SIGNATURES:
+        if head.startswith(magic):
+            return kind
+    return None
+
+
+async def read_upload(
+    file: UploadFile,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    chunk_size: int = UPLOAD_CHUNK_BYTES,
+) -> memoryview:
+    """
+    Read an uploaded image in chunks into one buffer and return a memoryview of it
+    (no further copies on the way to hashing/decoding). Rejects, as soon as it can
+    tell: declared or actual size over `max_bytes` (413), non-image content (415),
+    empty files (400).
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise UploadRejected(413, f"Image too large ({file.size} bytes); max is {max_bytes}")
+    buf = bytearray(file.size) if file.size else bytearray()
+    n = 0
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        if n == 0 and sniff_image_type(chunk[:16]) is None:
+            raise UploadRejected(415, "Unsupported file type; upload a JPEG, PNG, WebP, GIF or BMP image")
+        if n + len(chunk) > max_bytes:
+            raise UploadRejected(413, f"Image too large; max is {max_bytes} bytes")
+        if n + len(chunk) <= len(buf):
+            buf[n:n + len(chunk)] = chunk
+        else:
+            del buf[n:]
+            buf += chunk
+        n += len(chunk)
+    if n == 0:
+        raise UploadRejected(400, "Empty image file")
+    return memoryview(buf)[:n]
+
+
+class BodySizeLimitMiddleware:
+    """
+    ASGI middleware capping request body size per path (`limits`: path -> max
+    bytes), before the multipart parser spools it: refuses a too-large
+    Content-Length up front, and cuts chunked bodies off once they pass the limit
+    (the app sees a disconnect; the middleware answers 413).
+    """
+
+    def __init__(self, app, limits: dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" else None
+        if limit is None:
+            return await self.app(scope, receive, send)
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > limit:
+                    return await self._reject(scope, receive, send, limit)
+                break
+
+        received = 0
+        overflowed = False
+        started = False
+
+        async def limited_receive():
+            # Past the limit the app sees a client disconnect; raising here would
+            # be swallowed by the form parser and answered as a 400.
+            nonlocal received, overflowed
+            if overflowed:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    overflowed = True
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracking_send(message):
+            nonlocal started
+            if overflowed and not started:
+                return  # the 413 below replaces whatever the app answers
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except Exception:
+            if not overflowed:
+                raise
+        if overflowed and not started:
+            await self._reject(scope, receive, send, limit)
+
+    async def _reject(self, scope, receive, send, limit: int):
+        response = JSONResponse(
+            status_code=413,
+            content={"detail": f"Request body too large; max is {limit} bytes"},
+            headers={"Connection": "close"},
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,293 @@
+"""
+Write-behind for the query log (DB_WRITE_BEHIND=1): create_log hands out a
+pre-allocated id immediately and a background thread inserts queued rows in
+multi-row batches. Batches that fail (DB unreachable) are appended to a local
+spool file and replayed once the DB accepts writes again.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from backend.api import db
+from backend.api.settings import (
+    DB_ID_BLOCK_SIZE,
+    DB_WRITE_BEHIND_BATCH_SIZE,
+    DB_WRITE_BEHIND_FLUSH_MS,
+    DB_WRITE_BEHIND_MAX_QUEUE,
+    DB_WRITE_BEHIND_RETRY_S,
+    DB_WRITE_BEHIND_SPOOL_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class WriteBehindLog:
+    """
+    Bounded queue of complete query_log rows drained by one writer thread. Ids come
+    from blocks reserved ahead of time (db.reserve_log_ids), so submit() only touches
+    the DB when a block runs out, and the writer refills before that happens.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval_s: float = 0.2,
+        retry_s: float = 5.0,
+        spool_path: Path,
+        id_block_size: int = 1000,
+    ):
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.flush_interval_s = max(0.0, flush_interval_s)
+        self.retry_s = retry_s
+        self.spool_path = Path(spool_path)
+        self.id_block_size = max(1, id_block_size)
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._ids: list[int] = []
+        self._id_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._loop, name="query-log-writer", daemon=True)
+        self._started = False
+        self._stopping = False
+        self._db_retry_at = 0.0
+        # Stats
+        self.submitted = 0
+        self.sync_writes = 0  # rows inserted by submit() because the queue was full
+        self.batches = 0
+        self.written = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.last_error: str | None = None
+
+    def _ensure_started(self) -> None:
+        if not self._started:
+            with self._lock:
+                if not self._started:
+                    self._thread.start()
+                    self._started = True
+
+    def _take_ids(self, n: int) -> list[int]:
+        with self._id_lock:
+            if len(self._ids) < n:
+                self._ids.extend(db.reserve_log_ids(max(self.id_block_size, n - len(self._ids))))
+            ids, self._ids = self._ids[:n], self._ids[n:]
+            return ids
+
+    def _refill_ids(self) -> None:
+        """Reserve the next block while half the current one is left."""
+        with self._id_lock:
+            if len(self._ids) >= self.id_block_size // 2:
+                return
+        try:
+            ids = db.reserve_log_ids(self.id_block_size)
+        except Exception as e:
+            self._db_failed(e)
+            return
+        with self._id_lock:
+            self._ids.extend(ids)
+
+    def submit(self, rows: list[dict]) -> list[dict]:
+        """
+        Queue create_log-style rows; returns id + created_at for each, in order.
+        Rows that don't fit in the queue are inserted synchronously instead.
+        """
+        if self._stopping:
+            raise RuntimeError("Query log writer is shut down")
+        self._ensure_started()
+        now = datetime.utcnow()
+        ids = self._take_ids(len(rows))
+        full = [db.log_row(log_id, now, fields) for log_id, fields in zip(ids, rows)]
+        for i, row in enumerate(full):
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                db.insert_logs(full[i:])
+                with self._lock:
+                    self.sync_writes += len(full) - i
+                break
+        with self._lock:
+            self.submitted += len(rows)
+        return [{"id": log_id, "created_at": now} for log_id in ids]
+
+    def _collect(self) -> list:
+        try:
+            batch = [self._queue.get(timeout=self.retry_s)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval_s
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self) -> None:
+        while True:
+            batch = self._collect()
+            stop = bool(batch) and batch[-1] is _STOP
+            rows = [r for r in batch if r is not _STOP]
+            if rows:
+                self._write(rows)
+            if stop:
+                self._drain()
+                return
+            if time.monotonic() >= self._db_retry_at:
+                self._replay_spool()
+                self._refill_ids()
+
+    def _drain(self) -> None:
+        rows = []
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not _STOP:
+                rows.append(row)
+        for i in range(0, len(rows), self.batch_size):
+            self._write(rows[i:i + self.batch_size])
+
+    def _db_failed(self, e: Exception) -> None:
+        self._db_retry_at = time.monotonic() + self.retry_s
+        with self._lock:
+            self.last_error = str(e)
+
+    def _write(self, rows: list[dict]) -> None:
+        if time.monotonic() < self._db_retry_at or self.spool_path.exists():
+            # DB recently failed, or older rows are waiting: keep the spool in order.
+            self._spool(rows)
+            return
+        try:
+            db.insert_logs(rows)
+        except Exception as e:
+            logger.warning("Query log batch of %d failed, spooling: %s", len(rows), e)
+            self._db_failed(e)
+            self._spool(rows)
+            return
+        with self._lock:
+            self.batches += 1
+            self.written += len(rows)
+
+    def _spool(self, rows: list[dict]) -> None:
+        try:
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps({**row, "created_at": row["created_at"].isoformat()},
+                                       default=str) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+        except OSError:
+            logger.exception("Could not spool %d query log rows; they are lost", len(rows))
+            return
+        with self._lock:
+            self.spooled += len(rows)
+
+    def _replay_spool(self) -> None:
+        if not self.spool_path.exists():
+            return
+        try:
+            with open(self.spool_path, "r", encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f if line.strip()]
+            for row in rows:
+                row["created_at"] = datetime.fromisoformat(row["created_at"])
+            n = 0
+            for i in range(0, len(rows), self.batch_size):
+                # A crash between commit and unlink can replay rows twice.
+                n += db.insert_logs(rows[i:i + self.batch_size], skip_existing=True)
+        except Exception as e:
+            logger.warning("Query log spool replay failed, will retry: %s", e)
+            self._db_failed(e)
+            return
+        self.spool_path.unlink()
+        logger.info("Replayed %d spooled query log rows", n)
+        with self._lock:
+            self.replayed += n
+
+    def flush(self, timeout: float | None = None) -> None:
+        """Stop accepting rows, write (or spool) everything queued, stop the thread."""
+        self._stopping = True
+        if not self._started:
+            return
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._thread.is_alive():
+            # Short waits: a full queue only drains while the writer is alive.
+            try:
+                self._queue.put(_STOP, timeout=0.1)
+                break
+            except queue.Full:
+                if deadline is not None and time.monotonic() >= deadline:
+                    logger.warning("Query log writer did not finish within %ss", timeout)
+                    return
+        else:
+            logger.warning("Query log writer thread died; writing the queue from here")
+            self._drain()
+            return
+        self._thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        if self._thread.is_alive():
+            logger.warning("Query log writer did not finish within %ss", timeout)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "submitted": self.submitted,
+                "sync_writes": self.sync_writes,
+                "batches": self.batches,
+                "written": self.written,
+                "spooled": self.spooled,
+                "replayed": self.replayed,
+                "spool_pending": self.spool_path.exists(),
+                "ids_reserved": len(self._ids),
+                "last_error": self.last_error,
+            }
+
+
+# Lazy singleton
+_writer: WriteBehindLog | None = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> WriteBehindLog:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = WriteBehindLog(
+                    max_queue=DB_WRITE_BEHIND_MAX_QUEUE,
+                    batch_size=DB_WRITE_BEHIND_BATCH_SIZE,
+                    flush_interval_s=DB_WRITE_BEHIND_FLUSH_MS / 1000.0,
+                    retry_s=DB_WRITE_BEHIND_RETRY_S,
+                    spool_path=DB_WRITE_BEHIND_SPOOL_PATH,
+                    id_block_size=DB_ID_BLOCK_SIZE,
+                )
+    return _writer
+
+
+def submit(rows: list[dict]) -> list[dict]:
+    return get_writer().submit(rows)
+
+
+def stats() -> dict[str, Any] | None:
+    """Writer stats, or None if write-behind was never used."""
+    return _writer.stats() if _writer is not None else None
+
+
+def shutdown(timeout: float = 10.0) -> None:
+    if _writer is not None:
+        _writer.flush(timeout)
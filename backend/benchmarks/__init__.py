@@ -0,0 +1 @@
+# Benchmarks for the AgriSmart backend (run with python -m backend.benchmarks.<name>)
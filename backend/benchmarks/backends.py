@@ -0,0 +1,79 @@
+"""
+Disease inference backends compared: cold start, peak RSS and per-call latency at a
+given batch size (default 1, a single /analyze). Each backend runs in a fresh
+subprocess; backends whose model file is missing are skipped.
+
+Usage (from the project root, PYTHONPATH=.):
+    python -m backend.benchmarks.backends --n 50
+    python -m backend.benchmarks.backends --backends tf onnx
+    python -m backend.benchmarks.backends --backends tflite --batch 8
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+
+def _child(name: str, n: int, batch: int) -> dict:
+    t0 = time.perf_counter()
+    import numpy as np
+    from backend.api.services.inference_backends import INPUT_SIZE, load_backend
+    backend = load_backend(name)
+    load_s = time.perf_counter() - t0
+    x = np.random.default_rng(0).uniform(0, 255, size=(batch, *INPUT_SIZE, 3)).astype(np.float32)
+    backend.predict(x)
+    cold_start_s = time.perf_counter() - t0
+
+    samples = []
+    for _ in range(n):
+        t1 = time.perf_counter()
+        backend.predict(x)
+        samples.append((time.perf_counter() - t1) * 1000.0)
+    samples.sort()
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss: bytes on macOS, KiB on Linux
+    return {
+        "import_and_load_s": round(load_s, 3),
+        "cold_start_s": round(cold_start_s, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20, 1),
+        "p50_ms": round(samples[len(samples) // 2], 2),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 2),
+    }
+
+
+def main(argv=None) -> int:
+    from backend.api.services.inference_backends import BACKENDS
+
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--backends", nargs="+", choices=sorted(BACKENDS), default=sorted(BACKENDS))
+    p.add_argument("--n", type=int, default=50, help="Timed calls per backend")
+    p.add_argument("--batch", type=int, default=1, help="Images per call")
+    p.add_argument("--child", help=argparse.SUPPRESS)
+    args = p.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(_child(args.child, args.n, args.batch)))
+        return 0
+
+    out = {"n": args.n, "batch": args.batch, "backends": {}}
+    for name in args.backends:
+        path = BACKENDS[name][1]
+        if not path.exists():
+            out["backends"][name] = {"skipped": f"model file not found: {path}"}
+            continue
+        res = subprocess.run(
+            [sys.executable, "-m", "backend.benchmarks.backends", "--child", name,
+             "--n", str(args.n), "--batch", str(args.batch)],
+            capture_output=True, text=True,
+        )
+        if res.returncode != 0:
+            out["backends"][name] = {"error": res.stderr.strip().splitlines()[-1:]}
+            continue
+        out["backends"][name] = json.loads(res.stdout.strip().splitlines()[-1])
+    print(json.dumps(out, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,147 @@
+"""
+/history page latency at increasing depth on a seeded SQLite log: offset paging
+without the (created_at, id) index (before) vs offset and keyset paging with it,
+and keyset pages that load full rows + JSON blobs vs the summary-column projection.
+
+Usage (from the project root, PYTHONPATH=.):
+    python -m backend.benchmarks.history --rows 1000000 --db /tmp/history_bench.db
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import time
+from datetime import datetime, timedelta
+
+PAGES = [1, 10, 100, 1000, 10000]
+
+DISTRICTS = ["Coimbatore", "Madurai", "Salem", "Thanjavur", "Tirunelveli", "Erode", "Vellore"]
+CLASSES = ["Tomato___Late_blight", "Potato___Early_blight", "Corn_(maize)___healthy", "Apple___Apple_scab"]
+
+
+def seed(path: str, rows: int) -> None:
+    """Create the schema through the app's models, then bulk-insert rows with raw SQL."""
+    from backend.api.models import init_db
+    init_db()
+    conn = sqlite3.connect(path)
+    if conn.execute("SELECT COUNT(*) FROM query_log").fetchone()[0] >= rows:
+        conn.close()
+        return
+    conn.execute("DELETE FROM query_log")
+    rng = random.Random(0)
+    start = datetime(2024, 1, 1)
+    recs = "Integrated farming: paddy + fish + poultry; " * 8
+
+    def gen():
+        t = start
+        for _ in range(rows):
+            t += timedelta(milliseconds=rng.randint(1, 60000))
+            d = rng.choice(DISTRICTS)
+            c = rng.choice(CLASSES)
+            conf = round(rng.random(), 4)
+            yield (
+                t.strftime("%Y-%m-%d %H:%M:%S.%f"),
+                d, d, "Paddy", "Clay",
+                json.dumps({"class": c, "confidence": conf,
+                            "top": [{"class": c, "confidence": 0.9}] * 3}),
+                json.dumps({"matched_district": d, "recommendations": [recs] * 3}),
+                c, conf, d,
+            )
+
+    conn.executemany(
+        "INSERT INTO query_log (created_at, location, district, crop, soil_type,"
+        " disease_result, ifs_result, disease_class, disease_confidence,"
+        " ifs_matched_district) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        gen(),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _median_ms(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000.0)
+    return round(statistics.median(times), 2)
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--db", default="/tmp/history_bench.db", help="SQLite file (reused if already seeded)")
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--repeat", type=int, default=5)
+    args = p.parse_args(argv)
+
+    # Point the app at the benchmark DB before its modules create the engine.
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.abspath(args.db)}"
+    t0 = time.perf_counter()
+    seed(args.db, args.rows)
+    seed_s = time.perf_counter() - t0
+
+    from sqlalchemy import tuple_
+
+    from backend.api import db
+    from backend.api.models import QueryLog, engine
+
+    index = next(i for i in QueryLog.__table__.indexes if i.name == "ix_query_log_created_at_id")
+    pages = [n for n in PAGES if (n - 1) * args.limit < args.rows]
+
+    def offset_page(n):
+        with db.get_db() as s:
+            db.list_logs(s, limit=args.limit, offset=(n - 1) * args.limit)
+
+    def cursor_for(n):
+        if n == 1:
+            return None
+        with sqlite3.connect(args.db) as conn:
+            created_at, log_id = conn.execute(
+                "SELECT created_at, id FROM query_log ORDER BY created_at DESC, id DESC"
+                " LIMIT 1 OFFSET ?", ((n - 1) * args.limit - 1,)
+            ).fetchone()
+        return db.encode_cursor(datetime.fromisoformat(created_at), log_id)
+
+    def keyset_page(cursor):
+        with db.get_db() as s:
+            db.list_logs(s, limit=args.limit, cursor=cursor)
+
+    def keyset_full_rows(cursor):
+        # What /history did before the summary columns: whole rows, JSON parsed.
+        with db.get_db() as s:
+            q = s.query(QueryLog).order_by(QueryLog.created_at.desc(), QueryLog.id.desc())
+            if cursor:
+                q = q.filter(tuple_(QueryLog.created_at, QueryLog.id) < tuple_(*db.decode_cursor(cursor)))
+            for r in q.limit(args.limit).all():
+                (r.disease_result or {}).get("class"), (r.ifs_result or {}).get("matched_district")
+
+    index.drop(bind=engine, checkfirst=True)
+    before = {n: _median_ms(lambda: offset_page(n), args.repeat) for n in pages}
+    index.create(bind=engine, checkfirst=True)
+    after_offset = {n: _median_ms(lambda: offset_page(n), args.repeat) for n in pages}
+    cursors = {n: cursor_for(n) for n in pages}
+    after_keyset = {n: _median_ms(lambda: keyset_page(cursors[n]), args.repeat) for n in pages}
+    full_rows = {n: _median_ms(lambda: keyset_full_rows(cursors[n]), args.repeat) for n in pages}
+
+    print(json.dumps({
+        "rows": args.rows,
+        "limit": args.limit,
+        "seed_s": round(seed_s, 1),
+        "page_ms_p50": {
+            str(n): {
+                "offset_no_index": before[n],
+                "offset_indexed": after_offset[n],
+                "keyset_indexed": after_keyset[n],
+                "keyset_full_rows": full_rows[n],
+            }
+            for n in pages
+        },
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
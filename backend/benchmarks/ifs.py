@@ -0,0 +1,63 @@
+"""
+IFS recommendations per second: rebuild-index-per-call vs the prebuilt index + match memo.
+
+Usage (from the project root, PYTHONPATH=.):
+    python -m backend.benchmarks.ifs --n 20000
+"""
+import argparse
+import json
+import time
+
+from backend.api.services import ifs
+from backend.ifs_recommender.recommend import recommend_for_district
+
+# Exact, differently-formatted and fuzzy inputs, as users type them.
+INPUTS = [
+    "Coimbatore",
+    "Kanchipuram",
+    "madurai district",
+    "  THANJAVUR ",
+    "Tiruchirappali",
+    "Kanyakumari",
+    "Salem",
+    "Tirunelveli",
+]
+
+
+def _rate(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(INPUTS[i % len(INPUTS)])
+    return n / (time.perf_counter() - t0)
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--n", type=int, default=20000, help="Recommendations per variant")
+    args = p.parse_args(argv)
+
+    records = ifs._get_records()
+    ok_inputs = []
+    for d in INPUTS:
+        try:
+            recommend_for_district(d, records)
+            ok_inputs.append(d)
+        except ValueError:
+            pass
+    INPUTS[:] = ok_inputs
+
+    before = _rate(lambda d: recommend_for_district(d, records), args.n)
+    after = _rate(lambda d: ifs.recommend(district=d), args.n)
+    print(json.dumps({
+        "n": args.n,
+        "inputs": INPUTS,
+        "before_per_s": round(before, 1),
+        "after_per_s": round(after, 1),
+        "speedup": round(after / before, 1),
+        "match_cache": ifs.match_cache_stats(),
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,61 @@
+"""
+Per-image disease inference latency: model.predict vs the traced inference function.
+
+Usage (from the project root, PYTHONPATH=.):
+    python -m backend.benchmarks.inference --n 50
+"""
+import argparse
+import json
+import statistics
+import time
+
+from backend.api.services.inference_backends import INPUT_SIZE, TensorFlowBackend
+
+
+def _time_calls(fn, x, n: int) -> dict:
+    t0 = time.perf_counter()
+    fn(x)
+    first_ms = (time.perf_counter() - t0) * 1000.0
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn(x)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    return {
+        "first_call_ms": round(first_ms, 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+        "p50_ms": round(samples[len(samples) // 2], 3),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+    }
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--n", type=int, default=50, help="Timed calls per path (after the first)")
+    args = p.parse_args(argv)
+
+    import numpy as np
+
+    t0 = time.perf_counter()
+    backend = TensorFlowBackend()
+    load_s = time.perf_counter() - t0
+
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0, 255, size=(1, *INPUT_SIZE, 3)).astype(np.float32)
+
+    old = _time_calls(lambda b: backend.model.predict(b, verbose=0), x, args.n)
+    new = _time_calls(backend.predict, x, args.n)
+    out = {
+        "model_load_s": round(load_s, 3),
+        "n": args.n,
+        "model_predict": old,
+        "traced_function": new,
+        "speedup_p50": round(old["p50_ms"] / new["p50_ms"], 2) if new["p50_ms"] else None,
+    }
+    print(json.dumps(out, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,276 @@
+"""
+Load test for the API: throughput and p50/p95/p99 latency for /analyze, /history
+and /history/{id}, plus cold-start time and peak memory.
+
+Drives the app in-process through httpx's ASGI transport (lifespan included) or a
+local uvicorn process over HTTP. Uploads are synthetic JPEGs of the given sizes;
+in-process runs swap the Nominatim geocoder for a stub with fixed latency, so
+location requests exercise the geocode path without network calls. The uvicorn
+server keeps the real geocoder, so there --location-share defaults to 0. Uses a fresh
+SQLite file unless DATABASE_URL is set. Disease inference uses whatever model the
+environment configures (e.g. DISEASE_BACKEND=onnx DISEASE_ONNX_PATH=...).
+
+Usage (from the project root, PYTHONPATH=.):
+    python -m backend.benchmarks.load --requests 200 --concurrency 16
+    python -m backend.benchmarks.load --server uvicorn --sizes 640x480 4000x3000 --out load.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+DISTRICTS = ["Coimbatore", "Madurai", "Salem", "Thanjavur", "Tirunelveli", "Erode", "Vellore"]
+
+
+def make_jpeg(width: int, height: int, seed: int) -> bytes:
+    """Smooth random colour field (photo-like, so JPEG sizes are realistic)."""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, size=(8, 8, 3), dtype=np.uint8)
+    img = Image.fromarray(small).resize((width, height), Image.BICUBIC)
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=85)
+    return buf.getvalue()
+
+
+def _percentile(sorted_ms: list[float], q: float) -> float | None:
+    if not sorted_ms:
+        return None
+    i = min(len(sorted_ms) - 1, max(0, round(q / 100.0 * len(sorted_ms) + 0.5) - 1))
+    return round(sorted_ms[i], 2)
+
+
+def _summary(samples: list[tuple[float, int]], wall_s: float) -> dict:
+    ms = sorted(t for t, _ in samples)
+    statuses: dict[str, int] = {}
+    for _, code in samples:
+        statuses[str(code)] = statuses.get(str(code), 0) + 1
+    return {
+        "requests": len(samples),
+        "statuses": dict(sorted(statuses.items())),
+        "throughput_rps": round(len(samples) / wall_s, 1) if wall_s else None,
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else None,
+        "p50_ms": _percentile(ms, 50),
+        "p95_ms": _percentile(ms, 95),
+        "p99_ms": _percentile(ms, 99),
+        "max_ms": round(ms[-1], 2) if ms else None,
+    }
+
+
+async def _drive(client, make_request, n: int, concurrency: int) -> dict:
+    """Run n requests, at most `concurrency` in flight; make_request(i) -> (method, url, kwargs)."""
+    sem = asyncio.Semaphore(concurrency)
+    samples: list[tuple[float, int]] = []
+    responses: list = [None] * n
+
+    async def one(i: int):
+        method, url, kwargs = make_request(i)
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                r = await client.request(method, url, **kwargs)
+                code = r.status_code
+                responses[i] = r
+            except Exception:
+                code = -1
+            samples.append(((time.perf_counter() - t0) * 1000.0, code))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n)))
+    return {"summary": _summary(samples, time.perf_counter() - t0), "responses": responses}
+
+
+async def _wait_ready(client, timeout_s: float) -> float | None:
+    """Seconds until GET /ready answers 200, or None on timeout."""
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout_s:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return time.perf_counter() - t0
+        except Exception:
+            pass
+        await asyncio.sleep(0.05)
+    return None
+
+
+async def _scenario(client, args, images: list[bytes]) -> dict:
+    rng = random.Random(0)
+
+    def analyze(i):
+        data = {"crop": "Paddy", "soil_type": "Clay"}
+        if args.location_share and rng.random() < args.location_share:
+            data["location"] = f"Village {i}, {rng.choice(DISTRICTS)}"
+        else:
+            data["district"] = rng.choice(DISTRICTS)
+        files = {"file": (f"leaf_{i}.jpg", images[i % len(images)], "image/jpeg")}
+        return "POST", "/analyze", {"data": data, "files": files}
+
+    out = {}
+    res = await _drive(client, analyze, args.requests, args.concurrency)
+    out["/analyze"] = res["summary"]
+    ids = [r.json().get("log_id") for r in res["responses"] if r is not None and r.status_code == 200]
+    ids = [i for i in ids if i is not None]
+
+    # Half first pages, half second pages (keyset cursor from a first page)
+    first = await client.get("/history", params={"limit": 50})
+    cursor = first.json().get("next_cursor") if first.status_code == 200 else None
+
+    def history(i):
+        params = {"limit": 50}
+        if i % 2 and cursor:
+            params["cursor"] = cursor
+        return "GET", "/history", {"params": params}
+
+    res = await _drive(client, history, args.requests, args.concurrency)
+    out["/history"] = res["summary"]
+
+    if ids:
+        res = await _drive(
+            client, lambda i: ("GET", f"/history/{rng.choice(ids)}", {}), args.requests, args.concurrency
+        )
+        out["/history/{id}"] = res["summary"]
+    else:
+        out["/history/{id}"] = {"skipped": "no successful /analyze to look up"}
+    return out
+
+
+def _stub_geocoder(latency_s: float) -> None:
+    from backend.api.services import geocode
+
+    def fake(location: str):
+        time.sleep(latency_s)
+        district = location.rsplit(",", 1)[-1].strip() or DISTRICTS[0]
+        return district, {"state_district": district, "source": "benchmark-stub"}
+
+    geocode._geocoder = geocode.CachedGeocoder(fake, persistent=False)
+
+
+def _peak_rss_mb(pid: int | None = None) -> float | None:
+    """VmHWM of a process (Linux), or this process's ru_maxrss."""
+    if pid is not None:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            return None
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20, 1)
+
+
+async def _run_inprocess(args, images) -> dict:
+    import httpx
+
+    t0 = time.perf_counter()
+    from backend.api.main import app
+    import_s = time.perf_counter() - t0
+    _stub_geocoder(args.geocode_latency_ms / 1000.0)
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            ready_s = await _wait_ready(client, args.ready_timeout)
+            cold = {
+                "import_s": round(import_s, 3),
+                "ready_s": round(import_s + ready_s, 3) if ready_s is not None else None,
+            }
+            endpoints = await _scenario(client, args, images)
+    return {"cold_start": cold, "endpoints": endpoints, "peak_rss_mb": _peak_rss_mb()}
+
+
+async def _run_uvicorn(args, images) -> dict:
+    import httpx
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    cmd = [sys.executable, "-m", "uvicorn", "backend.api.main:app",
+           "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, env=os.environ.copy())
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+            health_s = None
+            while time.perf_counter() - t0 < args.ready_timeout and proc.poll() is None:
+                try:
+                    if (await client.get("/health")).status_code == 200:
+                        health_s = time.perf_counter() - t0
+                        break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.05)
+            if health_s is None:
+                raise RuntimeError(f"uvicorn did not come up (exit code {proc.poll()})")
+            ready_s = await _wait_ready(client, args.ready_timeout)
+            cold = {
+                "health_s": round(health_s, 3),
+                "ready_s": round(health_s + ready_s, 3) if ready_s is not None else None,
+            }
+            endpoints = await _scenario(client, args, images)
+            peak = _peak_rss_mb(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return {"cold_start": cold, "endpoints": endpoints, "peak_rss_mb": peak}
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--server", choices=["inprocess", "uvicorn"], default="inprocess")
+    p.add_argument("--requests", type=int, default=200, help="Requests per endpoint")
+    p.add_argument("--concurrency", type=int, default=16)
+    p.add_argument("--sizes", nargs="+", default=["640x480", "1600x1200", "4000x3000"],
+                   help="Upload sizes WxH, cycled across requests")
+    p.add_argument("--distinct-images", type=int, default=64,
+                   help="Distinct JPEGs per size (repeats hit the disease result cache)")
+    p.add_argument("--location-share", type=float, default=None,
+                   help="Fraction of /analyze requests sent by location (geocoded) instead of district;"
+                        " default 0.5 in-process, 0 with uvicorn (real geocoder)")
+    p.add_argument("--geocode-latency-ms", type=float, default=50.0, help="Stub geocoder latency")
+    p.add_argument("--ready-timeout", type=float, default=300.0)
+    p.add_argument("--out", help="Write the JSON report here as well as to stdout")
+    args = p.parse_args(argv)
+    if args.location_share is None:
+        args.location_share = 0.5 if args.server == "inprocess" else 0.0
+
+    if "DATABASE_URL" not in os.environ:
+        tmp = tempfile.mkdtemp(prefix="agrismart-load-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/load.db"
+
+    sizes = [tuple(int(v) for v in s.lower().split("x")) for s in args.sizes]
+    t0 = time.perf_counter()
+    images = [make_jpeg(w, h, seed) for seed in range(args.distinct_images) for w, h in sizes]
+    gen_s = time.perf_counter() - t0
+
+    runner = _run_uvicorn if args.server == "uvicorn" else _run_inprocess
+    result = asyncio.run(runner(args, images))
+    report = {
+        "server": args.server,
+        "requests_per_endpoint": args.requests,
+        "concurrency": args.concurrency,
+        "sizes": args.sizes,
+        "image_bytes": {s: len(images[i]) for i, s in enumerate(args.sizes)},
+        "image_gen_s": round(gen_s, 1),
+        "location_share": args.location_share,
+        "geocode_stub_ms": args.geocode_latency_ms if args.server == "inprocess" else None,
+        **result,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,115 @@
+"""
+Image decode + resize to 224x224: full-resolution decode vs draft-mode decode into a
+preallocated buffer. Each variant runs in its own subprocess so peak RSS is separate.
+
+Usage (from the project root, PYTHONPATH=.):
+    python -m backend.benchmarks.preprocess --width 4000 --height 3000 --n 20
+"""
+import argparse
+import io
+import json
+import resource
+import subprocess
+import sys
+import time
+
+SIZE = (224, 224)
+
+
+def _make_jpeg(width: int, height: int) -> bytes:
+    from PIL import Image
+    # Gradients + noise: compresses like a photo, not like a flat fill.
+    grad = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 24)
+    img = Image.merge("RGB", (grad, noise, grad.transpose(Image.Transpose.ROTATE_180)))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def _legacy(data: bytes):
+    """The previous predict_disease preprocessing."""
+    import numpy as np
+    from PIL import Image
+    image = Image.open(io.BytesIO(data))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image = image.resize(SIZE)
+    return np.array(image, dtype=np.float32)
+
+
+def _fast(data: bytes):
+    import numpy as np
+    from backend.api.services.imaging import decode_into
+    out = np.empty((*SIZE, 3), dtype=np.float32)
+    decode_into(data, out, SIZE)
+    return out
+
+
+def _run_variant(variant: str, path: str, n: int) -> dict:
+    with open(path, "rb") as f:
+        data = f.read()
+    fn = {"legacy": _legacy, "fast": _fast}[variant]
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    samples = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        fn(data)
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples.sort()
+    rss_peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return {
+        "p50_ms": round(samples[len(samples) // 2], 2),
+        "mean_ms": round(sum(samples) / len(samples), 2),
+        "peak_rss_mb": round(rss_peak * scale / 2**20, 1),
+        "rss_growth_mb": round((rss_peak - rss_before) * scale / 2**20, 1),
+    }
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--width", type=int, default=4000)
+    p.add_argument("--height", type=int, default=3000)
+    p.add_argument("--n", type=int, default=20)
+    p.add_argument("--variant", choices=["legacy", "fast"], help=argparse.SUPPRESS)
+    p.add_argument("--image", help=argparse.SUPPRESS)
+    p.add_argument("--make", action="store_true", help=argparse.SUPPRESS)
+    args = p.parse_args(argv)
+
+    # Child processes. Linux keeps ru_maxrss across fork+exec, so the parent never
+    # touches pixel data itself: it would set a floor under the children's peaks.
+    if args.make:
+        with open(args.image, "wb") as f:
+            f.write(_make_jpeg(args.width, args.height))
+        return 0
+    if args.variant:
+        print(json.dumps(_run_variant(args.variant, args.image, args.n)))
+        return 0
+
+    import os
+    import tempfile
+
+    def child(*extra: str) -> str:
+        res = subprocess.run(
+            [sys.executable, "-m", "backend.benchmarks.preprocess", *extra],
+            check=True, capture_output=True, text=True,
+        )
+        return res.stdout
+
+    fd, path = tempfile.mkstemp(suffix=".jpg")
+    os.close(fd)
+    child("--make", "--image", path, "--width", str(args.width), "--height", str(args.height))
+    out = {"image": f"{args.width}x{args.height} JPEG", "n": args.n}
+    for variant in ("legacy", "fast"):
+        stdout = child("--variant", variant, "--image", path, "--n", str(args.n))
+        out[variant] = json.loads(stdout.strip().splitlines()[-1])
+    os.remove(path)
+    out["speedup_p50"] = round(out["legacy"]["p50_ms"] / out["fast"]["p50_ms"], 1)
+    print(json.dumps(out, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,166 @@
+"""
+Startup audit: import-time breakdown of backend.api.main and cold-boot timings of
+the non-ML endpoints, each in a fresh interpreter.
+
+Reports the slowest imports (python -X importtime), time to import the app, to
+answer /health with the lifespan running, and to serve the first request on each
+probed path, plus which heavy packages are loaded after each step. Models are not
+preloaded unless --preload is given, so the numbers are what a history/IFS-only
+worker pays. Exits 1 if a forbidden package (TensorFlow by default) got imported.
+
+Usage (from the project root, PYTHONPATH=.):
+    python -m backend.benchmarks.startup
+    python -m backend.benchmarks.startup --paths /health /history --top 30 --out startup.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY = (
+    "tensorflow", "tf_keras", "keras", "tflite_runtime", "onnxruntime", "numpy", "PIL",
+    "pyarrow", "sqlalchemy", "pydantic", "fastapi",
+)
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+def _env(args) -> dict:
+    env = os.environ.copy()
+    env.setdefault("PYTHONPATH", ".")
+    env.setdefault("PRELOAD_MODELS", "1" if args.preload else "0")
+    return env
+
+
+def import_times(args) -> dict:
+    """Parse `python -X importtime -c "import backend.api.main"`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.api.main"],
+        env=_env(args), capture_output=True, text=True,
+    )
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    by_package: dict[str, int] = {}
+    for name, self_us, _, _ in rows:
+        pkg = name.split(".")[0]
+        by_package[pkg] = by_package.get(pkg, 0) + self_us
+    total_us = sum(self_us for _, self_us, _, _ in rows)
+    app = [r for r in rows if r[0].startswith("backend.")]
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "by_package_ms": {
+            k: round(v / 1000, 1)
+            for k, v in sorted(by_package.items(), key=lambda kv: -kv[1])[: args.top]
+        },
+        "slowest_modules_ms": [
+            {"module": n, "self_ms": round(s / 1000, 1), "cumulative_ms": round(c / 1000, 1)}
+            for n, s, c, _ in sorted(rows, key=lambda r: -r[1])[: args.top]
+        ],
+        "app_modules_ms": {
+            n: round(c / 1000, 1) for n, _, c, _ in sorted(app, key=lambda r: -r[2])[: args.top]
+        },
+    }
+
+
+def _loaded() -> list[str]:
+    return sorted(m for m in HEAVY if m in sys.modules)
+
+
+def _rss_mb() -> float | None:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+
+
+async def _probe(paths: list[str]) -> dict:
+    """Runs in the child: import, start the lifespan, hit each path once."""
+    import httpx
+
+    t0 = time.perf_counter()
+    from backend.api.main import app
+    out = {"import_s": round(time.perf_counter() - t0, 3), "after_import": _loaded()}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://probe") as client:
+            r = await client.get("/health")
+            out["health_s"] = round(time.perf_counter() - t0, 3)
+            out["health_status"] = r.status_code
+            steps = []
+            for path in paths:
+                t1 = time.perf_counter()
+                r = await client.get(path)
+                steps.append({
+                    "path": path,
+                    "status": r.status_code,
+                    "first_request_ms": round((time.perf_counter() - t1) * 1000, 1),
+                    "loaded": _loaded(),
+                })
+            out["requests"] = steps
+            out["rss_mb"] = _rss_mb()
+    return out
+
+
+def boot(args) -> dict:
+    proc = subprocess.run(
+        [sys.executable, "-m", "backend.benchmarks.startup", "--probe", "--paths", *args.paths],
+        env=_env(args), capture_output=True, text=True,
+    )
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    p.add_argument("--paths", nargs="+", default=["/health", "/ready", "/history", "/history/1", "/ifs?district=Salem"],
+                   help="Paths to request once after boot")
+    p.add_argument("--top", type=int, default=15)
+    p.add_argument("--preload", action="store_true", help="Preload models as in production")
+    p.add_argument("--forbid", nargs="*", default=["tensorflow", "tf_keras", "keras"],
+                   help="Fail if any of these packages is imported")
+    p.add_argument("--probe", action="store_true", help=argparse.SUPPRESS)
+    p.add_argument("--out", help="Write the JSON report here as well as to stdout")
+    args = p.parse_args(argv)
+
+    if args.probe:
+        print(json.dumps(asyncio.run(_probe(args.paths))))
+        return 0
+
+    if "DATABASE_URL" not in os.environ:
+        tmp = tempfile.mkdtemp(prefix="agrismart-startup-")
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp}/startup.db"
+
+    report = {
+        "preload_models": args.preload,
+        "imports": import_times(args),
+        "cold_boot": boot(args),
+        "warm_boot": boot(args),  # schema already recorded, OS caches warm
+    }
+    loaded = set(report["cold_boot"]["after_import"])
+    for step in report["cold_boot"]["requests"] + report["warm_boot"]["requests"]:
+        loaded.update(step["loaded"])
+    report["forbidden_loaded"] = sorted(loaded & set(args.forbid)) if not args.preload else []
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    return 1 if report["forbidden_loaded"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
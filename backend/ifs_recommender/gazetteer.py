@@ -0,0 +1,268 @@
+# Offline gazetteer: village/town -> district lookup without network calls
+import argparse
+import csv
+import difflib
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SCHEMA_VERSION = "2"  # 2: places.name_len + (prefix, length) index for fuzzy lookups
+
+# Suffixes users add that aren't part of the place name.
+_NOISE = re.compile(r"\b(tamil nadu|tamilnadu|india|tn|district|taluk|village|town)\b")
+
+
+def _norm_place(name: str) -> str:
+    s = (name or "").strip().lower()
+    s = _NOISE.sub(" ", s)
+    s = re.sub(r"[^a-z0-9\s]", " ", s)
+    s = re.sub(r"\s+", " ", s).strip()
+    return s
+
+
+def _read_places(csv_path: str) -> Iterable[Tuple[str, str]]:
+    """Yields (name, district) from a CSV with `Name` and `District` columns."""
+    with open(csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        missing = {"Name", "District"}.difference(reader.fieldnames or [])
+        if missing:
+            raise ValueError(
+                "Gazetteer CSV is missing required columns: "
+                + ", ".join(sorted(missing))
+                + f" (found: {reader.fieldnames})"
+            )
+        for row in reader:
+            name = (row.get("Name") or "").strip()
+            district = (row.get("District") or "").strip()
+            if name and district:
+                yield name, district
+
+
+def _read_ifs_districts(ifs_csv_path: str) -> Iterable[Tuple[str, str]]:
+    """District names from the IFS CSV, so typing a district as a location resolves too."""
+    with open(ifs_csv_path, "r", encoding="utf-8-sig", newline="") as f:
+        for row in csv.DictReader(f):
+            d = (row.get("District") or "").strip()
+            if d:
+                yield d, d
+
+
+def build_gazetteer(
+    out_path: str,
+    places_csv: Optional[str] = None,
+    ifs_csv: Optional[str] = None,
+) -> int:
+    """
+    Build the on-disk gazetteer (SQLite, indexed on the normalized name).
+    Returns the number of distinct (name, district) entries written.
+    """
+    rows: Dict[Tuple[str, str], str] = {}
+    sources: List[Iterable[Tuple[str, str]]] = []
+    if places_csv:
+        sources.append(_read_places(places_csv))
+    if ifs_csv:
+        sources.append(_read_ifs_districts(ifs_csv))
+    if not sources:
+        raise ValueError("Provide a places CSV and/or the IFS CSV.")
+    for src in sources:
+        for name, district in src:
+            key = _norm_place(name)
+            if key:
+                rows.setdefault((key, district), name)
+
+    tmp_path = out_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(
+            """
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            CREATE TABLE places (
+                name_norm TEXT NOT NULL,
+                name TEXT NOT NULL,
+                district TEXT NOT NULL,
+                name_len INTEGER NOT NULL
+            );
+            """
+        )
+        conn.executemany(
+            "INSERT INTO places (name_norm, name, district, name_len) VALUES (?, ?, ?, ?)",
+            sorted((k, n, d, len(k)) for (k, d), n in rows.items()),
+        )
+        conn.execute("CREATE INDEX ix_places_name_norm ON places (name_norm)")
+        conn.execute("CREATE INDEX ix_places_head_len ON places (substr(name_norm, 1, 2), name_len)")
+        conn.execute("INSERT INTO meta VALUES ('schema_version', ?)", (SCHEMA_VERSION,))
+        conn.execute("INSERT INTO meta VALUES ('entries', ?)", (str(len(rows)),))
+        conn.commit()
+        conn.execute("VACUUM")
+    finally:
+        conn.close()
+    os.replace(tmp_path, out_path)
+    return len(rows)
+
+
+class Gazetteer:
+    """
+    Read-only lookups against a gazetteer built by build_gazetteer().
+    lookup() tries, in order: exact normalized name, unique prefix, close fuzzy match.
+    """
+
+    MIN_PREFIX_LEN = 4
+    FUZZY_CUTOFF = 0.88
+    # Fuzzy candidates share the first two characters and are within this many
+    # characters of the query's length (a 0.88 ratio allows little more than that).
+    FUZZY_LEN_WINDOW = 2
+    FUZZY_MAX_CANDIDATES = 5000
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Gazetteer not found at: {path}")
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._has_name_len: Optional[bool] = None
+        self.hits = 0
+        self.misses = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            uri = "file:" + os.path.abspath(self.path).replace("\\", "/") + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            self._local.conn = conn
+        return conn
+
+    def _fuzzy_sql(self) -> str:
+        if self._has_name_len is None:
+            cols = {row[1] for row in self._conn().execute("PRAGMA table_info(places)")}
+            self._has_name_len = "name_len" in cols
+        # Gazetteers built before schema 2 have no stored length: same query, no index.
+        length = "name_len" if self._has_name_len else "length(name_norm)"
+        return (
+            "SELECT name_norm, name, district FROM places"
+            f" WHERE substr(name_norm, 1, 2) = ? AND {length} BETWEEN ? AND ?"
+            f" ORDER BY abs({length} - ?) LIMIT ?"
+        )
+
+    def _districts_for(self, sql: str, params: tuple) -> List[tuple]:
+        return self._conn().execute(sql, params).fetchall()
+
+    def _pick(self, rows: List[Tuple[str, str]], hints: List[str]) -> Optional[Tuple[str, str]]:
+        """One (name, district) if unambiguous, using later comma parts as district hints."""
+        districts = {d for _, d in rows}
+        if len(districts) == 1:
+            return rows[0]
+        for hint in hints:
+            for name, d in rows:
+                if _norm_place(d) == hint:
+                    return name, d
+        return None
+
+    def _find(self, location: str) -> Optional[Tuple[str, str, str]]:
+        parts = [_norm_place(p) for p in (location or "").split(",")]
+        parts = [p for p in parts if p]
+        if not parts:
+            return None
+        want, hints = parts[0], parts[1:]
+
+        rows = self._districts_for(
+            "SELECT name, district FROM places WHERE name_norm = ?", (want,)
+        )
+        if rows:
+            picked = self._pick(rows, hints)
+            return (*picked, "exact") if picked else None
+
+        if len(want) >= self.MIN_PREFIX_LEN:
+            # One row per district over *all* matches, so uniqueness is decided on the
+            # full distinct-district count (bounded by the number of districts).
+            rows = self._districts_for(
+                "SELECT MIN(name), district FROM places WHERE name_norm >= ? AND name_norm < ?"
+                " GROUP BY district",
+                (want, want + "\uffff"),
+            )
+            if rows:
+                picked = self._pick(rows, hints)
+                if picked:
+                    return (*picked, "prefix")
+
+        # Fuzzy: only compare against names sharing the first two characters and of
+        # similar length, nearest lengths first should the safety cap ever be hit.
+        cands = self._districts_for(self._fuzzy_sql(), (
+            want[:2], len(want) - self.FUZZY_LEN_WINDOW, len(want) + self.FUZZY_LEN_WINDOW,
+            len(want), self.FUZZY_MAX_CANDIDATES,
+        ))
+        by_norm: Dict[str, List[Tuple[str, str]]] = {}
+        for n, name, d in cands:
+            by_norm.setdefault(n, []).append((name, d))
+        close = difflib.get_close_matches(want, list(by_norm), n=1, cutoff=self.FUZZY_CUTOFF)
+        if close:
+            rows = by_norm[close[0]]
+            picked = self._pick(rows, hints)
+            if picked:
+                return (*picked, "fuzzy")
+        return None
+
+    def lookup(self, location: str) -> Optional[Tuple[str, dict]]:
+        """
+        Returns (district_name, address_dict) like geocode_location_to_district,
+        or None when the place is unknown or ambiguous.
+        """
+        found = self._find(location)
+        with self._lock:
+            if found:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if not found:
+            return None
+        name, district, how = found
+        return district, {"source": "gazetteer", "match": how, "name": name, "state_district": district}
+
+    def version(self) -> str:
+        """Content hash of the gazetteer file (changes when it is rebuilt)."""
+        if self._version is None:
+            h = hashlib.sha256()
+            with open(self.path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+            self._version = h.hexdigest()[:16]
+        return self._version
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {"path": self.path, "hits": self.hits, "misses": self.misses}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Offline TN place -> district gazetteer.")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="Build the gazetteer database")
+    b.add_argument("--out", required=True, help="Output .sqlite path")
+    b.add_argument("--places", help="CSV with Name,District columns (villages/towns)")
+    b.add_argument("--ifs-csv", help="IFS CSV; its district names are added as places")
+    q = sub.add_parser("lookup", help="Look up a location")
+    q.add_argument("--db", required=True, help="Gazetteer .sqlite path")
+    q.add_argument("location")
+    args = p.parse_args(argv)
+
+    if args.cmd == "build":
+        n = build_gazetteer(args.out, places_csv=args.places, ifs_csv=args.ifs_csv)
+        print(f"Wrote {n} entries to {args.out}")
+        return 0
+
+    result = Gazetteer(args.db).lookup(args.location)
+    if result is None:
+        print(f"Not found: {args.location!r}")
+        return 1
+    print(json.dumps({"district": result[0], "address": result[1]}, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,15 +4,35 @@ import difflib
 import json
 import os
 import re
+import threading
 import time
 import urllib.parse
 import urllib.request
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional, Tuple
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+if TYPE_CHECKING:
+    from backend.ifs_recommender.gazetteer import Gazetteer
 
 
 DEFAULT_CSV_PATH = r"ifs - TN_IFS_TNAU_Complete.csv"
 
+# Nominatim usage policy: at most one request per second.
+NOMINATIM_MIN_INTERVAL_S = 1.0
+_nominatim_lock = threading.Lock()
+_nominatim_last_call = 0.0
+
+
+def _wait_for_nominatim_slot() -> None:
+    """Sleep only as long as needed to keep >= NOMINATIM_MIN_INTERVAL_S between calls."""
+    global _nominatim_last_call
+    with _nominatim_lock:
+        wait = _nominatim_last_call + NOMINATIM_MIN_INTERVAL_S - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        _nominatim_last_call = time.monotonic()
+
 
 @dataclass(frozen=True)
 class IFSRecord:
@@ -83,8 +103,49 @@ def build_district_index(
     return norm_to_display, norm_to_records
 
 
+@dataclass(frozen=True)
+class DistrictIndex:
+    """
+    Read-only lookup tables built once from the CSV records:
+      - norm_to_display: normalized_district -> a "pretty" district name
+      - norm_to_items: normalized_district -> de-duplicated recommendation payloads
+    The payload dicts are shared; hand out copies (see recommend_for_district).
+    """
+    norm_to_display: Mapping[str, str]
+    norm_to_items: Mapping[str, Tuple[Dict[str, str], ...]]
+
+
+def _dedupe_items(recs: Iterable[IFSRecord]) -> List[Dict[str, str]]:
+    # De-duplicate identical model+description rows.
+    seen = set()
+    out_items = []
+    for r in recs:
+        sig = (r.ifs_model, r.description, r.agro_climatic_zone)
+        if sig in seen:
+            continue
+        seen.add(sig)
+        out_items.append(
+            {
+                "IFS_Model": r.ifs_model,
+                "Agro_Climatic_Zone": r.agro_climatic_zone,
+                "Description": r.description,
+            }
+        )
+    return out_items
+
+
+def build_recommendation_index(records: Iterable[IFSRecord]) -> DistrictIndex:
+    norm_to_display, norm_to_records = build_district_index(records)
+    return DistrictIndex(
+        norm_to_display=MappingProxyType(dict(norm_to_display)),
+        norm_to_items=MappingProxyType(
+            {k: tuple(_dedupe_items(v)) for k, v in norm_to_records.items()}
+        ),
+    )
+
+
 def match_district(
-    user_district: str, norm_to_display: Dict[str, str]
+    user_district: str, norm_to_display: Mapping[str, str]
 ) -> Tuple[str, str, int]:
     """
     Returns (normalized_key, display_name, score)
@@ -144,7 +205,7 @@ def geocode_location_to_district(location: str, timeout_s: int = 15) -> Tuple[st
     }
 
     # Respectful pause to avoid rapid repeat calls in tight loops.
-    time.sleep(1.0)
+    _wait_for_nominatim_slot()
     full_url = url + "?" + urllib.parse.urlencode(params)
     req = urllib.request.Request(full_url, headers=headers, method="GET")
     with urllib.request.urlopen(req, timeout=timeout_s) as resp:
@@ -173,40 +234,50 @@ def geocode_location_to_district(location: str, timeout_s: int = 15) -> Tuple[st
 
 
 def recommend_for_district(
-    district: str, records: List[IFSRecord]
+    district: str,
+    records: List[IFSRecord],
+    index: Optional[DistrictIndex] = None,
+    match: Callable[[str, Mapping[str, str]], Tuple[str, str, int]] = match_district,
 ) -> Dict[str, object]:
-    norm_to_display, norm_to_records = build_district_index(records)
-    key, display, score = match_district(district, norm_to_display)
-    recs = norm_to_records.get(key, [])
-
-    # De-duplicate identical model+description rows.
-    seen = set()
-    out_items = []
-    for r in recs:
-        sig = (r.ifs_model, r.description, r.agro_climatic_zone)
-        if sig in seen:
-            continue
-        seen.add(sig)
-        out_items.append(
-            {
-                "IFS_Model": r.ifs_model,
-                "Agro_Climatic_Zone": r.agro_climatic_zone,
-                "Description": r.description,
-            }
-        )
+    """
+    Pass a prebuilt `index` (build_recommendation_index) to skip re-indexing the
+    records, and a memoized `match` to skip re-matching repeated inputs.
+    """
+    if index is None:
+        index = build_recommendation_index(records)
+    key, display, score = match(district, index.norm_to_display)
 
     return {
         "input_district": district,
         "matched_district": display,
         "match_score": score,
-        "recommendations": out_items,
+        # Copies: callers may mutate the response, the index must stay as built.
+        "recommendations": [dict(item) for item in index.norm_to_items.get(key, ())],
     }
 
 
-def recommend_for_location(location: str, records: List[IFSRecord]) -> Dict[str, object]:
-    district, address = geocode_location_to_district(location)
-    result = recommend_for_district(district, records)
+def recommend_for_location(
+    location: str,
+    records: List[IFSRecord],
+    geocode: Callable[[str], Tuple[str, dict]] = geocode_location_to_district,
+    index: Optional[DistrictIndex] = None,
+    match: Callable[[str, Mapping[str, str]], Tuple[str, str, int]] = match_district,
+    gazetteer: Optional["Gazetteer"] = None,
+) -> Dict[str, object]:
+    """
+    `geocode` resolves location -> (district, address); swap in a cached or stub one.
+    If an offline `gazetteer` is given it is tried first; geocode is the fallback.
+    """
+    found = gazetteer.lookup(location) if gazetteer is not None else None
+    if found is not None:
+        district, address = found
+        source = "gazetteer"
+    else:
+        district, address = geocode(location)
+        source = "geocoder"
+    result = recommend_for_district(district, records, index=index, match=match)
     result["input_location"] = location
+    result["geocode_source"] = source
     result["geocoded_district"] = district
     result["geocode_address"] = address
     return result
@@ -238,12 +309,21 @@ def main(argv: Optional[List[str]] = None) -> int:
     g.add_argument("--location", help="Free-text location (village/town/city) in Tamil Nadu")
     g.add_argument("--district", help="District name (skips geocoding)")
     p.add_argument("--format", choices=["text", "json"], default="text", help="Output format")
+    p.add_argument("--gazetteer", help="Offline gazetteer .sqlite to try before geocoding")
     args = p.parse_args(argv)
 
     records = load_ifs_csv(args.csv)
 
+    gazetteer = None
+    if args.gazetteer:
+        try:
+            from backend.ifs_recommender.gazetteer import Gazetteer
+        except ImportError:  # run as a script from this folder
+            from gazetteer import Gazetteer
+        gazetteer = Gazetteer(args.gazetteer)
+
     if args.location:
-        result = recommend_for_location(args.location, records)
+        result = recommend_for_location(args.location, records, gazetteer=gazetteer)
     else:
         result = recommend_for_district(args.district, records)
 
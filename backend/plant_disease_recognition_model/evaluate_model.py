@@ -0,0 +1,121 @@
+"""
+Accuracy-delta report: a reference model vs a candidate (e.g. INT8 TFLite) on a held-out
+folder laid out as <data>/<class name from classes.txt>/<image files>.
+
+Each model's backend follows from its file extension (.h5, .tflite, .onnx).
+
+Usage: run the file itself (not with -m), from this folder or by path, since it imports
+its sibling export_model:
+    python evaluate_model.py --data path/to/heldout --candidate plant_disease_model_int8.tflite
+    python evaluate_model.py --data heldout --reference plant_disease_model.tflite \\
+        --candidate plant_disease_model_int8.tflite --out report.json
+    python backend/plant_disease_recognition_model/evaluate_model.py --data heldout \\
+        --candidate backend/plant_disease_recognition_model/plant_disease_model.onnx
+"""
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from export_model import BASE_DIR, INPUT_MODEL, _api_path, iter_images, load_image
+
+CLASSES_PATH = os.path.join(BASE_DIR, "classes.txt")
+
+
+def _backend_for(path):
+    suffix = Path(path).suffix.lower()
+    return {".h5": "tf", ".tflite": "tflite", ".onnx": "onnx"}[suffix]
+
+
+def _labelled_images(data_dir, class_names):
+    index = {name: i for i, name in enumerate(class_names)}
+    items = []
+    for class_dir in sorted(os.listdir(data_dir)):
+        full = os.path.join(data_dir, class_dir)
+        if not os.path.isdir(full):
+            continue
+        if class_dir not in index:
+            print(f"  skipping folder {class_dir!r}: not in classes.txt")
+            continue
+        items.extend((p, index[class_dir]) for p in iter_images(full))
+    return items
+
+
+def _run(backend, batches):
+    preds, elapsed = [], 0.0
+    for x in batches:
+        t0 = time.perf_counter()
+        preds.append(backend.predict(backend.preprocess(x)))
+        elapsed += time.perf_counter() - t0
+    return np.concatenate(preds, axis=0), elapsed
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Accuracy delta of a candidate disease model vs a reference.")
+    p.add_argument("--data", required=True, help="Held-out folder with one sub-folder per class")
+    p.add_argument("--reference", default=INPUT_MODEL, help="Reference model (.h5 / .tflite / .onnx)")
+    p.add_argument("--candidate", required=True, help="Candidate model (.tflite / .onnx / .h5)")
+    p.add_argument("--batch-size", type=int, default=16)
+    p.add_argument("--out", help="Write the JSON report here as well")
+    args = p.parse_args(argv)
+
+    _api_path()
+    from backend.api.services.inference_backends import load_backend
+
+    with open(CLASSES_PATH, "r") as f:
+        class_names = [line.strip() for line in f.readlines() if line.strip()]
+    items = _labelled_images(args.data, class_names)
+    if not items:
+        print(f"No labelled images found under {args.data}")
+        return 1
+    print(f"Decoding {len(items)} held-out images...")
+    x_all = np.stack([load_image(path) for path, _ in items]).astype(np.float32)
+    y_true = np.array([label for _, label in items])
+    batches = [x_all[i:i + args.batch_size] for i in range(0, len(x_all), args.batch_size)]
+
+    report = {"images": len(items), "classes_present": int(len(set(y_true.tolist())))}
+    top1 = {}
+    for role, path in (("reference", args.reference), ("candidate", args.candidate)):
+        name = _backend_for(path)
+        print(f"Running {role}: {path} ({name})")
+        backend = load_backend(name, Path(path))
+        backend.warmup()
+        probs, elapsed = _run(backend, batches)
+        top1[role] = probs.argmax(axis=1)
+        report[role] = {
+            "model": str(path),
+            "backend": name,
+            "size_mb": round(os.path.getsize(path) / 2**20, 2),
+            "top1_accuracy": round(float(np.mean(top1[role] == y_true)), 4),
+            "ms_per_image": round(elapsed * 1000.0 / len(items), 3),
+            "images_per_s": round(len(items) / elapsed, 1),
+        }
+
+    ref, cand = report["reference"], report["candidate"]
+    report["top1_delta"] = round(cand["top1_accuracy"] - ref["top1_accuracy"], 4)
+    report["prediction_agreement"] = round(float(np.mean(top1["reference"] == top1["candidate"])), 4)
+    report["throughput_ratio"] = round(cand["images_per_s"] / ref["images_per_s"], 2)
+    per_class = {}
+    for i, name in enumerate(class_names):
+        mask = y_true == i
+        if mask.any():
+            per_class[name] = {
+                "n": int(mask.sum()),
+                "reference": round(float(np.mean(top1["reference"][mask] == i)), 4),
+                "candidate": round(float(np.mean(top1["candidate"][mask] == i)), 4),
+            }
+    report["per_class_top1"] = per_class
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
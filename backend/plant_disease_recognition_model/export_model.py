@@ -0,0 +1,167 @@
+"""
+Export plant_disease_model_working.h5 to TFLite and/or ONNX for the lightweight
+inference backends (DISEASE_BACKEND=tflite / onnx), then check parity against the
+Keras model on fixed inputs.
+
+Usage (from this folder, or with PYTHONPATH=. from the project root):
+    python export_model.py --format tflite onnx
+    python export_model.py --format onnx --verify-only
+    python export_model.py --quantize int8 --calibration-dir path/to/leaf_images
+    python export_model.py --quantize dynamic
+
+Quantized models are written as plant_disease_model_<mode>.tflite and served with
+DISEASE_QUANTIZATION=<mode>. Measure the accuracy cost with evaluate_model.py.
+
+ONNX export needs `pip install tf2onnx onnxruntime`.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+os.environ["TF_USE_LEGACY_KERAS"] = "1"
+import tensorflow as tf
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INPUT_MODEL = os.path.join(BASE_DIR, "plant_disease_model_working.h5")
+OUTPUTS = {
+    "tflite": os.path.join(BASE_DIR, "plant_disease_model.tflite"),
+    "onnx": os.path.join(BASE_DIR, "plant_disease_model.onnx"),
+}
+QUANTIZED_OUTPUT = os.path.join(BASE_DIR, "plant_disease_model_{mode}.tflite")
+INPUT_SHAPE = (224, 224, 3)
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+
+
+def export_tflite(model, out_path):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    with open(out_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def _api_path():
+    # The API package is only needed for decoding images / loading backends.
+    root = os.path.abspath(os.path.join(BASE_DIR, "..", ".."))
+    if root not in sys.path:
+        sys.path.insert(0, root)
+
+
+def iter_images(folder):
+    """Image paths under `folder`, sorted for reproducibility."""
+    for dirpath, _, filenames in sorted(os.walk(folder)):
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() in IMAGE_SUFFIXES:
+                yield os.path.join(dirpath, name)
+
+
+def load_image(path):
+    """Decode one image exactly like the API does (draft decode + resize to 224x224)."""
+    _api_path()
+    from backend.api.services.imaging import decode_into
+    out = np.empty(INPUT_SHAPE, dtype=np.float32)
+    with open(path, "rb") as f:
+        decode_into(f.read(), out, INPUT_SHAPE[:2])
+    return out
+
+
+def export_quantized_tflite(model, out_path, mode, calibration_dir=None, max_samples=200):
+    """
+    Post-training quantization. "dynamic": int8 weights, float activations (no data
+    needed). "int8": int8 weights and activations, calibrated on real leaf images;
+    takes uint8 pixels, returns float32 probabilities.
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == "int8":
+        if not calibration_dir:
+            raise SystemExit("--quantize int8 needs --calibration-dir with representative images")
+        paths = list(iter_images(calibration_dir))[:max_samples]
+        if not paths:
+            raise SystemExit(f"No images found under {calibration_dir}")
+        print(f"  calibrating on {len(paths)} images from {calibration_dir}")
+
+        def representative_dataset():
+            for path in paths:
+                yield [load_image(path)[None, ...]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.uint8
+        converter.inference_output_type = tf.float32
+    with open(out_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_onnx(model, out_path):
+    import tf2onnx
+    spec = (tf.TensorSpec((None, *INPUT_SHAPE), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=out_path)
+
+
+def fixed_inputs(n=8):
+    """Deterministic pixel batches in 0..255 (random noise + flat + gradient images)."""
+    rng = np.random.default_rng(1234)
+    noise = rng.uniform(0, 255, size=(n - 2, *INPUT_SHAPE)).astype(np.float32)
+    flat = np.full((1, *INPUT_SHAPE), 127.0, dtype=np.float32)
+    grad = np.broadcast_to(
+        np.linspace(0, 255, INPUT_SHAPE[1], dtype=np.float32)[None, None, :, None],
+        (1, *INPUT_SHAPE),
+    )
+    return np.concatenate([noise, flat, grad], axis=0)
+
+
+def check_parity(model, backend_name, path, atol=1e-3):
+    """Compare the exported model with Keras on fixed inputs; returns True if it matches."""
+    _api_path()
+    from pathlib import Path
+    from backend.api.services.inference_backends import load_backend
+
+    x = fixed_inputs()
+    expected = model(x, training=False).numpy()
+    got = load_backend(backend_name, Path(path)).predict(x)
+    max_diff = float(np.max(np.abs(expected - got)))
+    top1_agree = float(np.mean(expected.argmax(axis=1) == got.argmax(axis=1)))
+    ok = max_diff <= atol and top1_agree == 1.0
+    print(f"  {backend_name}: max |diff| = {max_diff:.2e}, top-1 agreement = {top1_agree:.0%} "
+          f"-> {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Export the disease model to TFLite / ONNX.")
+    p.add_argument("--format", nargs="+", choices=sorted(OUTPUTS), default=["tflite"])
+    p.add_argument("--verify-only", action="store_true", help="Skip export, only run parity check")
+    p.add_argument("--atol", type=float, default=1e-3, help="Max allowed absolute probability diff")
+    p.add_argument("--quantize", choices=["dynamic", "int8"], help="Write a quantized TFLite model instead")
+    p.add_argument("--calibration-dir", help="Representative leaf images for --quantize int8")
+    p.add_argument("--calibration-samples", type=int, default=200)
+    args = p.parse_args(argv)
+
+    print(f"Loading {INPUT_MODEL}...")
+    model = tf.keras.models.load_model(INPUT_MODEL, compile=False)
+
+    if args.quantize:
+        out_path = QUANTIZED_OUTPUT.format(mode=args.quantize)
+        print(f"Quantizing ({args.quantize}) -> {out_path}...")
+        export_quantized_tflite(
+            model, out_path, args.quantize, args.calibration_dir, args.calibration_samples
+        )
+        print(f"  {os.path.getsize(out_path) / 2**20:.1f} MB")
+        print("Quantized models are approximate; compare accuracy with evaluate_model.py.")
+        return 0
+
+    exporters = {"tflite": export_tflite, "onnx": export_onnx}
+    if not args.verify_only:
+        for fmt in args.format:
+            print(f"Exporting {fmt} -> {OUTPUTS[fmt]}...")
+            exporters[fmt](model, OUTPUTS[fmt])
+            print(f"  {os.path.getsize(OUTPUTS[fmt]) / 2**20:.1f} MB")
+
+    print("\nParity check on fixed inputs:")
+    ok = all(check_parity(model, fmt, OUTPUTS[fmt], args.atol) for fmt in args.format)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
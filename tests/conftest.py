@@ -0,0 +1,12 @@
+"""Test settings: a throwaway SQLite DB and no background model loading."""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault(
+    "DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='agrismart-tests-')}/test.db"
+)
+os.environ.setdefault("PRELOAD_MODELS", "0")
@@ -0,0 +1,41 @@
+import pytest
+
+from backend.api import db, readiness
+
+
+@pytest.fixture
+def flaky_schema_check(monkeypatch):
+    """schema_is_current fails once (DB briefly unreachable), then reports current."""
+    calls = []
+
+    def schema_is_current():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ConnectionError("database is down")
+        return True
+
+    monkeypatch.setattr(db, "DB_INIT_ON_STARTUP", True)
+    monkeypatch.setattr(db, "_schema_checked", False)
+    monkeypatch.setattr(db, "schema_is_current", schema_is_current)
+    return calls
+
+
+def test_failed_schema_check_is_retried(flaky_schema_check):
+    db.ensure_schema()
+    assert not db._schema_checked
+    db.ensure_schema()
+    assert db._schema_checked
+    db.ensure_schema()
+    assert len(flaky_schema_check) == 2
+
+
+def test_startup_schema_failure_shows_in_readiness(flaky_schema_check, monkeypatch):
+    from backend.api.main import _init_db
+
+    monkeypatch.setattr(readiness, "_components", {})
+    readiness.load("db", _init_db)
+    state = readiness.snapshot()["db"]
+    assert state["state"] == readiness.FAILED
+    assert "database is down" in state["error"]
+    assert "db" in readiness.failed()
+    assert not db._schema_checked
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.api import executors
+from backend.api.executors import BoundedExecutor, Overloaded
+
+
+def test_cancelled_call_keeps_its_slot_until_the_thread_finishes():
+    ex = BoundedExecutor("test", workers=1, max_pending=1)
+    started, release = threading.Event(), threading.Event()
+
+    def blocking():
+        started.set()
+        release.wait(5)
+
+    async def scenario():
+        task = asyncio.ensure_future(ex.run(blocking))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert ex.stats()["pending"] == 1
+        with pytest.raises(Overloaded):
+            await ex.run(lambda: None)
+        release.set()
+        await asyncio.to_thread(ex.shutdown)
+        assert ex.stats()["pending"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_gather_cancels_siblings_when_one_raises():
+    cancelled = False
+
+    async def slow():
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    async def overloaded():
+        raise Overloaded("ifs")
+
+    async def scenario():
+        with pytest.raises(Overloaded):
+            await executors.gather(slow(), overloaded())
+
+    asyncio.run(scenario())
+    assert cancelled
@@ -0,0 +1,76 @@
+import asyncio
+import json
+from contextlib import contextmanager
+
+import pytest
+
+from backend.api import db, export
+
+DISTRICT = "ExportTestDistrict"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def rows():
+    db.create_logs([
+        {"district": DISTRICT, "ifs_result": {"matched_district": DISTRICT}} for _ in range(10)
+    ])
+
+
+@pytest.fixture
+def sessions(monkeypatch):
+    """Records whether each session export opens has been closed again."""
+    state = []
+    real = db.get_db
+
+    @contextmanager
+    def tracking():
+        state.append("open")
+        try:
+            with real() as session:
+                yield session
+        finally:
+            state[-1] = "closed"
+
+    monkeypatch.setattr(export.db, "get_db", tracking)
+    return state
+
+
+def test_full_stream_closes_its_session(sessions):
+    body = export.stream("ndjson", district=DISTRICT, batch_size=3)
+    lines = b"".join(body).decode().splitlines()
+    assert len(lines) == 10
+    assert json.loads(lines[0])["ifs_matched_district"] == DISTRICT
+    assert sessions == ["closed"]
+
+
+def test_close_mid_stream_releases_the_session(sessions):
+    body = export.stream("csv", district=DISTRICT, batch_size=3)
+    next(body)
+    assert sessions == ["open"]
+    body.close()
+    assert sessions == ["closed"]
+    assert list(body) == []
+
+
+def test_client_disconnect_releases_the_session(sessions, monkeypatch):
+    from backend.api.main import app
+
+    first_chunk = asyncio.Event()
+
+    async def receive():
+        await first_chunk.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            first_chunk.set()
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/history/export", "raw_path": b"/history/export",
+        "query_string": f"district={DISTRICT}".encode(), "headers": [], "http_version": "1.1",
+        "scheme": "http", "server": ("test", 80), "client": ("test", 1234), "root_path": "",
+    }
+    monkeypatch.setitem(export.stream.__kwdefaults__, "batch_size", 1)
+    asyncio.run(app(scope, receive, send))
+    assert first_chunk.is_set()
+    assert sessions == ["closed"]
@@ -0,0 +1,110 @@
+import csv
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from backend.ifs_recommender.gazetteer import Gazetteer, build_gazetteer
+
+PLACES_CSV = Path(__file__).parent / "fixtures" / "gazetteer_places.csv"
+
+
+@pytest.fixture(scope="module")
+def gazetteer(tmp_path_factory):
+    path = tmp_path_factory.mktemp("gazetteer") / "places.sqlite"
+    build_gazetteer(str(path), places_csv=str(PLACES_CSV))
+    return Gazetteer(str(path))
+
+
+def _build(tmp_path, rows) -> Gazetteer:
+    places = tmp_path / "places.csv"
+    with open(places, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Name", "District"])
+        writer.writerows(rows)
+    path = tmp_path / "places.sqlite"
+    build_gazetteer(str(path), places_csv=str(places))
+    return Gazetteer(str(path))
+
+
+def test_exact_match_ignores_case_and_noise_words(gazetteer):
+    district, address = gazetteer.lookup("pollachi taluk, Tamil Nadu")
+    assert district == "Coimbatore"
+    assert address == {
+        "source": "gazetteer", "match": "exact", "name": "Pollachi", "state_district": "Coimbatore",
+    }
+
+
+def test_ambiguous_name_needs_a_district_hint(gazetteer):
+    assert gazetteer.lookup("Attur") is None
+    assert gazetteer.lookup("Attur, Salem")[0] == "Salem"
+    assert gazetteer.lookup("Attur, Thoothukudi district")[0] == "Thoothukudi"
+
+
+def test_unique_prefix(gazetteer):
+    district, address = gazetteer.lookup("Sanka")
+    assert (district, address["match"], address["name"]) == ("Salem", "prefix", "Sankagiri")
+
+
+def test_prefix_shared_by_districts_is_ambiguous(gazetteer):
+    assert gazetteer.lookup("Mettu") is None
+    assert gazetteer.lookup("Mettu, Coimbatore")[0] == "Coimbatore"
+
+
+def test_fuzzy_match(gazetteer):
+    district, address = gazetteer.lookup("Kovilpati")
+    assert (district, address["match"]) == ("Thoothukudi", "fuzzy")
+
+
+def test_unknown_place_counts_a_miss(tmp_path):
+    g = _build(tmp_path, [("Omalur", "Salem")])
+    assert g.lookup("Atlantis") is None
+    assert g.lookup("Omalur")[0] == "Salem"
+    assert g.stats()["hits"] == 1
+    assert g.stats()["misses"] == 1
+
+
+def test_prefix_uniqueness_counts_every_match(tmp_path):
+    # More same-district rows than any row limit, then one from another district.
+    rows = [(f"Palani {i}", "Dindigul") for i in range(60)] + [("Palanichettipatti", "Theni")]
+    g = _build(tmp_path, rows)
+    assert g.lookup("Palan") is None
+    assert g.lookup("Palan, Theni")[0] == "Theni"
+
+
+def test_version_changes_when_rebuilt(tmp_path):
+    before = _build(tmp_path, [("Omalur", "Salem")]).version()
+    assert before == Gazetteer(str(tmp_path / "places.sqlite")).version()
+    assert _build(tmp_path, [("Omalur", "Salem"), ("Attur", "Salem")]).version() != before
+
+
+def test_fuzzy_match_does_not_depend_on_alphabetical_position(tmp_path):
+    # Hundreds of names sharing the "ko" prefix sort before the one we want.
+    rows = [(f"Koa{i:04d}", "Salem") for i in range(600)] + [("Kovilpatti", "Thoothukudi")]
+    g = _build(tmp_path, rows)
+    district, address = g.lookup("Kovilpati")
+    assert (district, address["match"]) == ("Thoothukudi", "fuzzy")
+
+
+def test_fuzzy_lookup_uses_the_prefix_length_index(gazetteer):
+    plan = gazetteer._conn().execute(
+        "EXPLAIN QUERY PLAN " + gazetteer._fuzzy_sql(), ("ko", 7, 11, 9, 10)
+    ).fetchall()
+    assert any("ix_places_head_len" in row[-1] for row in plan)
+
+
+def test_gazetteer_without_stored_lengths_still_matches(tmp_path):
+    path = tmp_path / "v1.sqlite"
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        CREATE TABLE places (name_norm TEXT NOT NULL, name TEXT NOT NULL, district TEXT NOT NULL);
+        INSERT INTO meta VALUES ('schema_version', '1');
+        INSERT INTO places VALUES ('kovilpatti', 'Kovilpatti', 'Thoothukudi');
+        """
+    )
+    conn.commit()
+    conn.close()
+    district, address = Gazetteer(str(path)).lookup("Kovilpati")
+    assert (district, address["match"]) == ("Thoothukudi", "fuzzy")
@@ -0,0 +1,109 @@
+import pytest
+
+from backend.api import cache
+from backend.api.services.geocode import CachedGeocoder
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", c)
+    return c
+
+
+class StubGeocoder:
+    """Resolves "<place>, <district>"; raises for names in `unknown` / `down`."""
+
+    def __init__(self, unknown=(), down=False):
+        self.calls = []
+        self.unknown = set(unknown)
+        self.down = down
+
+    def __call__(self, location):
+        self.calls.append(location)
+        if self.down:
+            raise ConnectionError("nominatim unreachable")
+        if location in self.unknown:
+            raise ValueError(f"Could not geocode location: {location}")
+        district = location.rsplit(",", 1)[-1].strip()
+        return district, {"state_district": district}
+
+
+def test_repeated_queries_hit_memory_after_normalization(clock):
+    stub = StubGeocoder()
+    geo = CachedGeocoder(stub, persistent=False)
+    assert geo("Kovilpatti, Thoothukudi")[0] == "Thoothukudi"
+    assert geo("  kovilpatti ,thoothukudi ")[0] == "Thoothukudi"
+    assert stub.calls == ["Kovilpatti, Thoothukudi"]
+    assert geo.stats()["lookups"] == 1
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    stub = StubGeocoder()
+    geo = CachedGeocoder(stub, maxsize=2, persistent=False)
+    geo("a, Salem")
+    geo("b, Erode")
+    geo("a, Salem")  # a is now most recent
+    geo("c, Madurai")  # evicts b
+    geo("a, Salem")
+    geo("b, Erode")
+    assert stub.calls == ["a, Salem", "b, Erode", "c, Madurai", "b, Erode"]
+
+
+def test_positive_entries_expire_after_ttl(clock):
+    stub = StubGeocoder()
+    geo = CachedGeocoder(stub, ttl_s=60, negative_ttl_s=10, persistent=False)
+    geo("a, Salem")
+    clock.now += 59
+    geo("a, Salem")
+    clock.now += 2
+    geo("a, Salem")
+    assert len(stub.calls) == 2
+
+
+def test_not_found_is_cached_with_the_negative_ttl(clock):
+    stub = StubGeocoder(unknown={"Nowhere"})
+    geo = CachedGeocoder(stub, ttl_s=60, negative_ttl_s=10, persistent=False)
+    for _ in range(2):
+        with pytest.raises(ValueError, match="Could not geocode"):
+            geo("Nowhere")
+    assert len(stub.calls) == 1
+    assert geo.stats()["negative_hits"] == 2
+    clock.now += 11
+    with pytest.raises(ValueError):
+        geo("Nowhere")
+    assert len(stub.calls) == 2
+
+
+def test_network_errors_are_not_cached(clock):
+    stub = StubGeocoder(down=True)
+    geo = CachedGeocoder(stub, persistent=False)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            geo("a, Salem")
+    assert len(stub.calls) == 2
+    stub.down = False
+    assert geo("a, Salem")[0] == "Salem"
+    assert geo.stats()["negative_hits"] == 0
+
+
+def test_persistent_cache_survives_a_memory_clear(clock):
+    stub = StubGeocoder(unknown={"Nowhere"})
+    geo = CachedGeocoder(stub, persistent=True)
+    geo("Persisted, Salem")
+    with pytest.raises(ValueError):
+        geo("Nowhere")
+    geo.clear_memory()
+    assert geo("Persisted, Salem")[0] == "Salem"
+    with pytest.raises(ValueError):
+        geo("Nowhere")
+    assert len(stub.calls) == 2
+    assert geo.stats()["db_hits"] == 2
@@ -0,0 +1,79 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from backend.api.services.inference_backends import INPUT_SIZE, InferenceBackend, TFLiteBackend
+
+
+class FakeInterpreter:
+    """Stands in for tflite_runtime's Interpreter; output row i is the mean of input i."""
+
+    instances = []
+
+    def __init__(self, model_path, num_threads=None):
+        self.shape = [1, *INPUT_SIZE, 3]
+        self.allocations = 0
+        self.invoked = []
+        FakeInterpreter.instances.append(self)
+
+    def allocate_tensors(self):
+        self.allocations += 1
+
+    def get_input_details(self):
+        return [{"index": 0, "shape": np.array(self.shape), "dtype": np.float32, "quantization": (0.0, 0)}]
+
+    def get_output_details(self):
+        return [{"index": 1, "dtype": np.float32, "quantization": (0.0, 0)}]
+
+    def resize_tensor_input(self, index, shape):
+        self.shape = list(shape)
+
+    def set_tensor(self, index, x):
+        assert list(x.shape) == self.shape
+        self._x = x
+
+    def invoke(self):
+        self.invoked.append(len(self._x))
+
+    def get_tensor(self, index):
+        return self._x.reshape(len(self._x), -1).mean(axis=1, keepdims=True)
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    module = types.ModuleType("tflite_runtime.interpreter")
+    module.Interpreter = FakeInterpreter
+    monkeypatch.setitem(sys.modules, "tflite_runtime", types.ModuleType("tflite_runtime"))
+    monkeypatch.setitem(sys.modules, "tflite_runtime.interpreter", module)
+    FakeInterpreter.instances = []
+    return TFLiteBackend("model.tflite")
+
+
+def _images(n):
+    return np.random.default_rng(n).uniform(0, 255, size=(n, *INPUT_SIZE, 3)).astype(np.float32)
+
+
+def test_single_images_run_unpadded_without_reallocating(backend):
+    for _ in range(3):
+        x = _images(1)
+        assert np.allclose(backend.predict(x), x.reshape(1, -1).mean(axis=1, keepdims=True))
+    (single,) = FakeInterpreter.instances
+    assert single.invoked == [1, 1, 1]
+    assert single.allocations == 1
+
+
+def test_batches_resize_only_when_the_length_changes(backend):
+    for n in (4, 4, 7, 1, 7):
+        x = _images(n)
+        assert np.allclose(backend.predict(x), x.reshape(n, -1).mean(axis=1, keepdims=True))
+    single, multi = FakeInterpreter.instances
+    assert single.invoked == [1]
+    assert multi.invoked == [4, 4, 7, 7]
+    assert multi.allocations == 3  # initial, 4, 7
+
+
+def test_backend_base_class_is_abstract():
+    with pytest.raises(TypeError):
+        InferenceBackend()
@@ -0,0 +1,15 @@
+from backend.api import metrics
+from backend.api.services import geocode, ifs
+
+
+def test_scrape_does_not_build_lazy_services(monkeypatch):
+    from backend.api.main import _metric_samples
+
+    monkeypatch.setattr(geocode, "_geocoder", None)
+    monkeypatch.setattr(ifs, "_gazetteer_cache", None)
+    monkeypatch.setattr(ifs, "_gazetteer_checked", False)
+    text = metrics.render(_metric_samples())
+    assert geocode._geocoder is None
+    assert not ifs._gazetteer_checked
+    assert "agrismart_executor_pending" in text
+    assert 'cache="geocode"' not in text
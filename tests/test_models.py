@@ -0,0 +1,21 @@
+import pytest
+from sqlalchemy import text
+
+from backend.api.models import _engine_kwargs, get_engine
+
+
+@pytest.mark.parametrize("url", [
+    "sqlite://",
+    "sqlite:///:memory:",
+    "sqlite:///file:mem1?mode=memory&cache=shared&uri=true",
+])
+def test_in_memory_sqlite_gets_no_pool_sizing(url):
+    assert "max_overflow" not in _engine_kwargs(url)
+    with get_engine(url).connect() as conn:
+        assert conn.execute(text("select 1")).scalar() == 1
+
+
+def test_file_sqlite_gets_pool_sizing(tmp_path):
+    kwargs = _engine_kwargs(f"sqlite:///{tmp_path}/a.db")
+    assert {"pool_size", "max_overflow", "pool_timeout"} <= kwargs.keys()
+    get_engine(f"sqlite:///{tmp_path}/a.db").dispose()
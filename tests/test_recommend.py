@@ -0,0 +1,30 @@
+from backend.ifs_recommender.recommend import (
+    IFSRecord,
+    build_recommendation_index,
+    recommend_for_district,
+)
+
+RECORDS = [
+    IFSRecord("Salem", "North Western Zone", "Crop + Dairy", "Paddy with two cows"),
+    IFSRecord("Salem", "North Western Zone", "Crop + Dairy", "Paddy with two cows"),
+    IFSRecord("Erode", "Western Zone", "Crop + Poultry", "Maize with 50 birds"),
+]
+
+
+def test_recommendations_are_deduplicated_and_matched():
+    out = recommend_for_district("salem", RECORDS)
+    assert out["matched_district"] == "Salem"
+    assert out["match_score"] == 100
+    assert out["recommendations"] == [
+        {"IFS_Model": "Crop + Dairy", "Agro_Climatic_Zone": "North Western Zone",
+         "Description": "Paddy with two cows"},
+    ]
+
+
+def test_mutating_a_response_leaves_the_index_intact():
+    index = build_recommendation_index(RECORDS)
+    first = recommend_for_district("Salem", RECORDS, index=index)
+    first["recommendations"][0]["IFS_Model"] = "changed"
+    first["recommendations"].clear()
+    again = recommend_for_district("Salem", RECORDS, index=index)
+    assert again["recommendations"][0]["IFS_Model"] == "Crop + Dairy"
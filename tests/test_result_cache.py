@@ -0,0 +1,17 @@
+from backend.api.services import result_cache
+
+
+def test_cached_results_are_copies():
+    calls = []
+
+    def predict(image_bytes):
+        calls.append(image_bytes)
+        return {"top_k": [{"class": "Tomato___healthy", "confidence": 0.9}]}
+
+    first = result_cache.cached_predict(b"same image", predict)
+    first["top_k"][0]["confidence"] = 0.0
+    second = result_cache.cached_predict(b"same image", predict)
+    second["top_k"].clear()
+    third = result_cache.cached_predict(b"same image", predict)
+    assert len(calls) == 1
+    assert third == {"top_k": [{"class": "Tomato___healthy", "confidence": 0.9}]}
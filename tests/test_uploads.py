@@ -0,0 +1,74 @@
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from backend.api.uploads import BodySizeLimitMiddleware
+
+LIMIT = 1000
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(BodySizeLimitMiddleware, limits={"/upload": LIMIT})
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    return TestClient(app)
+
+
+def _multipart(payload: bytes) -> tuple[bytes, str]:
+    boundary = "testboundary"
+    body = (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="a.jpg"\r\n'
+        "Content-Type: image/jpeg\r\n\r\n"
+    ).encode() + payload + f"\r\n--{boundary}--\r\n".encode()
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def _chunks(body: bytes, size: int = 256):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+def test_small_body_passes():
+    body, ctype = _multipart(b"x" * 100)
+    r = _client().post("/upload", content=body, headers={"Content-Type": ctype})
+    assert r.status_code == 200
+    assert r.json() == {"size": 100}
+
+
+def test_declared_length_over_limit_is_413():
+    body, ctype = _multipart(b"x" * (LIMIT * 2))
+    r = _client().post("/upload", content=body, headers={"Content-Type": ctype})
+    assert r.status_code == 413
+
+
+def test_chunked_body_over_limit_is_413():
+    body, ctype = _multipart(b"x" * (LIMIT * 4))
+    r = _client().post("/upload", content=_chunks(body), headers={"Content-Type": ctype})
+    assert "content-length" not in {k.lower() for k in r.request.headers}
+    assert r.status_code == 413
+    assert "too large" in r.json()["detail"]
+
+
+def test_chunked_body_under_limit_passes():
+    body, ctype = _multipart(b"x" * 200)
+    r = _client().post("/upload", content=_chunks(body, 64), headers={"Content-Type": ctype})
+    assert r.status_code == 200
+    assert r.json() == {"size": 200}
+
+
+def test_413_from_the_real_app_carries_cors_headers():
+    from backend.api.main import app
+    from backend.api.settings import MAX_UPLOAD_BYTES
+
+    body, ctype = _multipart(b"x" * (MAX_UPLOAD_BYTES * 2))
+    r = TestClient(app).post(
+        "/analyze",
+        content=body,
+        headers={"Content-Type": ctype, "Origin": "http://localhost:8501"},
+    )
+    assert r.status_code == 413
+    assert r.headers["access-control-allow-origin"] == "http://localhost:8501"
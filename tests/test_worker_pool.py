@@ -0,0 +1,99 @@
+import os
+import signal
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from backend.api.services.inference_backends import INPUT_SIZE, OnnxBackend
+from backend.api.services.worker_pool import InferencePool
+
+MODEL = Path(__file__).parent / "fixtures" / "tiny_classifier.onnx"  # (n, 224, 224, 3) -> (n, 38)
+NUM_CLASSES = 38
+
+
+def _images(n, seed=0):
+    return np.random.default_rng(seed).uniform(0, 255, size=(n, *INPUT_SIZE, 3)).astype(np.float32)
+
+
+def _wait_for(condition, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    """Spawned workers read the model path from the environment they inherit."""
+    pools = []
+
+    def make(model_path=MODEL, num_workers=1, **kwargs):
+        monkeypatch.setenv("DISEASE_ONNX_PATH", str(model_path))
+        pool = InferencePool(
+            num_workers, backend_name="onnx", num_classes=NUM_CLASSES, slots=8, max_batch=4,
+            timeout_s=20, **kwargs,
+        )
+        pools.append(pool)
+        pool.start()
+        return pool
+
+    yield make
+    for pool in pools:
+        pool.shutdown()
+
+
+def test_round_trip_matches_in_process_inference(make_pool):
+    pool = make_pool(num_workers=2)
+    pool.wait_ready(timeout=60)
+    x = _images(11)  # more rows than ring slots
+    got = pool.predict_batch(x)
+    want = OnnxBackend(MODEL).predict(x)
+    np.testing.assert_allclose(got, want, atol=1e-5)
+    stats = pool.stats()
+    assert stats["free_slots"] == 8
+    assert stats["in_flight"] == 0
+    assert stats["completed"] == 11
+
+
+def test_dead_worker_fails_its_requests_and_is_restarted(make_pool):
+    pool = make_pool()
+    pool.wait_ready(timeout=60)
+    pid = pool._workers[0]["process"].pid
+    os.kill(pid, signal.SIGSTOP)  # hold the request in the worker
+    errors = []
+
+    def call():
+        try:
+            pool.predict_batch(_images(1))
+        except Exception as e:
+            errors.append(e)
+
+    caller = threading.Thread(target=call)
+    caller.start()
+    _wait_for(lambda: pool.stats()["in_flight"] == 1)
+    os.kill(pid, signal.SIGKILL)
+    caller.join(timeout=10)
+    assert not caller.is_alive()
+    assert len(errors) == 1 and "died" in str(errors[0])
+
+    _wait_for(lambda: pool.stats()["restarts"] == 1 and pool.stats()["alive"] == 1)
+    assert pool._workers[0]["process"].pid != pid
+    assert pool.predict_batch(_images(2)).shape == (2, NUM_CLASSES)
+    assert pool.stats()["free_slots"] == 8
+
+
+def test_load_failure_is_reported_and_not_respawned(make_pool, tmp_path):
+    pool = make_pool(model_path=tmp_path / "missing.onnx")
+    with pytest.raises(RuntimeError, match="failed to load"):
+        pool.wait_ready(timeout=60)
+    time.sleep(1.5)  # several dispatcher liveness checks
+    stats = pool.stats()
+    assert stats["restarts"] == 0
+    assert stats["failed"] == 1
+    assert stats["alive"] == 0
+    with pytest.raises(RuntimeError, match="No inference worker"):
+        pool.predict_batch(_images(1))
+    assert pool.stats()["free_slots"] == 8